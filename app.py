@@ -1,20 +1,44 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
-from io import BytesIO
-import zipfile
-import concurrent.futures
+import numpy as np
+from collections import OrderedDict
 
 # --- Local Modules ---
+# Catatan: altair (grafik) dan pdf_generator/fpdf (laporan PDF) di-import di dalam
+# fungsi yang memakainya agar cold start & setiap rerun tidak menanggung biaya import-nya.
 from logic import (
-    baca_dan_bersihkan_file,
+    DatasetInkremental,
+    IndeksFilter,
+    KAMUS_PENYAKIT,
+    top_penyakit,
     hitung_ranking,
-    cari_penyakit_umum
+    cari_penyakit_umum,
+    hitung_rekap,
+    ranking_per_entitas
 )
-from pdf_generator import (
-    create_pdf_report,
-    create_custom_pdf
+from export import (
+    MIME_EXCEL,
+    FORMAT_BERKAS,
+    format_ekspor,
+    nama_dataset_ekspor,
+    siapkan_data_ekspor,
+    buat_excel,
+    buat_berkas,
+    buat_zip,
+    buat_zip_berkas,
+    buka_unduhan
 )
+from arsip import (
+    ADA_PYARROW,
+    daftar_periode,
+    format_periode,
+    simpan_periode,
+    muat_rentang,
+    hitung_tren,
+    total_per_periode
+)
+import sql_backend
+import wilayah
 
 # ==============================================================================
 # 0. KONFIGURASI & STATE
@@ -30,10 +54,16 @@ if 'upload_key' not in st.session_state:
 if 'data_processed' not in st.session_state:
     st.session_state.data_processed = False
 
+# Jumlah artefak unduhan (Excel/CSV/ZIP) yang dimemo per sesi
+EXPORT_CACHE_SIZE = 4
+
 def reset_app():
     """Mereset aplikasi dan cache."""
     st.session_state.upload_key += 1
     st.session_state.data_processed = False
+    st.session_state.pop('dataset', None)
+    st.session_state.pop('dataset_arsip', None)
+    st.session_state.pop('export_cache', None)
     st.cache_data.clear()
 
 # ==============================================================================
@@ -73,6 +103,8 @@ def style_zigzag_groups(df, group_col):
 
 def make_bar_chart(df, label_context="Kategori", value_col='Total_Kasus', title=""):
     """Helper untuk membuat Horizontal Bar Chart dengan Altair."""
+    import altair as alt
+
     df = df.copy()
     
     # Ensure columns exist
@@ -162,11 +194,56 @@ def render_theme_preview(theme_name, title_text="Laporan Rekapitulasi Data Keseh
 # 2. LOGIC WRAPPER
 # ==============================================================================
 
-@st.cache_data(show_spinner=False)
-def process_single_file_v2(file):
-    """Wrapper cached untuk file processing."""
-    file.seek(0)
-    return baca_dan_bersihkan_file(file)
+def sync_dataset(uploaded_files):
+    """
+    Sinkronkan state ingest sesi dengan isi uploader.
+    Hanya file baru yang di-parse; file yang sudah tergabung tidak diproses ulang.
+    """
+    if 'dataset' not in st.session_state:
+        # Backend SQL aktif: gabungan master_df/kubus tidak disimpan di memori sesi
+        st.session_state.dataset = DatasetInkremental(gabung=not sql_backend.AKTIF)
+    
+    files = [
+        (getattr(f, 'file_id', None) or f"{f.name}:{f.size}", f.name, f.getvalue)
+        for f in uploaded_files
+    ]
+    st.session_state.dataset.sinkron(files)
+    return st.session_state.dataset
+
+def sync_arsip(awal, akhir):
+    """
+    Dataset dari arsip untuk rentang periode [awal, akhir].
+    Hanya partisi di dalam rentang yang dibaca; partisi yang sudah dimuat sesi ini tidak diproses ulang.
+    """
+    if 'dataset_arsip' not in st.session_state:
+        st.session_state.dataset_arsip = DatasetInkremental(gabung=not sql_backend.AKTIF)
+    st.session_state.dataset_arsip.sinkron_hasil(muat_rentang(awal, akhir))
+    return st.session_state.dataset_arsip
+
+def sumber_sql(dataset):
+    """
+    Handle backend SQL (env REKAP_DB) untuk dataset aktif, atau None jika backend tidak aktif.
+    Kubus disimpan ke database hanya saat susunan dataset berubah; sesi lain dengan data sama memakai salinan yang sama.
+    """
+    if not sql_backend.AKTIF:
+        return None
+    kunci = (id(dataset), tuple(dataset.urutan))
+    memo = st.session_state.get('sql_handle')
+    if memo is None or memo[0] != kunci:
+        # Kubus hanya disusun sesaat untuk ditulis; dataset yang tergusur (LRU) ditulis ulang dari partisi
+        bangun = dataset.pembangun_kubus()
+        handle = sql_backend.simpan_kubus(KAMUS_PENYAKIT.dekode(bangun()), bangun=lambda: KAMUS_PENYAKIT.dekode(bangun()))
+        memo = st.session_state.sql_handle = (kunci, handle)
+    return memo[1]
+
+def daftar_entitas(kubus, sql, scope, kecamatan=None):
+    """Nama Kecamatan/Puskesmas (urut abjad) dari kubus, atau dari database jika backend SQL aktif."""
+    if sql is not None:
+        return sql.daftar(scope, kecamatan)
+    if kecamatan is not None:
+        kubus = kubus[kubus['Kecamatan'] == kecamatan]
+    # FIX: Ensure sorting on strings only to prevent float-str comparison error
+    return sorted(kubus[scope].dropna().astype(str).unique())
 
 # ==============================================================================
 # 3. PAGE MODULES (VIEW LOGIC)
@@ -188,6 +265,10 @@ def show_quality_report(log_data):
                 st.warning(f"Ditemukan {warn_count} File dengan Peringatan.")
             else:
                 st.success("Semua File Berhasil Diproses Sempurna.")
+
+            # Dua file berbeda yang dipetakan ke puskesmas yang sama akan digabung datanya
+            for pusk, daftar in wilayah.puskesmas_ganda(log_data).items():
+                st.warning(f"{len(daftar)} file dipetakan ke Puskesmas {pusk} dan datanya digabung: {', '.join(daftar)}")
                 
             def highlight_status(val):
                 color = 'green' if val == 'SUCCESS' else 'red' if val == 'ERROR' else 'orange'
@@ -204,8 +285,10 @@ def show_quality_report(log_data):
         else:
             st.info("Belum ada data log.")
 
-def show_dashboard_recap(master_df, uploaded_files, log_data):
+def show_dashboard_recap(dataset, uploaded_files):
     """Tampilan Mode: Dashboard Utama"""
+    kubus, log_data = dataset.kubus, dataset.logs
+    sql = sumber_sql(dataset)
     st.title("🏥 Rekap Data Penyakit")
     st.markdown("Dashboard rekapitulasi data penyakit per kecamatan dan puskesmas.")
     
@@ -214,11 +297,13 @@ def show_dashboard_recap(master_df, uploaded_files, log_data):
     
     st.divider()
 
-    # --- HELPER COLUMNS FOR FILTER ---
-    master_df['Label_Filter'] = master_df['ICD X'].astype(str) + " - " + master_df['Jenis Penyakit'].astype(str)
-    master_df['Alpha_Filter'] = master_df['ICD X'].astype(str).str[0].str.upper()
-    unique_diseases = sorted(master_df['Label_Filter'].unique())
-    unique_alpha = sorted(master_df['Alpha_Filter'].unique())
+    # --- FILTER OPTIONS (dari kamus penyakit, hanya kode yang ada di data) ---
+    if sql is not None:
+        unique_diseases, unique_alpha = sql.penyakit()
+    else:
+        kode_ada = np.unique(kubus['Kode_Penyakit'].to_numpy())
+        unique_diseases = sorted(set(KAMUS_PENYAKIT.label(kode_ada)))
+        unique_alpha = sorted(set(KAMUS_PENYAKIT.alpha(kode_ada)))
 
     # --- SIDEBAR: SETTINGS & FILTER ---
     with st.sidebar:
@@ -264,37 +349,47 @@ def show_dashboard_recap(master_df, uploaded_files, log_data):
         </div>
         """, unsafe_allow_html=True)
         with st.expander("Preview Data Mentah"):
-            st.dataframe(master_df.head(), use_container_width=True)
+            st.dataframe(KAMUS_PENYAKIT.dekode(dataset.pratinjau()), use_container_width=True)
     else:
         # 1. APPLY FILTERS
-        df_view = master_df.copy()
-        
-        # Include Logic
-        mask_inc = pd.Series([False]*len(df_view), index=df_view.index)
-        has_inc = False
-        if inc_a: mask_inc |= df_view['Alpha_Filter'].isin(inc_a); has_inc=True
-        if inc_l: mask_inc |= df_view['Label_Filter'].isin(inc_l); has_inc=True
-        if has_inc: df_view = df_view[mask_inc]
-        
-        # Exclude Logic
-        if exc_a: df_view = df_view[~df_view['Alpha_Filter'].isin(exc_a)]
-        if exc_l: df_view = df_view[~df_view['Label_Filter'].isin(exc_l)]
+        # Ranking & metrik dihitung dari kubus agregat; baris mentah hanya untuk tab/ekspor Data Mentah
+        has_inc = bool(inc_a or inc_l)
+        df_view = None
+        if sql is not None:
+            # Backend SQL: ranking & metrik langsung dari database, view pandas tidak disusun
+            sql = sql.filter(inc_a, inc_l, exc_a, exc_l)
+            n_baris, n_pusk, total_kasus = sql.ringkasan()
+        else:
+            kubus_view = dataset.filter_kubus.terapkan(inc_a, inc_l, exc_a, exc_l)
+            n_baris, n_pusk, total_kasus = len(kubus_view), kubus_view['Puskesmas'].nunique(), kubus_view['Total_Kasus'].sum()
+            if n_baris:
+                df_view = dataset.filter_master.terapkan(inc_a, inc_l, exc_a, exc_l)
 
-        if df_view.empty:
+        if not n_baris:
             st.error("⚠️ Hasil filter kosong! Silakan atur ulang filter.")
             return
 
+        def data_mentah():
+            """Baris mentah terfilter; pada backend SQL baru disusun dari partisi saat ditampilkan/diekspor."""
+            if df_view is not None:
+                return df_view
+            return IndeksFilter(dataset.susun_master()).terapkan(inc_a, inc_l, exc_a, exc_l)
+
         # 2. CALCULATE RANKING
-        top_kec = hitung_ranking(df_view, ['Kecamatan'], top_n=top_n_kec_val)
-        top_pusk = hitung_ranking(df_view, ['Puskesmas'], top_n=top_n_pusk_val)
-        common_pusk = cari_penyakit_umum(top_pusk, 'Puskesmas', top_n=top_n_common_val)
-        common_kec = cari_penyakit_umum(top_kec, 'Kecamatan', top_n=top_n_common_val)
+        if sql is not None:
+            top_kec, top_pusk, common_kec, common_pusk = sql.rekap(
+                top_n_kec_val, top_n_pusk_val, top_n_common_val
+            )
+        else:
+            top_kec, top_pusk, common_kec, common_pusk = hitung_rekap(
+                kubus_view, top_n_kec_val, top_n_pusk_val, top_n_common_val
+            )
 
         # 3. METRICS
         m1, m2, m3 = st.columns(3)
         with m1: st.metric("Total File", f"{len(uploaded_files)}")
-        with m2: st.metric("Unit Puskesmas", f"{df_view['Puskesmas'].nunique()}")
-        with m3: st.metric("Total Kasus", f"{df_view['Total_Kasus'].sum():,}")
+        with m2: st.metric("Unit Puskesmas", f"{n_pusk}")
+        with m3: st.metric("Total Kasus", f"{total_kasus:,}")
         
         st.markdown("---")
         status_txt = "Aktif" if (has_inc or exc_a or exc_l) else "Non-Aktif"
@@ -311,14 +406,14 @@ def show_dashboard_recap(master_df, uploaded_files, log_data):
         with t1:
             st.subheader(f"Top {top_n_kec_val} Penyakit per Kecamatan")
             with st.expander("Lihat Grafik Visualisasi", expanded=True):
-                c_data = top_kec.groupby('Jenis Penyakit')['Total_Kasus'].sum().reset_index().sort_values('Total_Kasus', ascending=False).head(10)
+                c_data = top_kec.groupby('Jenis Penyakit', observed=True)['Total_Kasus'].sum().reset_index().sort_values('Total_Kasus', ascending=False).head(10)
                 st.altair_chart(make_bar_chart(c_data, "Global Kecamatan", title="Top 10 Global"), use_container_width=True)
             st.dataframe(style_zigzag_groups(top_kec, 'Kecamatan'), use_container_width=True, height=500)
 
         with t2:
             st.subheader(f"Top {top_n_pusk_val} Penyakit per Puskesmas")
             with st.expander("Lihat Grafik Visualisasi", expanded=True):
-                c_data = top_pusk.groupby('Jenis Penyakit')['Total_Kasus'].sum().reset_index().sort_values('Total_Kasus', ascending=False).head(10)
+                c_data = top_pusk.groupby('Jenis Penyakit', observed=True)['Total_Kasus'].sum().reset_index().sort_values('Total_Kasus', ascending=False).head(10)
                 st.altair_chart(make_bar_chart(c_data, "Global Puskesmas", title="Top 10 Global"), use_container_width=True)
             st.dataframe(style_zigzag_groups(top_pusk, 'Puskesmas'), use_container_width=True, height=500)
 
@@ -336,50 +431,62 @@ def show_dashboard_recap(master_df, uploaded_files, log_data):
 
         with t4:
             st.subheader("Data Terfilter")
-            st.dataframe(df_view.drop(columns=['Label_Filter', 'Alpha_Filter']), use_container_width=True)
+            if df_view is not None or st.checkbox("Tampilkan baris data mentah"):
+                st.dataframe(KAMUS_PENYAKIT.dekode(data_mentah()), use_container_width=True)
 
         # 5. EXPORT / DOWNLOAD
-        _render_download_section(df_view, top_kec, top_pusk, common_kec, uploaded_files, {
+        state_key = (tuple(dataset.urutan), tuple(inc_a), tuple(inc_l), tuple(exc_a), tuple(exc_l))
+        _render_download_section(data_mentah, top_kec, top_pusk, common_kec, uploaded_files, {
             "kec":top_n_kec_val, "pusk":top_n_pusk_val, "umum":top_n_common_val
-        })
-
-def _render_download_section(df_view, top_kec, top_pusk, common_kec, uploaded_files, n_stats):
-    """Helper internal bagian download."""
+        }, state_key, {"total_pusk": n_pusk, "total_kasus": total_kasus})
+
+def _cached_export(key, builder):
+    """Memo artefak unduhan per sesi (key: filter, Top-N, dataset terpilih, format), maks EXPORT_CACHE_SIZE."""
+    cache = st.session_state.setdefault('export_cache', OrderedDict())
+    if key not in cache:
+        cache[key] = builder()
+        while len(cache) > EXPORT_CACHE_SIZE:
+            cache.popitem(last=False)
+    cache.move_to_end(key)
+    return cache[key]
+
+def _render_download_section(data_mentah, top_kec, top_pusk, common_kec, uploaded_files, n_stats, state_key, ringkasan):
+    """
+    Helper internal bagian download. File hanya dibuat saat diminta, lalu dimemo per state.
+    data_mentah: callable -> baris mentah terfilter; ringkasan: dict total_pusk & total_kasus
+    """
     st.markdown("---")
     st.subheader("Download Hasil")
     
-    raw_opts = {
-        "Data Mentah": df_view.drop(columns=['Label_Filter', 'Alpha_Filter'] if 'Label_Filter' in df_view else [], errors='ignore'),
-        f"Top {n_stats['kec']} Kecamatan": top_kec,
-        f"Top {n_stats['pusk']} Puskesmas": top_pusk,
-        "Analisis Umum": common_kec
-    }
+    opts = nama_dataset_ekspor(n_stats)
     
     c1, c2 = st.columns(2)
-    with c1: sel_data = st.multiselect("Pilih Data:", ["Semua Data"] + list(raw_opts.keys()), default=["Semua Data"])
-    with c2: fmt = st.radio("Format:", ["Excel", "CSV"], horizontal=True)
+    with c1: sel_data = st.multiselect("Pilih Data:", ["Semua Data"] + opts, default=["Semua Data"])
+    with c2: fmt = st.radio("Format:", format_ekspor(), horizontal=True)
     
     if sel_data:
-        final_data = raw_opts if "Semua Data" in sel_data else {k:v for k,v in raw_opts.items() if k in sel_data}
+        pilihan = opts if "Semua Data" in sel_data else [k for k in opts if k in sel_data]
+        key = (state_key, tuple(sorted(n_stats.items())), tuple(pilihan), fmt)
         
-        if fmt == "Excel":
-            buf = BytesIO()
-            with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-                for k, v in final_data.items():
-                    sheet = k[:30].replace(" ", "_").upper()
-                    clean_sheet = "".join(c for c in sheet if c.isalnum() or c=="_")
-                    v.to_excel(writer, sheet_name=clean_sheet, index=False)
-            st.download_button("Download Excel", buf.getvalue(), "REKAP_HASIL.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", type="primary")
-        else:
+        def build():
+            final_data = siapkan_data_ekspor(data_mentah(), top_kec, top_pusk, common_kec, n_stats, pilihan)
+            if fmt == "Excel":
+                return "Download Excel", buat_excel(final_data), "REKAP_HASIL.xlsx", MIME_EXCEL
+            ekstensi, mime, _, _ = FORMAT_BERKAS[fmt]
             if len(final_data) == 1:
-                k = list(final_data.keys())[0]
-                st.download_button("Download CSV", final_data[k].to_csv(index=False).encode(), f"{k}.csv", "text/csv", type="primary")
-            else:
-                zbuf = BytesIO()
-                with zipfile.ZipFile(zbuf, "w") as zf:
-                    for k, v in final_data.items():
-                        zf.writestr(f"{k}.csv", v.to_csv(index=False))
-                st.download_button("Download ZIP", zbuf.getvalue(), "REKAP_CSV.zip", "application/zip", type="primary")
+                k = pilihan[0]
+                return f"Download {fmt}", buat_berkas(final_data[k], fmt), f"{k}.{ekstensi}", mime
+            return "Download ZIP", buat_zip(final_data, fmt), f"REKAP_{fmt.upper()}.zip", "application/zip"
+        
+        cache = st.session_state.setdefault('export_cache', OrderedDict())
+        if key not in cache and st.button("Siapkan File Unduhan"):
+            with st.spinner("Menyiapkan file..."):
+                _cached_export(key, build)
+        
+        if key in cache:
+            label, f, file_name, mime = _cached_export(key, build)
+            # File (spooled, bisa sudah di disk) baru dibaca saat tombol diklik
+            st.download_button(label, lambda: buka_unduhan(f), file_name, mime, type="primary")
 
     # PDF Report Section
     st.markdown("####Laporan PDF")
@@ -387,10 +494,10 @@ def _render_download_section(df_view, top_kec, top_pusk, common_kec, uploaded_fi
         with st.spinner("Membuat PDF..."):
             metrics = {
                 "total_file": len(uploaded_files),
-                "total_pusk": df_view['Puskesmas'].nunique(),
-                "total_kasus": df_view['Total_Kasus'].sum()
+                **ringkasan
             }
             try:
+                from pdf_generator import create_pdf_report
                 pdf_bytes = create_pdf_report(metrics, top_kec, top_pusk, common_kec, n_stats)
                 st.download_button(
                     label="⬇️ Download PDF Result",
@@ -402,8 +509,8 @@ def _render_download_section(df_view, top_kec, top_pusk, common_kec, uploaded_fi
             except Exception as e:
                 st.error(f"Gagal memproses PDF: {e}")
 
-def show_regional_filter(master_df):
-    """Tampilan Mode: Filter Wilayah (Drill-Down)"""
+def show_regional_filter(kubus, sql=None):
+    """Tampilan Mode: Filter Wilayah (Drill-Down). sql: handle backend SQL (opsional)."""
     st.title("🌍 Filter Wilayah")
     st.markdown("Analisis spesifik untuk satu Kecamatan atau Puskesmas tertentu.")
     st.divider()
@@ -411,39 +518,46 @@ def show_regional_filter(master_df):
     c1, c2 = st.columns(2)
     with c1: scope = st.selectbox("Pilih Tingkat Wilayah:", ["Kecamatan", "Puskesmas"])
     with c2:
-        # FIX: Ensure sorting on strings only to prevent float-str comparison error
-        opts = sorted(master_df[scope].dropna().astype(str).unique())
+        opts = daftar_entitas(kubus, sql, scope)
         entity = st.selectbox(f"Pilih Nama {scope}:", opts)
 
     if entity:
-        df_sub = master_df[master_df[scope] == entity].copy()
+        if sql is not None:
+            top_10, metrik = sql.wilayah(scope, entity, top_n=10)
+        else:
+            df_sub = kubus[kubus[scope] == entity]
+            top_10 = hitung_ranking(df_sub, [scope], top_n=10)
+            metrik = {
+                'total': df_sub['Total_Kasus'].sum(),
+                'unik': KAMUS_PENYAKIT.dekode(df_sub[['Kode_Penyakit']].drop_duplicates())['Jenis Penyakit'].nunique(),
+                'jumlah_pusk': df_sub['Puskesmas'].nunique(),
+                'kecamatan': df_sub['Kecamatan'].iloc[0] if not df_sub.empty else None,
+            }
         
         # Metrics
         m1, m2, m3 = st.columns(3)
-        with m1: st.metric("Total Kasus", f"{df_sub['Total_Kasus'].sum():,}")
-        with m2: st.metric("Jenis Penyakit Unik", f"{df_sub['Jenis Penyakit'].nunique()}")
+        with m1: st.metric("Total Kasus", f"{metrik['total']:,}")
+        with m2: st.metric("Jenis Penyakit Unik", f"{metrik['unik']}")
         with m3: 
-            if scope == "Kecamatan": st.metric("Jumlah Pusk.", f"{df_sub['Puskesmas'].nunique()}")
-            else: st.metric("Kecamatan", df_sub['Kecamatan'].iloc[0] if not df_sub.empty else "-")
+            if scope == "Kecamatan": st.metric("Jumlah Pusk.", f"{metrik['jumlah_pusk']}")
+            else: st.metric("Kecamatan", metrik['kecamatan'] or "-")
         
         st.markdown("### Top 10 Penyakit")
-        top_10 = hitung_ranking(df_sub, [scope], top_n=10)
         
         c_chart, c_table = st.columns([1, 1])
         with c_chart:
-            c_data = top_10.groupby(['Jenis Penyakit', 'ICD X'])['Total_Kasus'].sum().reset_index().sort_values('Total_Kasus', ascending=False).head(10)
+            c_data = top_10.groupby(['Jenis Penyakit', 'ICD X'], observed=True)['Total_Kasus'].sum().reset_index().sort_values('Total_Kasus', ascending=False).head(10)
             st.altair_chart(make_bar_chart(c_data, entity, title=f"Top 10 di {entity}"), use_container_width=True)
         with c_table:
             st.dataframe(style_zigzag_groups(top_10, scope), use_container_width=True)
 
-def show_comparison(master_df):
-    """Tampilan Mode: Komparasi"""
+def show_comparison(kubus, sql=None):
+    """Tampilan Mode: Komparasi. sql: handle backend SQL (opsional)."""
     st.title("⚖️ Komparasi Puskesmas")
     st.markdown("Bandingkan data kesehatan antara dua Puskesmas secara head-to-head.")
     st.divider()
 
-    # FIX: Casting to str before sorting to avoid TypeError with NaNs or mixed types
-    pusk_list = sorted(master_df['Puskesmas'].dropna().astype(str).unique())
+    pusk_list = daftar_entitas(kubus, sql, 'Puskesmas')
     c1, c2 = st.columns(2)
     with c1: p1 = st.selectbox("Pilih Puskesmas A", pusk_list, index=0)
     with c2: p2 = st.selectbox("Pilih Puskesmas B", pusk_list, index=1 if len(pusk_list)>1 else 0)
@@ -452,22 +566,26 @@ def show_comparison(master_df):
         if p1 == p2:
             st.warning("Silakan pilih dua Puskesmas yang berbeda.")
         else:
-            df1 = master_df[master_df['Puskesmas'] == p1]
-            df2 = master_df[master_df['Puskesmas'] == p2]
+            if sql is not None:
+                val1, val2, top5_1, top5_2, merged = sql.komparasi(p1, p2, top_n=5)
+            else:
+                df1 = kubus[kubus['Puskesmas'] == p1]
+                df2 = kubus[kubus['Puskesmas'] == p2]
+                val1 = df1['Total_Kasus'].sum()
+                val2 = df2['Total_Kasus'].sum()
+                top5_1 = top_penyakit(df1, top_n=5)
+                top5_2 = top_penyakit(df2, top_n=5)
+                merged = pd.merge(top5_1[['Jenis Penyakit', 'Total_Kasus']], top5_2[['Jenis Penyakit', 'Total_Kasus']], on='Jenis Penyakit', how='inner', suffixes=(f'_{p1}', f'_{p2}'))
 
             # Compare Metrics
             st.subheader("1. Perbandingan Total Kasus")
             cm1, cm2 = st.columns(2)
-            val1 = df1['Total_Kasus'].sum()
-            val2 = df2['Total_Kasus'].sum()
             with cm1: st.metric(f"Total {p1}", f"{val1:,}")
             with cm2: st.metric(f"Total {p2}", f"{val2:,}", delta=f"{val2-val1:,}")
             st.markdown("---")
 
             # Compare Top 5
             st.subheader("2. Top 5 Penyakit Masing-Masing")
-            top5_1 = df1.groupby(['Jenis Penyakit', 'ICD X'])['Total_Kasus'].sum().reset_index().sort_values('Total_Kasus', ascending=False).head(5)
-            top5_2 = df2.groupby(['Jenis Penyakit', 'ICD X'])['Total_Kasus'].sum().reset_index().sort_values('Total_Kasus', ascending=False).head(5)
 
             cc1, cc2 = st.columns(2)
             with cc1:
@@ -479,14 +597,76 @@ def show_comparison(master_df):
             
             # Intersection
             st.subheader("3. Irisan Penyakit")
-            merged = pd.merge(top5_1[['Jenis Penyakit', 'Total_Kasus']], top5_2[['Jenis Penyakit', 'Total_Kasus']], on='Jenis Penyakit', how='inner', suffixes=(f'_{p1}', f'_{p2}'))
             if not merged.empty: st.dataframe(merged, use_container_width=True)
             else: st.info("Tidak ada irisan penyakit di Top 5.")
 
 
 
-def show_custom_report(master_df):
-    """Tampilan Mode: Laporan Custom"""
+def show_trend(kubus, awal, akhir, sql=None):
+    """Tampilan Mode: Tren Periode (khusus sumber arsip). sql: handle backend SQL (opsional)."""
+    import altair as alt
+
+    st.title("📈 Tren Periode")
+    st.markdown(f"Perkembangan kasus dari **{format_periode(awal)}** s/d **{format_periode(akhir)}**.")
+    st.divider()
+
+    c1, c2, c3 = st.columns([1, 2, 1])
+    with c1: scope = st.selectbox("Tingkat Wilayah:", ["Semua", "Kecamatan", "Puskesmas"], key="tren_scope")
+    with c2:
+        opts = daftar_entitas(kubus, sql, scope) if scope != "Semua" else []
+        entity = st.selectbox(f"Pilih Nama {scope}:", opts, key=f"tren_entity_{scope}", disabled=scope == "Semua")
+    with c3: top_n = st.number_input("Top N Penyakit", 1, 20, 5, key="tren_top_n")
+
+    # Pruning: hanya partisi puskesmas yang relevan yang dibaca
+    puskesmas, kecamatan = None, None
+    if scope == "Puskesmas" and entity:
+        puskesmas = [entity]
+    elif scope == "Kecamatan" and entity:
+        kecamatan = entity
+        puskesmas = daftar_entitas(kubus, sql, 'Puskesmas', kecamatan=entity)
+
+    tren = hitung_tren(awal, akhir, top_n, puskesmas, kecamatan)
+    if tren.empty:
+        st.info("Tidak ada data pada rentang ini.")
+        return
+
+    st.markdown(f"### Top {top_n} Penyakit per Periode")
+    chart = alt.Chart(tren).mark_line(point=True).encode(
+        x=alt.X('Periode:O', title=None),
+        y=alt.Y('Total_Kasus:Q', title='Total Kasus'),
+        color=alt.Color('Jenis Penyakit:N', legend=alt.Legend(orient='bottom', columns=2, labelLimit=300)),
+        tooltip=['Periode', 'Jenis Penyakit', 'ICD X', 'Total_Kasus']
+    ).properties(height=400)
+    st.altair_chart(chart, use_container_width=True)
+
+    st.markdown("### Year-over-Year (Total Kasus per Bulan)")
+    yoy = total_per_periode(awal, akhir, puskesmas, kecamatan)
+    tampil = yoy.rename(columns=str)
+    tahun = list(yoy.columns)
+    for lalu, kini in zip(tahun, tahun[1:]):
+        tampil[f"Δ% {kini} vs {lalu}"] = ((yoy[kini] - yoy[lalu]) / yoy[lalu] * 100).round(1)
+    st.dataframe(tampil, use_container_width=True)
+
+def show_simpan_arsip(dataset):
+    """Form sidebar: simpan data hasil upload ke arsip sebagai satu periode (tahun/bulan)."""
+    from datetime import date
+
+    hari_ini = date.today()
+    with st.sidebar.expander("💾 Simpan ke Arsip"):
+        with st.form(key='arsip_form'):
+            c1, c2 = st.columns(2)
+            with c1: tahun = st.number_input("Tahun", 2000, 2100, hari_ini.year)
+            with c2: bulan = st.selectbox("Bulan", list(range(1, 13)), index=hari_ini.month - 1)
+            simpan = st.form_submit_button("Simpan Periode")
+        if simpan:
+            try:
+                n = simpan_periode(KAMUS_PENYAKIT.dekode(dataset.susun_master()), int(tahun), int(bulan))
+                st.success(f"{n} puskesmas tersimpan di periode {format_periode((int(tahun), int(bulan)))}.")
+            except Exception as e:
+                st.error(f"Gagal menyimpan arsip: {e}")
+
+def show_custom_report(kubus, sql=None):
+    """Tampilan Mode: Laporan Custom. sql: handle backend SQL (opsional)."""
     st.title("📄 Laporan PDF Custom")
     st.markdown("Rancang isi laporan PDF sesuai kebutuhan Anda.")
     st.markdown("*Fitur ini masih dalam tahap pengembangan, jika ada kesalahan dalam generate mohon lapor ke admin")
@@ -536,7 +716,7 @@ def show_custom_report(master_df):
             fc1, fc2 = st.columns(2)
             with fc1: f_scope = st.selectbox("Tingkat Wilayah:", ["Kecamatan", "Puskesmas"], key="cust_f_scope")
             with fc2: 
-                opts = sorted(master_df[f_scope].dropna().astype(str).unique())
+                opts = daftar_entitas(kubus, sql, f_scope)
                 f_entity = st.selectbox(f"Pilih Nama {f_scope}:", opts, key="cust_f_entity")
         
         st.markdown("---")
@@ -546,7 +726,7 @@ def show_custom_report(master_df):
         comp_p1, comp_p2 = None, None
         
         if inc_compare:
-            p_list = sorted(master_df['Puskesmas'].dropna().astype(str).unique())
+            p_list = daftar_entitas(kubus, sql, 'Puskesmas')
             cc1, cc2 = st.columns(2)
             with cc1: comp_p1 = st.selectbox("Puskesmas A:", p_list, index=0, key="cust_c_p1")
             with cc2: comp_p2 = st.selectbox("Puskesmas B:", p_list, index=1 if len(p_list)> 1 else 0, key="cust_c_p2")
@@ -565,23 +745,36 @@ def show_custom_report(master_df):
             report_title_val = st.session_state.rep_title if 'rep_title' in st.session_state else "Laporan Custom"
             
             data_payload = {}
-            if inc_kec: data_payload['df_kec'] = hitung_ranking(master_df, ['Kecamatan'], top_n=n_kec)
-            if inc_pusk: data_payload['df_pusk'] = hitung_ranking(master_df, ['Puskesmas'], top_n=n_pusk)
-            if inc_umum:
-                tmp_pusk = hitung_ranking(master_df, ['Puskesmas'], top_n=10)
-                data_payload['df_umum'] = cari_penyakit_umum(tmp_pusk, 'Puskesmas', top_n=n_umum)
+            if sql is not None:
+                # Backend SQL: ranking langsung dari database
+                if inc_kec: data_payload['df_kec'] = sql.ranking('Kecamatan', n_kec)
+                if inc_pusk: data_payload['df_pusk'] = sql.ranking('Puskesmas', n_pusk)
+                if inc_umum: data_payload['df_umum'] = sql.penyakit_umum('Puskesmas', 10, n_umum)
+            else:
+                if inc_kec: data_payload['df_kec'] = hitung_ranking(kubus, ['Kecamatan'], top_n=n_kec)
+                if inc_pusk: data_payload['df_pusk'] = hitung_ranking(kubus, ['Puskesmas'], top_n=n_pusk)
+                if inc_umum:
+                    tmp_pusk = hitung_ranking(kubus, ['Puskesmas'], top_n=10)
+                    data_payload['df_umum'] = cari_penyakit_umum(tmp_pusk, 'Puskesmas', top_n=n_umum)
             
             if inc_filter and f_entity:
-                df_f = master_df[master_df[f_scope] == f_entity].copy()
-                data_payload['df_filter'] = hitung_ranking(df_f, [f_scope], top_n=20)
-                data_payload['filter_metrics'] = {'kasus': df_f['Total_Kasus'].sum()}
+                if sql is not None:
+                    data_payload['df_filter'], metrik = sql.wilayah(f_scope, f_entity, top_n=20)
+                    data_payload['filter_metrics'] = {'kasus': metrik['total']}
+                else:
+                    df_f = kubus[kubus[f_scope] == f_entity]
+                    data_payload['df_filter'] = hitung_ranking(df_f, [f_scope], top_n=20)
+                    data_payload['filter_metrics'] = {'kasus': df_f['Total_Kasus'].sum()}
             
             if inc_compare and comp_p1 and comp_p2:
-                 df1 = master_df[master_df['Puskesmas'] == comp_p1]
-                 df2 = master_df[master_df['Puskesmas'] == comp_p2]
-                 top1 = df1.groupby(['Jenis Penyakit', 'ICD X'])['Total_Kasus'].sum().reset_index().sort_values('Total_Kasus', ascending=False).head(10)
-                 top2 = df2.groupby(['Jenis Penyakit', 'ICD X'])['Total_Kasus'].sum().reset_index().sort_values('Total_Kasus', ascending=False).head(10)
-                 intersect = pd.merge(top1[['Jenis Penyakit', 'Total_Kasus']], top2[['Jenis Penyakit', 'Total_Kasus']], on='Jenis Penyakit', how='inner', suffixes=(f'_{comp_p1}', f'_{comp_p2}'))
+                 if sql is not None:
+                     _, _, top1, top2, intersect = sql.komparasi(comp_p1, comp_p2, top_n=10)
+                 else:
+                     df1 = kubus[kubus['Puskesmas'] == comp_p1]
+                     df2 = kubus[kubus['Puskesmas'] == comp_p2]
+                     top1 = top_penyakit(df1, top_n=10)
+                     top2 = top_penyakit(df2, top_n=10)
+                     intersect = pd.merge(top1[['Jenis Penyakit', 'Total_Kasus']], top2[['Jenis Penyakit', 'Total_Kasus']], on='Jenis Penyakit', how='inner', suffixes=(f'_{comp_p1}', f'_{comp_p2}'))
                  data_payload['df_comp1'] = top1
                  data_payload['df_comp2'] = top2
                  data_payload['df_comp_intersect'] = intersect
@@ -596,6 +789,7 @@ def show_custom_report(master_df):
             
             # 3. GENERATE PDF (Pass Theme)
             try:
+                from pdf_generator import create_custom_pdf
                 pdf_bytes = create_custom_pdf(config, data_payload, theme_name=pdf_theme)
                 st.success(f"PDF Berhasil Dibuat dengan Tema: {pdf_theme}!")
                 
@@ -609,10 +803,64 @@ def show_custom_report(master_df):
             except Exception as e:
                 st.error(f"Gagal generate PDF: {e}")
 
+def show_batch_report(kubus, sql=None):
+    """Laporan Batch: satu PDF drill-down per Kecamatan/Puskesmas, diunduh sebagai ZIP. sql: handle backend SQL (opsional)."""
+    st.divider()
+    st.subheader("📦 Laporan Batch per Wilayah")
+    st.markdown("Buat PDF **Detail Wilayah** untuk setiap Kecamatan/Puskesmas sekaligus, dikemas dalam satu ZIP.")
+
+    with st.form("batch_report_form"):
+        b1, b2, b3 = st.columns(3)
+        with b1: b_scope = st.selectbox("Tingkat Wilayah:", ["Kecamatan", "Puskesmas"], key="batch_scope")
+        with b2: b_top = st.number_input("Top N per Wilayah", 1, 50, 20, key="batch_top")
+        with b3: b_theme = st.selectbox("Tema:", ['Modern Minimalist', 'Formal Monochrome', 'Medical Fresh'], key="batch_theme")
+        b_title = st.text_input("Judul Laporan:", "Laporan Detail Wilayah", key="batch_title")
+        submit = st.form_submit_button("📦 Generate Semua PDF")
+
+    if submit:
+        with st.spinner(f"Menyusun PDF untuk setiap {b_scope}..."):
+            try:
+                from pdf_generator import create_batch_pdf
+                if sql is not None:
+                    per_entitas = sql.ranking_per_entitas(b_scope, top_n=b_top)
+                else:
+                    per_entitas = ranking_per_entitas(kubus, b_scope, top_n=b_top)
+                berkas = create_batch_pdf(b_title, b_scope, per_entitas, theme_name=b_theme)
+                f = buat_zip_berkas(berkas)
+                st.success(f"{len(berkas)} PDF {b_scope} berhasil dibuat!")
+                st.download_button(
+                    label="⬇️ Download ZIP",
+                    data=lambda: buka_unduhan(f),
+                    file_name=f"Laporan_per_{b_scope}.zip",
+                    mime="application/zip",
+                    type="primary"
+                )
+            except Exception as e:
+                st.error(f"Gagal generate PDF batch: {e}")
+
 # ==============================================================================
 # 4. MAIN APP EXECUTION
 # ==============================================================================
 
+def show_mode(dataset, extra=None):
+    """Navigasi mode untuk dataset aktif (upload atau arsip). extra: mode tambahan {nama: fungsi}."""
+    extra = extra or {}
+    kubus = dataset.kubus
+    st.sidebar.markdown("---")
+    mode = st.sidebar.radio("Pilih Mode:", ["Dashboard Utama", "Filter Wilayah", "Komparasi", "Laporan Custom"] + list(extra))
+    
+    if mode == "Dashboard Utama":
+        show_dashboard_recap(dataset, dataset.urutan)
+    elif mode == "Filter Wilayah":
+        show_regional_filter(kubus, sumber_sql(dataset))
+    elif mode == "Komparasi":
+        show_comparison(kubus, sumber_sql(dataset))
+    elif mode == "Laporan Custom":
+        show_custom_report(kubus, sumber_sql(dataset))
+        show_batch_report(kubus, sumber_sql(dataset))
+    else:
+        extra[mode]()
+
 def main():
     load_css("style.css")
     
@@ -625,22 +873,46 @@ def main():
             1. Format wajib <b>.xlsx</b><br>
             2. Header data harus di <b>Baris ke-2</b><br>
             3. Data Penyakit ada di kolom <b>D - AY</b><br>
-            4. Nama file mengandung nama <b>Puskesmas</b>
+            4. Nama file mengandung nama <b>Puskesmas</b><br>
+            <i>File .parquet 'Data Mentah' hasil unduhan sebelumnya juga bisa di-upload ulang.</i>
         </div>
         """, unsafe_allow_html=True)
+        if wilayah.GALAT_MAPPING:
+            st.warning(f"{wilayah.GALAT_MAPPING}. Semua puskesmas dianggap tidak terdaftar.")
         
-        uploaded_files = st.file_uploader(
-            "Upload Excel:", type="xlsx", accept_multiple_files=True,
-            label_visibility="collapsed", key=f"uploader_{st.session_state.upload_key}"
-        )
-        
-        if uploaded_files:
-            st.success(f"✅ {len(uploaded_files)} File Terbaca")
+        # Sumber arsip hanya ditawarkan jika sudah ada periode tersimpan
+        periode = daftar_periode() if ADA_PYARROW else []
+        sumber = "Upload File"
+        if periode:
+            sumber = st.radio("Sumber Data:", ["Upload File", "Arsip Periode"], horizontal=True)
+
+        uploaded_files = None
+        if sumber == "Upload File":
+            uploaded_files = st.file_uploader(
+                "Upload Excel:", type=["xlsx", "parquet"], accept_multiple_files=True,
+                label_visibility="collapsed", key=f"uploader_{st.session_state.upload_key}"
+            )
+
+            if uploaded_files:
+                st.success(f"✅ {len(uploaded_files)} File Terbaca")
+            else:
+                st.caption("Masukan file untuk lanjut.")
         else:
-            st.caption("Masukan file untuk lanjut.")
+            label = [format_periode(p) for p in periode]
+            awal, akhir = st.select_slider(
+                "Rentang Periode:", options=label, value=(label[0], label[-1])
+            )
+            awal, akhir = periode[label.index(awal)], periode[label.index(akhir)]
 
     # --- MAIN CONTENT LOGIC ---
-    if not uploaded_files:
+    if sumber == "Arsip Periode":
+        with st.spinner(f'Memuat arsip {format_periode(awal)} s/d {format_periode(akhir)}...'):
+            dataset = sync_arsip(awal, akhir)
+        if not dataset.kosong():
+            show_mode(dataset, extra={"Tren Periode": lambda: show_trend(dataset.kubus, awal, akhir, sumber_sql(dataset))})
+        else:
+            st.info("Tidak ada data arsip pada rentang ini.")
+    elif not uploaded_files:
         st.empty()
         st.markdown("""
         <div style="text-align: center; padding: 50px; opacity: 0.7;">
@@ -651,42 +923,23 @@ def main():
         st.session_state.data_processed = False
     else:
         # Load & Process
-        # OPTIMASI 3: Parallel Processing (Multi-threading)
-
+        # OPTIMASI 3: Parallel Processing (Multi-proses)
+        # Parsing Excel bersifat CPU-bound, jadi thread tertahan GIL. File dikirim
+        # sebagai bytes mentah ke worker proses (jumlah worker: env REKAP_WORKERS).
         
         with st.spinner(f'Memproses {len(uploaded_files)} file secara paralel... (Engine: Otomatis)'):
-            all_dfs, all_logs = [], []
+            dataset, all_logs = None, []
             
-            # Helper function untuk threading (karena st.cache sudah handle concurrency, kita panggil wrapper-nya)
-            # ThreadPoolExecutor sangat efektif untuk I/O bound task seperti baca file.
             try:
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    results = list(executor.map(process_single_file_v2, uploaded_files))
-                
-                # Pisahkan hasil DF dan Log
-                for df_res, log_res in results:
-                    all_logs.append(log_res)
-                    if not df_res.empty:
-                        all_dfs.append(df_res)
-                        
+                dataset = sync_dataset(uploaded_files)
+                all_logs = dataset.logs
             except Exception as e:
                 st.error(f"Terjadi kesalahan sistem saat pemrosesan paralel: {e}")
-            
-            master_df = pd.concat(all_dfs, ignore_index=True) if all_dfs else pd.DataFrame()
 
-        if not master_df.empty:
-            # Navigation
-            st.sidebar.markdown("---")
-            mode = st.sidebar.radio("Pilih Mode:", ["Dashboard Utama", "Filter Wilayah", "Komparasi", "Laporan Custom"])
-            
-            if mode == "Dashboard Utama":
-                show_dashboard_recap(master_df, uploaded_files, all_logs)
-            elif mode == "Filter Wilayah":
-                show_regional_filter(master_df)
-            elif mode == "Komparasi":
-                show_comparison(master_df)
-            elif mode == "Laporan Custom":
-                show_custom_report(master_df)
+        if dataset is not None and not dataset.kosong():
+            if ADA_PYARROW:
+                show_simpan_arsip(dataset)
+            show_mode(dataset)
         else:
             # Case where files are uploaded but empty content
             st.error("Tidak ada data valid yang dapat diolah.")
@@ -0,0 +1,214 @@
+"""
+Arsip lokal multi-periode: hasil ingest disimpan sebagai Parquet terpartisi
+tahun/bulan/puskesmas, sehingga analisis rentang periode (ranking, drill-down,
+komparasi, tren) cukup membaca partisi yang relevan tanpa upload ulang.
+
+Layout:
+    <REKAP_ARSIP_DIR>/tahun=2026/bulan=09/puskesmas=PONCOL/data.parquet
+"""
+import importlib.util
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+from logic import KOLOM_MASTER, KOLOM_WILAYAH
+
+# Lokasi arsip (bisa di-override lewat environment); bertahan walau aplikasi di-reset/restart
+ARSIP_DIR = os.environ.get('REKAP_ARSIP_DIR', os.path.join(os.getcwd(), '.rekap_arsip'))
+
+# Parquet butuh pyarrow; tanpa pyarrow fitur arsip disembunyikan
+ADA_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+NAMA_FILE = 'data.parquet'
+
+# Cache LRU partisi yang sudah dibaca: path -> (mtime_ns, DataFrame, ukuran byte). Partisi kecil
+# (satu puskesmas x satu bulan), jadi rentang yang sama/bertumpuk cukup dibaca dari memori.
+# Dibatasi total ukuran DataFrame di memori (env REKAP_ARSIP_CACHE_MB, 0 = tanpa cache).
+_CACHE_PARTISI = OrderedDict()
+MAKS_CACHE_MB = int(os.environ.get('REKAP_ARSIP_CACHE_MB', '256') or 0)
+_ukuran_cache = 0
+_LOCK = threading.Lock()
+
+
+def format_periode(periode):
+    """(2026, 9) -> '2026-09'"""
+    return f"{periode[0]:04d}-{periode[1]:02d}"
+
+
+def parse_periode(teks):
+    """'2026-09' -> (2026, 9). ValueError jika format/bulan tidak valid."""
+    m = re.fullmatch(r'\s*(\d{4})-(\d{1,2})\s*', str(teks))
+    if not m or not 1 <= int(m.group(2)) <= 12:
+        raise ValueError(f"Periode harus berformat YYYY-MM: {teks!r}")
+    return int(m.group(1)), int(m.group(2))
+
+
+def _root(root):
+    return root or ARSIP_DIR
+
+
+def path_partisi(tahun, bulan, puskesmas, root=None):
+    # Nama puskesmas di-quote agar aman sebagai nama folder (mis. mengandung '/')
+    return os.path.join(
+        _root(root), f"tahun={tahun:04d}", f"bulan={bulan:02d}",
+        f"puskesmas={quote(str(puskesmas), safe=' ()-_.')}", NAMA_FILE
+    )
+
+
+def simpan_periode(df, tahun, bulan, root=None):
+    """
+    Simpan master_df (kolom teks, lihat KOLOM_MASTER) sebagai periode tahun/bulan, satu file per puskesmas.
+    Partisi puskesmas yang sudah ada di periode itu ditimpa (upload ulang = koreksi data).
+    Returns: jumlah partisi yang ditulis
+    """
+    n = 0
+    for pusk, bagian in df[KOLOM_MASTER].groupby('Puskesmas', observed=True, sort=True):
+        path = path_partisi(tahun, bulan, pusk, root)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        bagian = bagian.reset_index(drop=True)
+        for col in KOLOM_WILAYAH:
+            bagian[col] = bagian[col].astype(str).astype('category')
+        # Tulis atomik: pembaca lain tidak pernah melihat file setengah jadi
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            bagian.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        n += 1
+    return n
+
+
+def _isi_folder(path, awalan):
+    """Nilai partisi 'awalan=nilai' di dalam folder (urut), tanpa membaca file apa pun."""
+    try:
+        nama = os.listdir(path)
+    except OSError:
+        return []
+    return sorted(n[len(awalan) + 1:] for n in nama if n.startswith(awalan + '='))
+
+
+def daftar_periode(root=None):
+    """Periode (tahun, bulan) yang ada di arsip, urut menaik."""
+    hasil = []
+    # Folder yang bukan angka (mis. 'tahun=lama', 'bulan=xx') bukan bagian arsip: dilewati
+    for tahun in _isi_folder(_root(root), 'tahun'):
+        if not tahun.isdigit():
+            continue
+        for bulan in _isi_folder(os.path.join(_root(root), f'tahun={tahun}'), 'bulan'):
+            if bulan.isdigit():
+                hasil.append((int(tahun), int(bulan)))
+    return sorted(hasil)
+
+
+def partisi_rentang(awal, akhir, puskesmas=None, root=None):
+    """
+    Partition pruning: hanya folder periode dalam [awal, akhir] (dan puskesmas terpilih) yang
+    dilihat, berdasarkan nama folder saja.
+    Returns: list of (periode, puskesmas, path), urut periode lalu nama puskesmas
+    """
+    pilihan = None if puskesmas is None else {str(p) for p in puskesmas}
+    hasil = []
+    for periode in daftar_periode(root):
+        if not awal <= periode <= akhir:
+            continue
+        folder = os.path.dirname(os.path.dirname(path_partisi(*periode, 'x', root)))
+        for nama in _isi_folder(folder, 'puskesmas'):
+            pusk = unquote(nama)
+            path = os.path.join(folder, f'puskesmas={nama}', NAMA_FILE)
+            if (pilihan is None or pusk in pilihan) and os.path.exists(path):
+                hasil.append((periode, pusk, path))
+    return hasil
+
+
+def baca_partisi(path):
+    """Isi satu partisi; dibaca dari disk hanya jika belum di-cache atau file-nya berubah."""
+    global _ukuran_cache
+    mtime = os.stat(path).st_mtime_ns
+    with _LOCK:
+        entry = _CACHE_PARTISI.get(path)
+        if entry is not None and entry[0] == mtime:
+            _CACHE_PARTISI.move_to_end(path)
+            return entry[1]
+
+    # Baca file di luar lock agar sesi lain tidak menunggu I/O
+    df = pd.read_parquet(path)
+    ukuran = int(df.memory_usage(deep=True).sum())
+    batas = MAKS_CACHE_MB * 1024 * 1024
+    with _LOCK:
+        lama = _CACHE_PARTISI.pop(path, None)
+        if lama is not None:
+            _ukuran_cache -= lama[2]
+        if ukuran <= batas:
+            _CACHE_PARTISI[path] = (mtime, df, ukuran)
+            _ukuran_cache += ukuran
+            while _ukuran_cache > batas:
+                _, (_, _, n) = _CACHE_PARTISI.popitem(last=False)
+                _ukuran_cache -= n
+    return df
+
+
+def muat_rentang(awal, akhir, puskesmas=None, root=None):
+    """
+    Partisi dalam rentang sebagai hasil siap-gabung, format sama dengan baca_banyak_file.
+    Returns: list of (id partisi, dataframe, log_dict); id berubah jika partisinya ditulis ulang.
+    """
+    hasil = []
+    for periode, pusk, path in partisi_rentang(awal, akhir, puskesmas, root):
+        label = f"{format_periode(periode)}/{pusk}"
+        log = {'file': label, 'status': 'SUCCESS', 'message': 'Dimuat dari arsip.'}
+        hasil.append((f"{label}:{os.stat(path).st_mtime_ns}", baca_partisi(path), log))
+    return hasil
+
+
+def hitung_tren(awal, akhir, top_n=5, puskesmas=None, kecamatan=None, root=None):
+    """
+    Total kasus per periode untuk Top N penyakit (terbanyak di seluruh rentang).
+    Periode tanpa kasus untuk penyakit tsb tetap muncul dengan nilai 0.
+    Returns: DataFrame long ['Periode', 'Jenis Penyakit', 'ICD X', 'Total_Kasus']
+    """
+    kunci = ['Jenis Penyakit', 'ICD X']
+    bagian = []
+    for periode, _, path in partisi_rentang(awal, akhir, puskesmas, root):
+        df = baca_partisi(path)
+        if kecamatan is not None:
+            df = df[df['Kecamatan'] == kecamatan]
+        agg = df.groupby(kunci, observed=True)['Total_Kasus'].sum().reset_index()
+        agg.insert(0, 'Periode', format_periode(periode))
+        bagian.append(agg)
+    if not bagian:
+        return pd.DataFrame(columns=['Periode'] + kunci + ['Total_Kasus'])
+
+    semua = pd.concat(bagian, ignore_index=True)
+    per_periode = semua.groupby(['Periode'] + kunci, sort=False)['Total_Kasus'].sum()
+    total = per_periode.groupby(level=kunci, sort=True).sum()
+    top = total.sort_values(ascending=False, kind='stable').head(top_n).index
+
+    # Lengkapi kombinasi periode x penyakit agar garis tren tidak terputus
+    periode = sorted(semua['Periode'].unique())
+    lengkap = pd.MultiIndex.from_tuples(
+        [(p,) + k for p in periode for k in top], names=['Periode'] + kunci
+    )
+    return per_periode.reindex(lengkap, fill_value=0).reset_index()
+
+
+def total_per_periode(awal, akhir, puskesmas=None, kecamatan=None, root=None):
+    """
+    Total kasus per bulan x tahun (perbandingan year-over-year).
+    Returns: DataFrame index Bulan (1-12), kolom Tahun
+    """
+    baris = []
+    for (tahun, bulan), _, path in partisi_rentang(awal, akhir, puskesmas, root):
+        df = baca_partisi(path)
+        if kecamatan is not None:
+            df = df[df['Kecamatan'] == kecamatan]
+        baris.append((tahun, bulan, df['Total_Kasus'].sum()))
+    data = pd.DataFrame(baris, columns=['Tahun', 'Bulan', 'Total_Kasus'])
+    return data.pivot_table(index='Bulan', columns='Tahun', values='Total_Kasus', aggfunc='sum')
@@ -0,0 +1,186 @@
+"""
+Benchmark sederhana untuk bagian-bagian kritis aplikasi.
+
+Contoh:
+    python benchmark.py ranking
+    python benchmark.py ranking --rows 10000 1000000
+    python benchmark.py impor
+    python benchmark.py pdf --top-n 10 50
+    python benchmark.py laporan --font /usr/share/fonts/truetype/dejavu/DejaVuSans.ttf
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import pdf_generator
+from logic import hitung_ranking, hitung_rekap, _top_n_per_grup
+from pdf_generator import PDFReport, create_pdf_report
+
+
+def _timeit(fn, repeat=3):
+    """Waktu terbaik (detik) dari beberapa kali eksekusi."""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def buat_data_sintetis(n_rows, n_pusk=39, n_kec=16, n_penyakit=2000, seed=0):
+    """Data mirip master_df: satu baris per (Puskesmas, penyakit) dengan Total_Kasus acak."""
+    rng = np.random.default_rng(seed)
+    pusk = rng.integers(0, n_pusk, n_rows)
+    kode = rng.integers(0, n_penyakit, n_rows)
+    return pd.DataFrame({
+        'Jenis Penyakit': pd.Series(kode).map(lambda k: f'PENYAKIT {k}'),
+        'ICD X': pd.Series(kode).map(lambda k: f'X{k:04d}'),
+        'Total_Kasus': rng.integers(1, 500, n_rows).astype('float64'),
+        'Puskesmas': pd.Series(pusk).map(lambda p: f'PUSK {p}'),
+        'Kecamatan': pd.Series(pusk % n_kec).map(lambda k: f'KEC {k}'),
+    })
+
+
+def _top_n_lama(grouped, group_cols, top_n=10):
+    """Kernel awal hitung_ranking (groupby.apply + sort per grup) sebagai pembanding."""
+    return (
+        grouped.sort_values(group_cols + ['Total_Kasus'])
+        .groupby(group_cols, group_keys=False)
+        .apply(lambda x: x.sort_values('Total_Kasus', ascending=False).head(top_n))
+        .reset_index(drop=True)
+    )
+
+
+def bench_ranking(rows):
+    """Kernel Top-N (setelah groupby-sum) lama vs baru, plus total hitung_ranking."""
+    print(f"{'rows':>12} {'group':>10} {'grouped':>9} {'lama (s)':>10} {'baru (s)':>10} {'speedup':>8} {'total (s)':>10}")
+    for n in rows:
+        df = buat_data_sintetis(n)
+        for group in (['Kecamatan'], ['Puskesmas']):
+            grouped = df.groupby(group + ['Jenis Penyakit', 'ICD X'])['Total_Kasus'].sum().reset_index()
+            t_lama = _timeit(lambda: _top_n_lama(grouped, group))
+            t_baru = _timeit(lambda: _top_n_per_grup(grouped, group, 10))
+            t_total = _timeit(lambda: hitung_ranking(df, group), repeat=1)
+            print(f"{n:>12,} {group[0]:>10} {len(grouped):>9,} {t_lama:>10.4f} {t_baru:>10.4f} "
+                  f"{t_lama / t_baru:>7.1f}x {t_total:>10.4f}")
+
+
+# Diukur di proses Python baru agar benar-benar cold start (tanpa modul ter-cache)
+_SKRIP_IMPOR = {
+    'logic': 'import logic',
+    'export': 'import export',
+    'pdf_generator': 'import pdf_generator',
+    'altair': 'import altair',
+}
+_SKRIP_RENDER = (
+    "from streamlit.testing.v1 import AppTest; "
+    "AppTest.from_file('app.py', default_timeout=120).run()"
+)
+
+
+def _waktu_subproses(kode, repeat):
+    hasil = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-c', kode], check=True, capture_output=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        hasil.append(time.perf_counter() - t0)
+    return statistics.median(hasil)
+
+
+def bench_impor(repeat=5):
+    """Waktu import modul (cold) dan time-to-first-render app.py (tanpa upload)."""
+    dasar = _waktu_subproses('pass', repeat)
+    print(f"{'target':>20} {'median (s)':>11}")
+    print(f"{'python kosong':>20} {dasar:>11.3f}")
+    for nama, kode in _SKRIP_IMPOR.items():
+        print(f"{nama:>20} {_waktu_subproses(kode, repeat) - dasar:>11.3f}")
+    print(f"{'first render app':>20} {_waktu_subproses(_SKRIP_RENDER, repeat) - dasar:>11.3f}")
+
+
+def _tabel_lama(pdf, df):
+    """Jalur awal add_dataframe_table (astype(str) seluruh frame + table() per sel) sebagai pembanding."""
+    pdf.set_font(pdf.theme['font_body'], size=9)
+    pdf._add_table_api([df.columns.tolist()] + df.astype(str).values.tolist())
+
+
+def _render_tabel(df, tabel):
+    pdf = PDFReport()
+    pdf.add_page()
+    tabel(pdf, df)
+    return pdf.output()
+
+
+def bench_pdf(top_ns, n_pusk=39):
+    """Render tabel 'Top N per Puskesmas': table() per sel (lama) vs cell() dengan lebar kolom pra-hitung (baru)."""
+    df = buat_data_sintetis(200_000, n_pusk=n_pusk)
+    print(f"{'top_n':>6} {'baris':>7} {'lama (s)':>10} {'baru (s)':>10} {'speedup':>8}")
+    for top_n in top_ns:
+        ranking = hitung_ranking(df, ['Puskesmas'], top_n)[['Puskesmas', 'Jenis Penyakit', 'Total_Kasus']]
+        t_lama = _timeit(lambda: _render_tabel(ranking, _tabel_lama), repeat=1)
+        t_baru = _timeit(lambda: _render_tabel(ranking, PDFReport.add_dataframe_table))
+        print(f"{top_n:>6} {len(ranking):>7,} {t_lama:>10.3f} {t_baru:>10.3f} {t_lama / t_baru:>7.1f}x")
+
+
+def bench_laporan(jumlah, font=None):
+    """Laporan standar dibuat berturut-turut (tanpa cache PDF): font bawaan vs TTF, parsing font per laporan vs cache per proses."""
+    df = buat_data_sintetis(200_000)
+    top_kec, top_pusk, common_kec, _ = hitung_rekap(df)
+    metrics = {"total_file": 39, "total_pusk": df['Puskesmas'].nunique(), "total_kasus": df['Total_Kasus'].sum()}
+    n_stats = {"kec": 10, "pusk": 10, "umum": 5}
+
+    def laporan(parsing_ulang):
+        for _ in range(jumlah):
+            if parsing_ulang:
+                pdf_generator._CACHE_FONT.clear()
+            create_pdf_report(metrics, top_kec, top_pusk, common_kec, n_stats, cache=False)
+
+    skenario = [('font bawaan', '', False)]
+    if font:
+        skenario += [('TTF, parsing/laporan', font, True), ('TTF, cache font', font, False)]
+    else:
+        print("(tanpa --font / REKAP_PDF_FONT: skenario TTF dilewati)")
+
+    print(f"{'skenario':>22} {'total (s)':>10} {'per laporan (s)':>16}")
+    for label, path, parsing_ulang in skenario:
+        pdf_generator.FONT_KUSTOM.update(helvetica=path, times=path)
+        pdf_generator._CACHE_TEMA.clear()
+        pdf_generator._CACHE_FONT.clear()
+        t = _timeit(lambda: laporan(parsing_ulang), repeat=1)
+        print(f"{label:>22} {t:>10.3f} {t / jumlah:>16.3f}")
+
+
+BENCHMARKS = {
+    'ranking': lambda args: bench_ranking(args.rows),
+    'impor': lambda args: bench_impor(),
+    'pdf': lambda args: bench_pdf(args.top_n),
+    'laporan': lambda args: bench_laporan(args.jumlah, args.font),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('nama', nargs='*', help=f"Benchmark yang dijalankan: {', '.join(BENCHMARKS)} (default: semua)")
+    parser.add_argument('--rows', nargs='+', type=int, default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--top-n', nargs='+', type=int, default=[10, 50], help='Top N untuk benchmark pdf')
+    parser.add_argument('--jumlah', type=int, default=10, help='Jumlah laporan berturut-turut untuk benchmark laporan')
+    parser.add_argument('--font', default=os.environ.get('REKAP_PDF_FONT') or None, help='File .ttf untuk benchmark laporan (default: REKAP_PDF_FONT)')
+    args = parser.parse_args()
+
+    tidak_dikenal = set(args.nama) - set(BENCHMARKS)
+    if tidak_dikenal:
+        parser.error(f"Benchmark tidak dikenal: {', '.join(sorted(tidak_dikenal))}")
+
+    for nama in args.nama or BENCHMARKS:
+        print(f"\n=== {nama} ===")
+        BENCHMARKS[nama](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Rekap Data Kesehatan - mode headless (tanpa Streamlit).
+
+Membaca semua file Excel puskesmas di sebuah folder, menghitung ranking
+seperti Dashboard Utama, lalu menulis hasilnya ke folder output.
+
+Contoh:
+    python cli.py data/2026-09 --output hasil/2026-09
+    python cli.py data/2026-09 --format excel pdf --top-pusk 15 --workers 8
+    python cli.py data/2026-09 --format pdf --batch kecamatan puskesmas
+    python cli.py data/2026-09 --periode 2026-09   # sekaligus simpan ke arsip multi-periode
+"""
+import argparse
+import glob
+import os
+import sys
+
+from logic import KAMUS_PENYAKIT, baca_banyak_file, bangun_dataset, hitung_rekap, ranking_per_entitas
+from export import siapkan_data_ekspor, tulis_excel, tulis_zip_csv, tulis_parquet, tulis_zip_berkas
+from wilayah import puskesmas_ganda
+
+FORMAT = ['excel', 'csv', 'pdf', 'parquet']
+FORMAT_DEFAULT = ['excel', 'csv', 'pdf']
+
+
+def cari_file(folder, rekursif=False):
+    """File Excel puskesmas + master .parquet hasil ekspor sebelumnya."""
+    hasil = []
+    for ekstensi in ('*.xlsx', '*.parquet'):
+        pola = os.path.join(folder, '**', ekstensi) if rekursif else os.path.join(folder, ekstensi)
+        hasil += glob.glob(pola, recursive=rekursif)
+    # Lewati file lock Excel (~$nama.xlsx)
+    return sorted(p for p in hasil if not os.path.basename(p).startswith('~$'))
+
+
+def _tulis(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    print(f"  -> {path}")
+
+
+def _tulis_stream(path, tulis, data):
+    """Writer streaming langsung ke file tujuan, tanpa menampung hasil di memori."""
+    with open(path, 'wb') as f:
+        tulis(data, f)
+    print(f"  -> {path}")
+
+
+def _periode(teks):
+    from arsip import parse_periode
+    try:
+        return parse_periode(teks)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def jalankan(args):
+    files = cari_file(args.folder, args.rekursif)
+    if not files:
+        print(f"Tidak ada file .xlsx/.parquet di {args.folder}", file=sys.stderr)
+        return 1
+
+    print(f"Memproses {len(files)} file...")
+    payloads = []
+    for path in files:
+        with open(path, 'rb') as f:
+            payloads.append((os.path.basename(path), f.read()))
+
+    master_df, kubus, logs = bangun_dataset(baca_banyak_file(payloads, max_workers=args.workers))
+
+    # Laporan kualitas data
+    for log in logs:
+        if log['status'] != 'SUCCESS':
+            print(f"  [{log['status']}] {log['file']}: {log['message']}", file=sys.stderr)
+    for pusk, daftar in puskesmas_ganda(logs).items():
+        print(f"  [WARNING] {len(daftar)} file digabung sebagai Puskesmas {pusk}: {', '.join(daftar)}", file=sys.stderr)
+    n_ok = sum(log['status'] == 'SUCCESS' for log in logs)
+    print(f"Berhasil: {n_ok}/{len(logs)} file")
+
+    if master_df.empty:
+        print("Tidak ada data valid yang dapat diolah.", file=sys.stderr)
+        return 1
+
+    if args.periode:
+        from arsip import ARSIP_DIR, format_periode, simpan_periode
+        n = simpan_periode(KAMUS_PENYAKIT.dekode(master_df), *args.periode)
+        print(f"Arsip: {n} puskesmas disimpan sebagai periode {format_periode(args.periode)} di {ARSIP_DIR}")
+
+    n_stats = {"kec": args.top_kec, "pusk": args.top_pusk, "umum": args.top_umum}
+    top_kec, top_pusk, common_kec, _ = hitung_rekap(kubus, args.top_kec, args.top_pusk, args.top_umum)
+
+    os.makedirs(args.output, exist_ok=True)
+    data = siapkan_data_ekspor(master_df, top_kec, top_pusk, common_kec, n_stats)
+
+    if 'excel' in args.format:
+        _tulis_stream(os.path.join(args.output, "REKAP_HASIL.xlsx"), tulis_excel, data)
+    if 'csv' in args.format:
+        _tulis_stream(os.path.join(args.output, "REKAP_CSV.zip"), tulis_zip_csv, data)
+    if 'parquet' in args.format:
+        # Satu file per dataset agar bisa langsung dimuat ke warehouse / di-upload ulang
+        for k, v in data.items():
+            _tulis_stream(os.path.join(args.output, f"{k}.parquet"), tulis_parquet, v)
+    if 'pdf' in args.format or args.batch:
+        # fpdf2 cukup berat di-import: hanya dimuat jika ada output PDF
+        from pdf_generator import create_pdf_report, create_batch_pdf
+    if 'pdf' in args.format:
+        metrics = {
+            "total_file": len(files),
+            "total_pusk": kubus['Puskesmas'].nunique(),
+            "total_kasus": kubus['Total_Kasus'].sum()
+        }
+        pdf_bytes = create_pdf_report(metrics, top_kec, top_pusk, common_kec, n_stats, theme_name=args.tema)
+        _tulis(os.path.join(args.output, "Laporan_Rekap_Penyakit.pdf"), bytes(pdf_bytes))
+    for scope in args.batch or []:
+        # Satu PDF drill-down per wilayah, dikemas dalam satu ZIP
+        scope = scope.capitalize()
+        per_entitas = ranking_per_entitas(kubus, scope, top_n=args.top_batch)
+        berkas = create_batch_pdf("Laporan Detail Wilayah", scope, per_entitas, theme_name=args.tema, max_workers=args.workers)
+        _tulis_stream(os.path.join(args.output, f"Laporan_per_{scope}.zip"), tulis_zip_berkas, berkas)
+
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('folder', help='Folder berisi file Excel laporan puskesmas (.xlsx) atau master .parquet')
+    parser.add_argument('-o', '--output', default='hasil_rekap', help='Folder output (default: hasil_rekap)')
+    parser.add_argument('-f', '--format', nargs='+', choices=FORMAT, default=FORMAT_DEFAULT, help='Format output (default: excel csv pdf)')
+    parser.add_argument('-r', '--rekursif', action='store_true', help='Cari file .xlsx sampai ke subfolder')
+    parser.add_argument('--top-kec', type=int, default=10, help='Top N penyakit per Kecamatan (default: 10)')
+    parser.add_argument('--top-pusk', type=int, default=10, help='Top N penyakit per Puskesmas (default: 10)')
+    parser.add_argument('--top-umum', type=int, default=5, help='Top N analisis penyakit umum (default: 5)')
+    parser.add_argument('--batch', nargs='+', choices=['kecamatan', 'puskesmas'], help='Tambahan: ZIP berisi satu PDF per Kecamatan/Puskesmas')
+    parser.add_argument('--top-batch', type=int, default=20, help='Top N penyakit per wilayah untuk --batch (default: 20)')
+    parser.add_argument('--periode', type=_periode, metavar='YYYY-MM', help='Simpan data ke arsip lokal sebagai periode ini (butuh pyarrow)')
+    parser.add_argument('--tema', default='Modern Minimalist', help='Tema laporan PDF (default: Modern Minimalist)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Jumlah worker proses (default: REKAP_WORKERS / jumlah core)')
+    args = parser.parse_args(argv)
+    if 'pdf' in args.format or args.batch:
+        from pdf_generator import THEMES
+        if args.tema not in THEMES:
+            parser.error(f"--tema: pilihan tidak valid: {args.tema!r} (pilih dari {', '.join(map(repr, THEMES))})")
+    return jalankan(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import os
+import hashlib
+import tempfile
+import threading
+import time
+
+# Lokasi & batas ukuran cache disk (bisa di-override lewat environment).
+# Batas berlaku per namespace: cache parsing & cache PDF masing-masing boleh sampai CACHE_MB.
+CACHE_DIR = os.environ.get('REKAP_CACHE_DIR', os.path.join(os.getcwd(), '.rekap_cache'))
+CACHE_MB = int(os.environ.get('REKAP_CACHE_MB', '512') or 0)
+
+# Folder cache bisa ikut diisi proses lain (worker pool, replika server): total ukuran yang
+# dicatat di memori disinkronkan ulang dengan isi folder paling lambat setiap sekian detik
+SINKRON_DETIK = 60
+
+
+def hash_bytes(*parts):
+    """SHA-256 dari gabungan beberapa potong bytes/str (kunci cache berbasis isi)."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        # Prefix panjang agar ('ab','c') tidak bentrok dengan ('a','bc')
+        h.update(len(part).to_bytes(8, 'little'))
+        h.update(part)
+    return h.hexdigest()
+
+
+class DiskCache:
+    """
+    Cache blob sederhana di disk dengan batas ukuran & eviksi LRU.
+    Satu entry = satu file; waktu akses dicatat lewat mtime sehingga
+    bertahan walau server restart/redeploy.
+    Total ukuran dicatat berjalan di memori; folder hanya di-scan saat batas terlewati
+    (atau catatan sudah lebih lama dari SINKRON_DETIK), bukan di setiap put.
+    """
+
+    def __init__(self, namespace, directory=None, max_mb=None, suffix='.bin'):
+        self.directory = os.path.join(directory or CACHE_DIR, namespace)
+        self.max_bytes = (CACHE_MB if max_mb is None else max_mb) * 1024 * 1024
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._total = None  # Perkiraan total ukuran entry (None = belum pernah scan)
+        self._waktu_scan = 0.0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """Ambil isi entry (bytes) atau None jika tidak ada."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Tandai baru dipakai (LRU)
+            return data
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        """Simpan entry secara atomik lalu jalankan eviksi jika melebihi batas."""
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        try:
+            lama = os.path.getsize(path)
+        except OSError:
+            lama = 0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                # File sementara setengah jadi tidak boleh tertinggal di folder cache
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+        except OSError:
+            # Cache bersifat opsional: disk penuh/read-only tidak boleh menggagalkan proses
+            return
+        with self._lock:
+            if self._total is not None:
+                self._total += len(data) - lama
+            if (self._total is None or self._total > self.max_bytes
+                    or time.monotonic() - self._waktu_scan > SINKRON_DETIK):
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries():
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+            self._total = None
+
+    def _entries(self):
+        try:
+            return [e for e in os.scandir(self.directory) if e.name.endswith(self.suffix)]
+        except OSError:
+            return []
+
+    def _evict(self):
+        """Scan folder (sinkron ulang total ukuran) lalu hapus entry LRU jika melebihi batas. Dipanggil dengan _lock."""
+        stats = []
+        for entry in self._entries():
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            stats.append((st.st_mtime, st.st_size, entry.path))
+
+        total = sum(size for _, size, _ in stats)
+        self._waktu_scan = time.monotonic()
+        if total > self.max_bytes:
+            # Hapus entry paling lama tidak dipakai sampai di bawah batas
+            for _, size, path in sorted(stats):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self._total = total
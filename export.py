@@ -0,0 +1,267 @@
+import importlib.util
+import io
+import tempfile
+import threading
+import time
+
+from logic import KAMUS_PENYAKIT
+
+MIME_EXCEL = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Writer XLSX streaming: xlsxwriter (constant_memory) jika terpasang, selain itu openpyxl write-only
+ENGINE_XLSX = 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') else 'openpyxl'
+
+# Jumlah baris yang dikonversi/ditulis per batch saat menulis sheet atau CSV
+UKURAN_CHUNK = 10_000
+
+# File ekspor disimpan di memori sampai ukuran ini, selebihnya otomatis pindah ke file temp di disk
+BATAS_SPOOL_MB = 16
+
+# Ukuran potongan saat file ekspor dibaca untuk diunduh
+UKURAN_BACA = 1024 * 1024
+
+# Format kolumnar (Parquet/Feather) butuh pyarrow
+ADA_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+def nama_dataset_ekspor(n_stats):
+    """Nama dataset yang bisa diunduh, sesuai urutan tampil."""
+    return ["Data Mentah", f"Top {n_stats['kec']} Kecamatan", f"Top {n_stats['pusk']} Puskesmas", "Analisis Umum"]
+
+
+def siapkan_data_ekspor(df_view, top_kec, top_pusk, common_kec, n_stats, pilihan=None):
+    """
+    Kumpulan dataset yang bisa diunduh (nama -> DataFrame), sama untuk UI maupun CLI.
+    pilihan: subset nama dataset (None = semua). Data Mentah hanya didekode jika dipilih.
+    """
+    nama = nama_dataset_ekspor(n_stats)
+    sumber = dict(zip(nama, [None, top_kec, top_pusk, common_kec]))
+    data = {}
+    for k in nama:
+        if pilihan is None or k in pilihan:
+            data[k] = KAMUS_PENYAKIT.dekode(df_view) if k == "Data Mentah" else sumber[k]
+    return data
+
+
+def nama_sheet(nama):
+    """Nama sheet Excel yang valid: maks 30 karakter, huruf/angka/underscore."""
+    sheet = nama[:30].replace(" ", "_").upper()
+    return "".join(c for c in sheet if c.isalnum() or c == "_")
+
+
+def _baris(df):
+    """Iterator baris (list objek Python, NaN -> None) per chunk agar memori tetap kecil."""
+    yield [str(c) for c in df.columns]
+    for awal in range(0, len(df), UKURAN_CHUNK):
+        chunk = df.iloc[awal:awal + UKURAN_CHUNK].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def tulis_excel(data, target):
+    """Tulis satu sheet per dataset, baris demi baris (streaming), ke file-like `target`."""
+    if ENGINE_XLSX == 'xlsxwriter':
+        import xlsxwriter
+        wb = xlsxwriter.Workbook(target, {'constant_memory': True})
+        for k, v in data.items():
+            ws = wb.add_worksheet(nama_sheet(k))
+            for i, row in enumerate(_baris(v)):
+                ws.write_row(i, 0, row)
+        wb.close()
+    else:
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        for k, v in data.items():
+            ws = wb.create_sheet(nama_sheet(k))
+            for row in _baris(v):
+                ws.append(list(row))
+        wb.save(target)
+
+
+def tulis_csv(df, target):
+    """Tulis CSV per chunk ke text stream `target` (header hanya di chunk pertama)."""
+    if df.empty:
+        df.to_csv(target, index=False)
+        return
+    for awal in range(0, len(df), UKURAN_CHUNK):
+        df.iloc[awal:awal + UKURAN_CHUNK].to_csv(target, index=False, header=awal == 0)
+
+
+def _tulis_teks(tulis, df, f):
+    teks = io.TextIOWrapper(f, encoding="utf-8", newline="")
+    tulis(df, teks)
+    teks.detach()  # Flush tanpa ikut menutup file tujuan
+
+
+def tulis_csv_biner(df, target):
+    """CSV UTF-8 ke file biner `target`."""
+    _tulis_teks(tulis_csv, df, target)
+
+
+def _tabel_arrow(df):
+    """Tabel Arrow dengan kolom teks sebagai dictionary (kategori) agar hemat & tipe kembali utuh saat dibaca."""
+    import pyarrow as pa
+
+    teks = [c for c in df.columns if df[c].dtype == object]
+    if teks:
+        df = df.astype({c: 'category' for c in teks})
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def tulis_parquet(df, target):
+    import pyarrow.parquet as pq
+
+    pq.write_table(_tabel_arrow(df), target, compression="zstd")
+
+
+def tulis_feather(df, target):
+    """Arrow IPC (Feather v2)."""
+    import pyarrow.feather as feather
+
+    feather.write_feather(_tabel_arrow(df), target)
+
+
+# format -> (ekstensi, MIME, writer satu dataset, kompres entry ZIP)
+FORMAT_BERKAS = {
+    "CSV": ("csv", "text/csv", tulis_csv_biner, True),
+    "Parquet": ("parquet", "application/vnd.apache.parquet", tulis_parquet, False),
+    "Feather": ("feather", "application/vnd.apache.arrow.file", tulis_feather, False),
+}
+
+
+def format_ekspor():
+    """Format unduhan yang tersedia di lingkungan ini."""
+    return ["Excel", "CSV"] + (["Parquet", "Feather"] if ADA_PYARROW else [])
+
+
+def tulis_zip(data, target, fmt="CSV"):
+    """Satu file per dataset, ditulis langsung ke entry ZIP di file-like `target`."""
+    import zipfile
+
+    ekstensi, _, tulis, kompres = FORMAT_BERKAS[fmt]
+    # Parquet/Feather sudah terkompresi di dalam, jadi entry-nya cukup disimpan apa adanya
+    metode = zipfile.ZIP_DEFLATED if kompres else zipfile.ZIP_STORED
+    with zipfile.ZipFile(target, "w", compression=metode) as zf:
+        for k, v in data.items():
+            with _entry_zip(zf, f"{k}.{ekstensi}", metode) as entry:
+                tulis(v, entry)
+
+
+def _entry_zip(zf, nama, metode):
+    import zipfile
+
+    info = zipfile.ZipInfo(nama, date_time=time.localtime()[:6])
+    info.compress_type = metode
+    # force_zip64: ukuran entry belum diketahui saat mulai ditulis (bisa > 2 GB)
+    return zf.open(info, "w", force_zip64=True)
+
+
+def tulis_zip_berkas(berkas, target):
+    """File jadi (nama file -> bytes, mis. PDF per wilayah) ke ZIP tanpa kompresi ulang."""
+    import zipfile
+
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_STORED) as zf:
+        for nama, isi in berkas.items():
+            with _entry_zip(zf, nama, zipfile.ZIP_STORED) as entry:
+                entry.write(isi)
+
+
+def tulis_zip_csv(data, target):
+    """Satu CSV per dataset, ditulis per chunk langsung ke entry ZIP terkompresi di file-like `target`."""
+    tulis_zip(data, target, "CSV")
+
+
+class _Spool(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile dengan lock sendiri untuk seek+read (lihat PembacaEkspor)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+
+
+def _spool(tulis, *args):
+    """Jalankan writer ke file spool lalu kembalikan file-nya (posisi di awal)."""
+    f = _Spool(max_size=BATAS_SPOOL_MB * 1024 * 1024)
+    tulis(*args, f)
+    f.seek(0)
+    return f
+
+
+def buat_excel(data):
+    """Satu workbook, satu sheet per dataset. Returns: file-like .xlsx (spooled)"""
+    return _spool(tulis_excel, data)
+
+
+def buat_berkas(df, fmt="CSV"):
+    """Satu dataset dalam format `fmt` (CSV/Parquet/Feather). Returns: file-like (spooled)"""
+    return _spool(FORMAT_BERKAS[fmt][2], df)
+
+
+def buat_zip(data, fmt="CSV"):
+    """Satu file per dataset di dalam ZIP. Returns: file-like .zip (spooled)"""
+    def tulis(data, f):
+        tulis_zip(data, f, fmt)
+    return _spool(tulis, data)
+
+
+def buat_zip_berkas(berkas):
+    """ZIP berisi file jadi (nama file -> bytes). Returns: file-like .zip (spooled)"""
+    return _spool(tulis_zip_berkas, berkas)
+
+
+class PembacaEkspor(io.RawIOBase):
+    """
+    Handle baca per unduhan atas file hasil buat_* (dimemo & dipakai beberapa sesi/rerun sekaligus).
+    Posisi baca milik handle ini sendiri; file bersama hanya dikunci selama seek+read satu potongan
+    dengan lock file itu, jadi unduhan file lain tidak ikut menunggu.
+    """
+
+    def __init__(self, f):
+        super().__init__()
+        self._f = f
+        self._posisi = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._posisi
+
+    def seek(self, posisi, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            posisi += self._posisi
+        elif whence == io.SEEK_END:
+            with self._f.lock:
+                posisi += self._f.seek(0, io.SEEK_END)
+        self._posisi = max(posisi, 0)
+        return self._posisi
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            return self.readall()
+        with self._f.lock:
+            self._f.seek(self._posisi)
+            data = self._f.read(n)
+        self._posisi += len(data)
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def readall(self):
+        potongan = []
+        while True:
+            data = self.read(UKURAN_BACA)
+            if not data:
+                return b"".join(potongan)
+            potongan.append(data)
+
+
+def buka_unduhan(f):
+    """Handle baca baru (dari awal) untuk file hasil buat_*, mis. untuk st.download_button."""
+    return PembacaEkspor(f)
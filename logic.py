@@ -1,74 +1,233 @@
 import pandas as pd
 import os
-import streamlit as st
-
-# Mapping nama Puskesmas ke Kecamatan
-MAPPING_KECAMATAN = {
-    'PONCOL': 'SEMARANG TENGAH', 'MIROTO': 'SEMARANG TENGAH',
-    'BANDARHARJO': 'SEMARANG UTARA', 'BULU LOR': 'SEMARANG UTARA',
-    'HALMAHERA': 'SEMARANG TIMUR', 'KARANGDORO': 'SEMARANG TIMUR', 'BUGANGAN': 'SEMARANG TIMUR',
-    'LAMPER TENGAH': 'SEMARANG SELATAN', 'PANDANARAN': 'SEMARANG SELATAN',
-    'LEBDOSARI': 'SEMARANG BARAT', 'KROBOKAN': 'SEMARANG BARAT', 'MANYARAN': 'SEMARANG BARAT',
-    'NGEMPLAK SIMONGAN': 'SEMARANG BARAT', 'KARANGAYU': 'SEMARANG BARAT',
-    'GAYAMSARI': 'GAYAMSARI', 'CANDILAMA': 'CANDISARI', 'KAGOK': 'CANDISARI',
-    'PEGANDAN': 'GAJAHMUNGKUR', 'BANGETAYU': 'GENUK', 'GENUK': 'GENUK',
-    'TLOGOSARI KULON': 'PEDURUNGAN', 'TLOGOSARI WETAN': 'PEDURUNGAN', 'PLAMONGANSARI': 'PEDURUNGAN',
-    'ROWOSARI': 'TEMBALANG', 'KEDUNGMUNDU': 'TEMBALANG', 'BULUSAN': 'TEMBALANG',
-    'NGEREP': 'BANYUMANIK', 'PADANGSARI': 'BANYUMANIK', 'PUPAY': 'BANYUMANIK', 'SRONDOL': 'BANYUMANIK',
-    'SEKARAN': 'GUNUNGPATI', 'GUNUNGPATI': 'GUNUNGPATI', 'MIJEN': 'MIJEN', 'KARANGMALANG': 'MIJEN',
-    'PURWOYOSO': 'NGALIYAN', 'TAMBAKAJI': 'NGALIYAN', 'NGALIYAN': 'NGALIYAN',
-    'KARANGANYAR': 'TUGU', 'MANGKANG': 'TUGU'
-}
-
-def baca_dan_bersihkan_file(uploaded_file):
-    """
-    Membaca file Excel.
+import importlib.util
+import concurrent.futures
+import multiprocessing
+from concurrent.futures.process import BrokenProcessPool
+import json
+import threading
+import weakref
+from collections import Counter
+from io import BytesIO
+import numpy as np
+from pandas.api.types import union_categoricals
+
+from disk_cache import DiskCache, hash_bytes
+from wilayah import RESOLVER, TIDAK_TERDAFTAR
+
+# Jumlah worker proses untuk ingest paralel (0 = otomatis sesuai jumlah core, 1 = serial)
+JUMLAH_WORKER = int(os.environ.get('REKAP_WORKERS', '0') or 0)
+
+# Naikkan setiap kali logika baca_dan_bersihkan_file berubah agar cache lama tidak terpakai
+VERSI_PARSER = '5'
+
+# Deteksi engine Excel sekali saat import: calamine (Rust) jika terpasang, selain itu openpyxl
+ENGINE_EXCEL = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+# Hanya kolom A (index 0) s/d AY (index 50) yang dipakai: kolom teks + kolom angka D-AY
+JUMLAH_KOLOM_DIBACA = 51
+BARIS_HEADER = 1
+
+# Cache hasil parsing per file (Parquet) yang bertahan walau server restart
+_CACHE_PARSING = DiskCache('parsed', suffix='.parquet')
+
+# Mapping nama Puskesmas ke Kecamatan (dari file CSV eksternal, lihat wilayah.py)
+MAPPING_KECAMATAN = RESOLVER.mapping
+
+def _baris_ke_dataframe(rows):
+    """
+    Susun DataFrame dari iterator baris mentah (header di baris ke-2, kolom A-AY saja).
+    Sel kosong jadi NaN seperti pd.read_excel, sehingga standardisasi teks tetap menghasilkan 'NAN'.
+    Baris dipotong ke kolom AY sambil dibaca; sel kosong diganti NaN sekaligus per DataFrame.
+    """
+    header, data = None, []
+    for i, row in enumerate(rows):
+        if i < BARIS_HEADER:
+            continue
+        if header is None:
+            header = [None if v == '' else v for v in row[:JUMLAH_KOLOM_DIBACA]]
+        else:
+            data.append(row[:JUMLAH_KOLOM_DIBACA])
+
+    if header is None:
+        return pd.DataFrame()
+
+    # Samakan dengan pd.read_excel: header kosong -> 'Unnamed: i', duplikat -> 'Nama.1'
+    kolom, seen = [], {}
+    for i, nama in enumerate(header):
+        nama = f'Unnamed: {i}' if nama is None else nama
+        if nama in seen:
+            seen[nama] += 1
+            nama = f'{nama}.{seen[nama]}'
+        else:
+            seen[nama] = 0
+        kolom.append(nama)
+
+    df = pd.DataFrame(data, columns=range(len(kolom)), dtype=object) if data else pd.DataFrame(columns=range(len(kolom)))
+    df = df.mask(df.isna() | df.eq('')).infer_objects()
+    df.columns = kolom
+    return df
+
+def _baca_excel(uploaded_file):
+    """
+    Membaca sheet pertama sekali jalan dengan engine yang terdeteksi saat import.
+    Tidak ada baca ulang: jika file rusak, error langsung dilaporkan.
+    """
+    if ENGINE_EXCEL == 'calamine':
+        from python_calamine import CalamineWorkbook
+        sheet = CalamineWorkbook.from_filelike(uploaded_file).get_sheet_by_index(0)
+        # iter_rows: baris dikonversi satu per satu dan langsung dipotong ke kolom AY,
+        # tanpa menampung seluruh lebar sheet sebagai list Python
+        return _baris_ke_dataframe(sheet.iter_rows())
+
+    # Fallback: openpyxl mode streaming (read_only + values_only), hanya sampai kolom AY
+    from openpyxl import load_workbook
+    wb = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        return _baris_ke_dataframe(ws.iter_rows(max_col=JUMLAH_KOLOM_DIBACA, values_only=True))
+    finally:
+        wb.close()
+
+# Kolom master hasil ingest (juga isi 'Data Mentah' yang diekspor)
+KOLOM_MASTER = ['Jenis Penyakit', 'ICD X', 'Total_Kasus', 'Puskesmas', 'Kecamatan']
+
+def is_parquet(nama_file):
+    return nama_file.lower().endswith('.parquet')
+
+def _baca_parquet(uploaded_file, log):
+    """
+    Membaca master Parquet hasil ekspor 'Data Mentah' (bisa berisi banyak puskesmas).
+    Nama Puskesmas & Kecamatan diambil dari isi file, bukan dari nama file.
+    """
+    df = pd.read_parquet(uploaded_file)
+    hilang = [c for c in KOLOM_MASTER if c not in df.columns]
+    if hilang:
+        log['status'] = 'ERROR'
+        log['message'] = f"Kolom wajib tidak ditemukan: {hilang}"
+        return pd.DataFrame(), log
+
+    df = df[KOLOM_MASTER].copy()
+    for col in ['Jenis Penyakit', 'ICD X']:
+        df[col] = df[col].astype(str)
+    df['Total_Kasus'] = df['Total_Kasus'].astype('float64')
+    for col in ['Puskesmas', 'Kecamatan']:
+        df[col] = df[col].astype('category')
+    df = df[df['Total_Kasus'] > 0].reset_index(drop=True)
+
+    if df.empty:
+        log['status'] = 'WARNING'
+        log['message'] = 'File valid tapi tidak ada data kasus (>0).'
+    else:
+        log['message'] = f"Master Parquet dimuat ({df['Puskesmas'].nunique()} puskesmas)."
+    return df, log
+
+def _bisa_int32(nilai, n_kolom):
+    """True jika semua nilai bulat & jumlah n_kolom nilai per baris pasti muat di int32."""
+    return bool(
+        np.isfinite(nilai).all()
+        and (nilai == np.round(nilai)).all()
+        and np.abs(nilai).max(initial=0) * max(n_kolom, 1) < 2 ** 31
+    )
+
+def _angka_blok(blok):
+    """
+    Konversi blok kolom D-AY ke angka sekaligus (bukan apply to_numeric per kolom). Sel kosong/non-angka = 0.
+    Blok campuran (object) di-factorize dulu, jadi to_numeric hanya dijalankan pada nilai unik
+    (biasanya beberapa ratus) lalu hasilnya disebar lagi lewat kode.
+    Returns: array 2D int32 jika semua nilai bulat, selain itu float64.
+    """
+    n_kolom = blok.shape[1]
+    if all(pd.api.types.is_numeric_dtype(t) for t in blok.dtypes):
+        nilai = blok.to_numpy(dtype=np.float64)
+        nilai[np.isnan(nilai)] = 0
+        return nilai.astype(np.int32) if _bisa_int32(nilai, n_kolom) else nilai
+
+    arr = blok.to_numpy(dtype=object)
+    # Ikuti layout memori blok (sering column-major) agar ravel tidak menyalin array lagi
+    urutan = 'F' if arr.flags.f_contiguous else 'C'
+    kode, unik = pd.factorize(arr.ravel(order=urutan))
+    angka = pd.to_numeric(pd.Series(unik, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+    angka = np.append(angka, 0.0)  # kode -1 (sel kosong/NaN) -> elemen terakhir = 0
+    angka[np.isnan(angka)] = 0
+    if _bisa_int32(angka, n_kolom):
+        angka = angka.astype(np.int32)
+    return angka[kode].reshape(arr.shape, order=urutan)
+
+def baca_dan_bersihkan_file(uploaded_file, rincian=False):
+    """
+    Membaca file Excel, atau file master Parquet hasil ekspor sebelumnya.
+    rincian: True = sertakan juga kolom D-AY per kelompok umur/jenis kelamin (int32, atau float32 jika
+    ada pecahan; nama kolom sesuai header sheet) untuk analisis lanjutan. Tidak berlaku untuk master Parquet.
     Returns: (dataframe, log_dict)
     log_dict = {'file': str, 'status': 'SUCCESS'|'WARNING'|'ERROR', 'message': str}
+    (+ 'puskesmas', 'kecamatan', 'confidence' hasil pencocokan nama file untuk file Excel)
     """
     log = {'file': uploaded_file.name, 'status': 'SUCCESS', 'message': 'Berhasil diproses.'}
     
     try:
-        # Ambil nama puskesmas dari nama file
-        nama_pusk = os.path.splitext(uploaded_file.name)[0].upper().strip()
-        kecamatan = MAPPING_KECAMATAN.get(nama_pusk, 'TIDAK TERDAFTAR')
+        if is_parquet(uploaded_file.name):
+            return _baca_parquet(uploaded_file, log)
 
-        # OPTIMASI 1: Coba pakai engine 'calamine' (Rust) yang super cepat
-        try:
-            df = pd.read_excel(uploaded_file, header=1, engine='calamine')
-        except Exception:
-            # Fallback ke engine default (openpyxl) jika calamine gagal/belum install
-            uploaded_file.seek(0)
-            df = pd.read_excel(uploaded_file, header=1)
+        # Ambil nama puskesmas dari nama file (dinormalisasi & dicocokkan ke mapping)
+        wilayah = RESOLVER.cari(uploaded_file.name)
+        nama_pusk, kecamatan = wilayah['puskesmas'], wilayah['kecamatan']
+        log.update(puskesmas=nama_pusk, kecamatan=kecamatan, confidence=wilayah['confidence'])
+        if wilayah['metode'] == 'fuzzy':
+            log['status'] = 'WARNING'
+            log['message'] = f"Nama file dicocokkan ke {nama_pusk} (confidence {wilayah['confidence']:.2f}), mohon dicek."
+        elif kecamatan == TIDAK_TERDAFTAR:
+            kandidat = wilayah.get('kandidat')
+            log['status'] = 'WARNING'
+            log['message'] = "Nama puskesmas tidak terdaftar di mapping" + (f" (mungkin: {kandidat})." if kandidat else ".")
+
+        # OPTIMASI 1: Engine 'calamine' (Rust) jika tersedia, openpyxl streaming jika tidak.
+        # Hanya kolom A-AY yang dibaca, dan file hanya di-parse satu kali.
+        df = _baca_excel(uploaded_file)
 
-        # 1. Filter Baris Sampah (Total/Jumlah)
+        hilang = [c for c in ('Jenis Penyakit', 'ICD X') if c not in df.columns]
+        if hilang:
+            log['status'] = 'ERROR'
+            log['message'] = f"Kolom wajib tidak ditemukan: {hilang}"
+            return pd.DataFrame(), log
+
+        # 1. Filter Baris Sampah (Total/Jumlah): cukup dari kolom teks, sebelum konversi apa pun
         mask_sampah = df['Jenis Penyakit'].astype(str).str.contains(
             'TOTAL|JUMLAH|SUB TOTAL', case=False, na=False
         )
-        df = df[~mask_sampah]
+        baris = np.flatnonzero(~mask_sampah.to_numpy())
 
-        # 2. Sum Kolom D (Index 3) sampai AY (Index 50)
-        data_angka = df.iloc[:, 3:51].apply(pd.to_numeric, errors='coerce').fillna(0)
-        df['Total_Kasus'] = data_angka.sum(axis=1)
+        # 2. Sum Kolom D (Index 3) sampai AY (Index 50), hanya untuk baris yang lolos.
+        # Akumulasi int32 jika semua bulat (eksak); float tetap dijumlah dalam float64
+        blok = df.iloc[baris, 3:51]
+        data_angka = _angka_blok(blok)
+        total = data_angka.sum(axis=1, dtype=np.int32 if data_angka.dtype == np.int32 else np.float64)
+        total = total.astype(np.float64)
 
-        # 3. Standardisasi Teks
-        df['Jenis Penyakit'] = df['Jenis Penyakit'].astype(str).str.strip().str.upper()
-        df['ICD X'] = df['ICD X'].astype(str).str.strip().str.upper()
-
-        # 4. Ambil Kolom Penting Saja
-        try:
-            clean_df = df[['Jenis Penyakit', 'ICD X', 'Total_Kasus']].copy()
-        except KeyError as e:
-            log['status'] = 'ERROR'
-            log['message'] = f"Kolom wajib tidak ditemukan: {str(e)}"
-            return pd.DataFrame(), log
+        # Hanya ambil yang ada kasusnya; teks baru distandardisasi setelah disaring
+        ada_kasus = total > 0
+        baris = baris[ada_kasus]
 
-        # OPTIMASI 2: Gunakan Category untuk hemat memori
-        clean_df['Puskesmas'] = pd.Series([nama_pusk] * len(clean_df)).astype('category')
-        clean_df['Kecamatan'] = pd.Series([kecamatan] * len(clean_df)).astype('category')
+        # 3. Standardisasi Teks + 4. Ambil Kolom Penting Saja (langsung dari array, tanpa copy frame)
+        def teks(col):
+            return pd.Series(df[col].to_numpy()[baris]).astype(str).str.strip().str.upper()
 
-        # Hanya ambil yang ada kasusnya
-        clean_df = clean_df[clean_df['Total_Kasus'] > 0]
+        # OPTIMASI 2: Kolom wilayah berisi satu nilai -> Categorical dari kode 0 (1 byte/baris)
+        kode_wilayah = np.zeros(len(baris), dtype=np.int8)
+        clean_df = pd.DataFrame({
+            'Jenis Penyakit': teks('Jenis Penyakit'),
+            'ICD X': teks('ICD X'),
+            'Total_Kasus': total[ada_kasus],
+            'Puskesmas': pd.Categorical.from_codes(kode_wilayah, [nama_pusk]),
+            'Kecamatan': pd.Categorical.from_codes(kode_wilayah, [kecamatan]),
+        })
+        if rincian:
+            per_kolom = data_angka[ada_kasus]
+            if per_kolom.dtype != np.int32:
+                per_kolom = per_kolom.astype(np.float32)
+            clean_df = pd.concat(
+                [clean_df, pd.DataFrame(per_kolom, columns=[str(c) for c in blok.columns])], axis=1
+            )
         
         if clean_df.empty:
             log['status'] = 'WARNING'
@@ -82,39 +241,733 @@ def baca_dan_bersihkan_file(uploaded_file):
         log['message'] = f"Gagal memproses: {str(e)}"
         return pd.DataFrame(), log
 
-def hitung_ranking(df, group_cols, top_n=10):
-    """Menghitung Top N penyakit berdasarkan grup (Kecamatan/Puskesmas)."""
-    # Grouping unik (menggabungkan penyakit yang sama dalam grup tersebut)
-    agg_cols = group_cols + ['Jenis Penyakit', 'ICD X']
-    grouped = df.groupby(agg_cols)['Total_Kasus'].sum().reset_index()
-
-    result = (
-        grouped.sort_values(group_cols + ['Total_Kasus'])
-        .groupby(group_cols, group_keys=False)
-        .apply(lambda x: x.sort_values('Total_Kasus', ascending=False).head(top_n))
+def _proses_bytes(nama_file, isi_file, rincian=False):
+    """Entry point worker: bungkus bytes mentah jadi file-like lalu proses."""
+    buf = BytesIO(isi_file)
+    buf.name = nama_file
+    return baca_dan_bersihkan_file(buf, rincian)
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def ukuran_pool():
+    """Jumlah worker pool bersama (env REKAP_WORKERS, default jumlah core)."""
+    return JUMLAH_WORKER or os.cpu_count() or 1
+
+def _ambil_pool(ukuran=None):
+    """
+    Satu pool proses berukuran tetap per proses, dipakai bersama semua sesi & dipakai ulang
+    antar rerun agar biaya start worker hanya sekali. Tidak pernah di-resize per pemanggilan:
+    `ukuran` (default ukuran_pool()) hanya berlaku saat pool dibuat.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # 'spawn' lebih aman daripada fork di dalam server Streamlit yang multi-thread
+            _POOL = concurrent.futures.ProcessPoolExecutor(
+                max_workers=ukuran or ukuran_pool(), mp_context=multiprocessing.get_context('spawn')
+            )
+        return _POOL
+
+def _tutup_pool(pool=None):
+    """Buang pool yang rusak; jika `pool` diberikan, hanya bila itu masih pool aktif (bukan pool baru sesi lain)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None and (pool is None or _POOL is pool):
+            # Job sesi lain yang masih antre tidak dibatalkan; pool rusak sudah menggagalkannya sendiri
+            _POOL.shutdown(wait=False)
+            _POOL = None
+
+def _pool_gagal(pool):
+    """
+    Pool rusak atau sudah ditutup: buang agar pemanggil berikutnya mendapat pool baru,
+    kecuali sesi lain sudah menggantinya.
+    """
+    _tutup_pool(pool)
+
+def _jalankan_di_pool(fungsi, daftar_args, max_workers=None):
+    """
+    Jalankan fungsi(*args) untuk setiap args di pool bersama; hasil urut sesuai input.
+    max_workers menentukan ukuran pool hanya jika pool belum ada (lihat _ambil_pool).
+    Returns None jika pool tidak bisa dipakai (pemanggil fallback ke serial): multiprocessing
+    tidak didukung (OSError, mis. /dev/shm terbatas), pool sudah ditutup saat submit
+    (RuntimeError) atau worker mati (BrokenProcessPool). Exception dari fungsi sendiri
+    diteruskan ke pemanggil apa adanya dan pool tetap dipakai.
+    """
+    pool, futures = None, []
+    try:
+        try:
+            pool = _ambil_pool(max_workers)
+            for args in daftar_args:
+                futures.append(pool.submit(fungsi, *args))
+        except (OSError, RuntimeError, BrokenProcessPool):
+            if pool is not None:
+                _pool_gagal(pool)
+            return None
+        try:
+            return [f.result() for f in futures]
+        except BrokenProcessPool:
+            _pool_gagal(pool)
+            return None
+    finally:
+        # Job yang belum jalan tidak perlu dikerjakan lagi jika salah satu gagal
+        for f in futures:
+            f.cancel()
+
+def kunci_cache_file(nama_file, isi_file, rincian=False):
+    """Kunci cache: SHA-256 isi file + nama file (sumber nama Puskesmas) + versi parser & mapping (+ mode rincian)."""
+    parts = (VERSI_PARSER, RESOLVER.versi, nama_file, isi_file) + (('rincian',) if rincian else ())
+    return hash_bytes(*parts)
+
+def _muat_dari_cache(kunci):
+    data = _CACHE_PARSING.get(kunci)
+    if data is None:
+        return None
+    try:
+        import pyarrow.parquet as pq
+        table = pq.read_table(BytesIO(data))
+        log = json.loads(table.schema.metadata[b'rekap_log'])
+        return table.to_pandas(), log
+    except Exception:
+        # Entry rusak / pyarrow tidak tersedia: anggap cache miss
+        return None
+
+def _simpan_ke_cache(kunci, df, log):
+    if not _CACHE_PARSING.enabled or log['status'] == 'ERROR':
+        return
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        meta = dict(table.schema.metadata or {})
+        meta[b'rekap_log'] = json.dumps(log).encode('utf-8')
+        buf = BytesIO()
+        pq.write_table(table.replace_schema_metadata(meta), buf)
+        _CACHE_PARSING.put(kunci, buf.getvalue())
+    except Exception:
+        pass
+
+def _proses_paralel(daftar_file, max_workers, rincian=False):
+    if min(max_workers, len(daftar_file)) > 1:
+        hasil = _jalankan_di_pool(_proses_bytes, [(nama, isi, rincian) for nama, isi in daftar_file], max_workers)
+        if hasil is not None:
+            return hasil
+
+    return [_proses_bytes(nama, isi, rincian) for nama, isi in daftar_file]
+
+def baca_banyak_file(daftar_file, max_workers=None, rincian=False, kunci=None):
+    """
+    Memproses banyak file Excel (atau master Parquet) secara paralel (multi-proses).
+    daftar_file: list of (nama_file, bytes)
+    rincian: teruskan ke baca_dan_bersihkan_file (kolom D-AY per umur/jenis kelamin ikut disimpan)
+    kunci: kunci_cache_file per file yang sudah dihitung pemanggil (agar isi file tidak di-hash dua kali)
+    Returns: list of (dataframe, log_dict), urutan sama dengan input.
+    File yang isinya sudah pernah diproses diambil dari cache disk (tanpa parsing ulang).
+    Otomatis fallback ke mode serial jika hanya 1 worker/1 file atau pool gagal dibuat.
+    """
+    if max_workers is None:
+        max_workers = ukuran_pool()
+
+    hasil = [None] * len(daftar_file)
+    # Master Parquet sudah kolumnar & cepat dibaca, tidak perlu disalin ke cache
+    if kunci is None:
+        kunci = [None if is_parquet(nama) else kunci_cache_file(nama, isi, rincian) for nama, isi in daftar_file]
+    else:
+        kunci = [None if is_parquet(nama) else k for (nama, _), k in zip(daftar_file, kunci)]
+
+    miss = []
+    for i, k in enumerate(kunci):
+        hasil[i] = _muat_dari_cache(k) if k else None
+        if hasil[i] is None:
+            miss.append(i)
+
+    if miss:
+        baru = _proses_paralel([daftar_file[i] for i in miss], max_workers, rincian)
+        for i, (df, log) in zip(miss, baru):
+            hasil[i] = (df, log)
+            if kunci[i]:
+                _simpan_ke_cache(kunci[i], df, log)
+
+    return hasil
+
+class KamusPenyakit:
+    """
+    Kamus global (satu per proses) pasangan (ICD X, Jenis Penyakit) -> kode integer.
+    Frame hasil ingest hanya menyimpan kolom 'Kode_Penyakit' (int32); teks penyakit
+    baru didekode saat ditampilkan/diekspor. Kode bersifat append-only sehingga
+    aman dipakai bersama oleh banyak sesi.
+    """
+
+    def __init__(self):
+        self._kode = {}  # (icd, jenis) -> kode
+        self._icd = []
+        self._jenis = []
+        self._lock = threading.Lock()
+        self._cache = None
+
+    def __len__(self):
+        return len(self._icd)
+
+    def kodekan(self, icd, jenis):
+        """Ubah dua kolom teks jadi array kode int32 (pasangan baru otomatis didaftarkan)."""
+        lokal, unik = pd.MultiIndex.from_arrays([icd, jenis]).factorize()
+        with self._lock:
+            peta = np.empty(len(unik), dtype=np.int32)
+            for i, pasangan in enumerate(unik):
+                kode = self._kode.get(pasangan)
+                if kode is None:
+                    kode = self._kode[pasangan] = len(self._icd)
+                    self._icd.append(pasangan[0])
+                    self._jenis.append(pasangan[1])
+                    self._cache = None
+                peta[i] = kode
+        return peta[lokal]
+
+    def _array(self):
+        """Snapshot array dekode + turunan filter/urutan (dibangun ulang hanya saat kamus bertambah)."""
+        cache = self._cache
+        if cache is None or len(cache['icd']) != len(self._icd):
+            with self._lock:
+                icd = pd.Series(self._icd, dtype=object)
+                jenis = pd.Series(self._jenis, dtype=object)
+            icd_str = icd.astype(str)
+            # Urutan abjad (Jenis Penyakit, ICD X) untuk memecah kasus seri di ranking
+            urut = np.lexsort((icd_str.to_numpy(), jenis.astype(str).to_numpy()))
+            peringkat = np.empty(len(urut), dtype=np.int32)
+            peringkat[urut] = np.arange(len(urut), dtype=np.int32)
+            cache = self._cache = {
+                'icd': icd.to_numpy(),
+                'jenis': jenis.to_numpy(),
+                'label': (icd_str + " - " + jenis.astype(str)).to_numpy(),
+                'alpha': icd_str.str[0].str.upper().to_numpy(),
+                'peringkat': peringkat,
+            }
+        return cache
+
+    def peringkat(self, kode):
+        return self._array()['peringkat'][kode]
+
+    def label(self, kode):
+        """Label filter 'ICD X - Jenis Penyakit' untuk kode tertentu."""
+        return self._array()['label'][kode]
+
+    def alpha(self, kode):
+        """Huruf awal ICD X untuk kode tertentu."""
+        return self._array()['alpha'][kode]
+
+    def cari_kode(self, alpha=(), label=()):
+        """Semua kode yang huruf awal ICD-nya ada di `alpha` ATAU labelnya ada di `label`."""
+        arr = self._array()
+        mask = np.isin(arr['alpha'], list(alpha)) | np.isin(arr['label'], list(label))
+        return np.flatnonzero(mask).astype(np.int32)
+
+    def dekode(self, df):
+        """Frame baru dengan kolom 'Jenis Penyakit' & 'ICD X' di depan, tanpa 'Kode_Penyakit'."""
+        if 'Kode_Penyakit' not in df.columns:
+            return df
+        arr = self._array()
+        kode = df['Kode_Penyakit'].to_numpy()
+        teks = pd.DataFrame({'Jenis Penyakit': arr['jenis'][kode], 'ICD X': arr['icd'][kode]}, index=df.index)
+        return pd.concat([teks, df.drop(columns='Kode_Penyakit')], axis=1)
+
+KAMUS_PENYAKIT = KamusPenyakit()
+
+def kodekan_penyakit(df):
+    """Ganti kolom teks 'Jenis Penyakit' & 'ICD X' dengan 'Kode_Penyakit' dari kamus global."""
+    if df.empty or 'Kode_Penyakit' in df.columns:
+        return df
+    kode = KAMUS_PENYAKIT.kodekan(df['ICD X'], df['Jenis Penyakit'])
+    df = df.drop(columns=['Jenis Penyakit', 'ICD X'])
+    df.insert(0, 'Kode_Penyakit', kode)
+    return df
+
+class IndeksFilter:
+    """
+    Mesin filter include/exclude untuk satu frame ber-'Kode_Penyakit'.
+    Indeks terbalik (kode penyakit -> posisi baris) dibangun sekali per dataset;
+    pilihan huruf awal/label diterjemahkan ke himpunan kode lewat kamus, lalu
+    dievaluasi sebagai operasi himpunan. Tanpa filter, frame asli dikembalikan apa adanya.
+    """
+
+    # Di atas proporsi ini, bitmap per kode lebih murah daripada menggabung posisi
+    AMBANG_POSISI = 0.125
+
+    def __init__(self, df):
+        self.df = df
+        self._kode_baris = df['Kode_Penyakit'].to_numpy()
+        self._urut = np.argsort(self._kode_baris, kind='stable')
+        self._kode, self._awal, self._jumlah = np.unique(
+            self._kode_baris[self._urut], return_index=True, return_counts=True
+        )
+
+    def kode_terpilih(self, inc_a=(), inc_l=(), exc_a=(), exc_l=()):
+        """Himpunan kode (yang ada di frame) setelah include lalu exclude."""
+        kode = self._kode
+        if inc_a or inc_l:
+            kode = np.intersect1d(kode, KAMUS_PENYAKIT.cari_kode(inc_a, inc_l), assume_unique=True)
+        if exc_a or exc_l:
+            kode = np.setdiff1d(kode, KAMUS_PENYAKIT.cari_kode(exc_a, exc_l), assume_unique=True)
+        return kode
+
+    def posisi(self, kode):
+        """Posisi baris (urut naik) untuk himpunan kode, via indeks terbalik."""
+        idx = np.searchsorted(self._kode, kode)
+        bagian = [self._urut[a:a + n] for a, n in zip(self._awal[idx], self._jumlah[idx])]
+        return np.sort(np.concatenate(bagian)) if bagian else np.empty(0, dtype=np.intp)
+
+    def terapkan(self, inc_a=(), inc_l=(), exc_a=(), exc_l=()):
+        kode = self.kode_terpilih(inc_a, inc_l, exc_a, exc_l)
+        if len(kode) == len(self._kode):
+            return self.df
+
+        n_terpilih = self._jumlah[np.searchsorted(self._kode, kode)].sum()
+        if n_terpilih < self.AMBANG_POSISI * len(self.df):
+            return self.df.take(self.posisi(kode))
+
+        bitmap = np.zeros(self._kode[-1] + 1, dtype=bool)
+        bitmap[kode] = True
+        return self.df[bitmap[self._kode_baris]]
+
+# Dimensi kubus agregat (Puskesmas x Kecamatan x penyakit -> Total_Kasus)
+KOLOM_KUBUS = ['Puskesmas', 'Kecamatan', 'Kode_Penyakit']
+KOLOM_WILAYAH = ['Puskesmas', 'Kecamatan']
+
+def bangun_kubus(df):
+    """
+    Agregat ringkas Total_Kasus per (Puskesmas, Kecamatan, Kode_Penyakit).
+    Wilayah disimpan sebagai kategori dan penyakit sebagai kode integer, jadi ranking,
+    komparasi, drill-down dan grafik cukup mengolah kubus ini, bukan seluruh baris mentah.
+    """
+    kubus = df.groupby(KOLOM_KUBUS, sort=False, observed=True)['Total_Kasus'].sum().reset_index()
+    for col in KOLOM_WILAYAH:
+        kubus[col] = kubus[col].astype('category')
+    return kubus
+
+def _sambung(dfs):
+    """
+    pd.concat untuk frame ber-kolom wilayah. Concat kategori beda isi menghasilkan object;
+    kolom wilayah disambung lewat union kategori (urut abjad, hanya yang terpakai) agar tetap hemat memori.
+    """
+    kolom = pd.concat([df.head(0) for df in dfs]).columns
+    hasil = pd.concat([df.drop(columns=KOLOM_WILAYAH) for df in dfs], ignore_index=True)
+    for col in KOLOM_WILAYAH:
+        hasil[col] = union_categoricals(
+            [pd.Categorical(df[col]) for df in dfs], sort_categories=True, ignore_order=True
+        ).remove_unused_categories()
+    return hasil[kolom]
+
+def _gabung_partisi(dfs, kubus_partisi):
+    """Gabungkan partisi per file jadi (master_df, kubus). Kubus cukup diagregasi ulang dari partisi kubus."""
+    if not dfs:
+        return pd.DataFrame(), pd.DataFrame()
+    return _sambung(dfs), bangun_kubus(pd.concat(kubus_partisi, ignore_index=True))
+
+def bangun_dataset(hasil):
+    """
+    Menggabungkan hasil baca_banyak_file jadi dataset siap pakai.
+    Returns: (master_df, kubus, logs) - kubus dibangun sekali di sini, bukan setiap rerun.
+    """
+    logs = [log for _, log in hasil]
+    dfs = [kodekan_penyakit(df) for df, _ in hasil if not df.empty]
+    master_df, kubus = _gabung_partisi(dfs, dfs)
+    return master_df, kubus, logs
+
+class RegistriBersama:
+    """
+    Registri per proses untuk objek hasil ingest yang dipakai bersama banyak sesi (read-only).
+    Setiap pemakai memegang HandleBersama; saat handle dibuang (sesi selesai, data diganti),
+    weakref.finalize mengurangi hitungan referensi dan entry dihapus begitu tidak ada lagi
+    sesi yang memakainya.
+    """
+
+    def __init__(self):
+        self._isi = {}  # kunci -> [nilai, jumlah_referensi]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._isi)
+
+    def jumlah_referensi(self, kunci):
+        entry = self._isi.get(kunci)
+        return entry[1] if entry else 0
+
+    def _handle(self, kunci, nilai):
+        handle = HandleBersama(kunci, nilai)
+        weakref.finalize(handle, self._lepas, kunci)
+        return handle
+
+    def cari(self, kunci):
+        """Handle baru ke entry yang sudah ada, atau None."""
+        with self._lock:
+            entry = self._isi.get(kunci)
+            if entry is None:
+                return None
+            entry[1] += 1
+            return self._handle(kunci, entry[0])
+
+    def ambil(self, kunci, bangun):
+        """Handle ke entry `kunci`; bangun() hanya dipanggil jika entry belum ada."""
+        handle = self.cari(kunci)
+        if handle is not None:
+            return handle
+        nilai = bangun()
+        with self._lock:
+            # Sesi lain bisa selesai membangun lebih dulu: pakai entry miliknya
+            entry = self._isi.setdefault(kunci, [nilai, 0])
+            entry[1] += 1
+            return self._handle(kunci, entry[0])
+
+    def _lepas(self, kunci):
+        with self._lock:
+            entry = self._isi.get(kunci)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._isi[kunci]
+
+class HandleBersama:
+    """Referensi satu pemakai ke entry RegistriBersama; isi `nilai` tidak boleh diubah."""
+    __slots__ = ('kunci', 'nilai', '__weakref__')
+
+    def __init__(self, kunci, nilai):
+        self.kunci = kunci
+        self.nilai = nilai
+
+def _info_blok(nilai):
+    """(jumlah baris di master_df, himpunan Puskesmas) satu partisi (df, log, kubus_partisi)."""
+    df, _, kubus_partisi = nilai
+    return (0, set()) if df.empty else (len(df), set(kubus_partisi['Puskesmas'].unique()))
+
+class DatasetGabungan:
+    """
+    Dataset gabungan immutable (master_df, kubus + indeks filter) yang dibagi antar sesi.
+    Baris master_df tersusun per blok partisi, urut sesuai `blok` (kunci partisi, boleh berulang).
+    """
+
+    def __init__(self, blok, partisi, master_df=None, kubus=None, info=None):
+        """partisi: dict kunci -> (df, log, kubus_partisi); master_df/kubus/info hanya diisi oleh ubah()."""
+        self.blok = tuple(blok)
+        if master_df is None:
+            isi = [partisi[k] for k in self.blok if not partisi[k][0].empty]
+            master_df, kubus = _gabung_partisi([df for df, _, _ in isi], [kp for _, _, kp in isi])
+            info = [_info_blok(partisi[k]) for k in self.blok]
+        self.master_df, self.kubus = master_df, kubus
+        self._info = info
+        self.filter_master = self.filter_kubus = None
+        if not self.master_df.empty:
+            self.filter_master = IndeksFilter(self.master_df)
+            self.filter_kubus = IndeksFilter(self.kubus)
+
+    def ubah(self, blok, partisi):
+        """
+        Dataset baru dengan susunan `blok` = blok lama yang tersisa (urutan tetap) + blok baru di belakang.
+        Hanya baris blok yang dihapus yang dibuang dan partisi baru yang disambung, tanpa concat ulang
+        semua partisi; kubus hanya diagregasi ulang untuk Puskesmas yang terdampak.
+        partisi: dict kunci -> (df, log, kubus_partisi) untuk semua isi `blok`
+        """
+        sisa = Counter(blok)
+        dipakai = []
+        for k in self.blok:
+            dipakai.append(sisa[k] > 0)
+            sisa[k] -= dipakai[-1]
+        tambah = blok[sum(dipakai):]
+        info_tambah = [_info_blok(partisi[k]) for k in tambah]
+        terdampak = set().union(
+            *(pusk for (_, pusk), d in zip(self._info, dipakai) if not d), *(pusk for _, pusk in info_tambah)
+        )
+
+        # Master: buang baris blok yang dihapus (posisi dari panjang blok), sambung partisi baru
+        master = self.master_df
+        if not all(dipakai):
+            batas = np.cumsum([0] + [n for n, _ in self._info])
+            posisi = [np.arange(batas[i], batas[i + 1]) for i, d in enumerate(dipakai) if d]
+            master = master.take(np.concatenate(posisi)) if posisi else master.iloc[:0]
+        bagian = [df for df in [master] + [partisi[k][0] for k in tambah] if not df.empty]
+
+        # Kubus: baris Puskesmas terdampak diagregasi ulang dari partisi kubus yang tersisa
+        kubus = self.kubus
+        if terdampak:
+            ulang = [kp[kp['Puskesmas'].isin(terdampak)] for df, _, kp in (partisi[k] for k in blok) if not df.empty]
+            ulang = [kp for kp in ulang if not kp.empty]
+            bagian_kubus = [kubus[~kubus['Puskesmas'].isin(terdampak)]] if not kubus.empty else []
+            if ulang:
+                bagian_kubus.append(bangun_kubus(pd.concat(ulang, ignore_index=True)))
+            bagian_kubus = [kp for kp in bagian_kubus if not kp.empty]
+            kubus = _sambung(bagian_kubus) if bagian_kubus else pd.DataFrame()
+
+        if not bagian:
+            master, kubus = pd.DataFrame(), pd.DataFrame()
+        elif len(bagian) > 1 or not all(dipakai):
+            master = _sambung(bagian)
+        info = [i for i, d in zip(self._info, dipakai) if d] + info_tambah
+        return DatasetGabungan(blok, partisi, master, kubus, info)
+
+# Satu registri per jenis: partisi per file (key: hash isi file) & dataset gabungan (key: hash-hash file, urut)
+REGISTRI_PARTISI = RegistriBersama()
+REGISTRI_DATASET = RegistriBersama()
+
+def _urut_kanonik(handles):
+    """Urutan gabung kanonik (nama file, hash) agar sesi dengan file sama berbagi satu dataset."""
+    return sorted(handles, key=lambda h: (h.nilai[1]['file'], str(h.kunci)))
+
+def _partisi(df, log):
+    df = kodekan_penyakit(df)
+    kubus_partisi = df.groupby(KOLOM_KUBUS, sort=False, observed=True)['Total_Kasus'].sum().reset_index() if not df.empty else df
+    return df, log, kubus_partisi
+
+class DatasetInkremental:
+    """
+    State ingest per sesi: satu partisi per file yang di-upload (key: file_id).
+    Saat daftar upload berubah, hanya file baru yang di-parse dan file yang dihapus
+    dibuang partisinya; file lama tidak dibaca/di-hash ulang.
+
+    Partisi & dataset gabungan diambil dari registri per proses (key: hash isi file), jadi
+    sesi lain yang meng-upload file yang sama memakai frame yang sama tanpa parsing/concat ulang.
+
+    gabung=False (mis. backend SQL aktif): master_df/kubus gabungan tidak disimpan di memori,
+    hanya partisi per file; susun_master() & pembangun_kubus() menyusunnya sesaat saat dibutuhkan.
+    """
+
+    def __init__(self, gabung=True):
+        self.gabung = gabung
+        self.partisi = {}  # file_id -> HandleBersama (nilai: (df, log, kubus_partisi))
+        self.urutan = []
+        self.master_df = pd.DataFrame()
+        self.kubus = pd.DataFrame()
+        self.logs = []
+        self.filter_master = None
+        self.filter_kubus = None
+        self._gabungan = None
+
+    def sinkron(self, files, max_workers=None):
+        """
+        files: list of (file_id, nama_file, fungsi_ambil_bytes).
+        Returns: True jika dataset berubah (ada file baru/dihapus).
+        """
+        baru = []
+        for fid, nama, ambil in files:
+            if fid in self.partisi:
+                continue
+            isi = ambil()
+            kunci = kunci_cache_file(nama, isi)
+            handle = REGISTRI_PARTISI.cari(kunci)
+            if handle is not None:
+                self.partisi[fid] = handle
+            else:
+                baru.append((fid, kunci, nama, isi))
+        if baru:
+            hasil = baca_banyak_file(
+                [(nama, isi) for _, _, nama, isi in baru], max_workers, kunci=[kunci for _, kunci, _, _ in baru]
+            )
+            for (fid, kunci, _, _), (df, log) in zip(baru, hasil):
+                self.partisi[fid] = REGISTRI_PARTISI.ambil(kunci, lambda: _partisi(df, log))
+        return self._susun([fid for fid, _, _ in files])
+
+    def sinkron_hasil(self, hasil):
+        """
+        Sama seperti sinkron, tapi untuk partisi yang sudah berupa DataFrame (mis. dari arsip).
+        hasil: list of (id, dataframe, log_dict); id harus unik per isi dan yang sudah dikenal tidak diproses ulang.
+        """
+        for pid, df, log in hasil:
+            if pid not in self.partisi:
+                self.partisi[pid] = REGISTRI_PARTISI.ambil(('hasil', pid), lambda: _partisi(df, log))
+        return self._susun([pid for pid, _, _ in hasil])
+
+    def _susun(self, ids):
+        """Buang partisi yang tidak lagi dipakai lalu ambil dataset gabungan jika susunannya berubah."""
+        dihapus = set(self.partisi) - set(ids)
+        for pid in dihapus:
+            del self.partisi[pid]
+
+        if not dihapus and ids == self.urutan:
+            return False
+
+        self.urutan = ids
+        handles = [self.partisi[pid] for pid in ids]
+        self.logs = [h.nilai[1] for h in handles]
+        if not self.gabung:
+            return True
+        partisi = {h.kunci: h.nilai for h in handles}
+        kanonik = tuple(h.kunci for h in _urut_kanonik(handles))
+        lama = self._gabungan.nilai if self._gabungan is not None else None
+        handle = REGISTRI_DATASET.cari(kanonik)
+        if handle is None and lama is not None:
+            # Blok lama yang masih dipakai tetap di depan, file baru disambung di belakang (urut kanonik)
+            sisa = Counter(kanonik)
+            tetap = []
+            for k in lama.blok:
+                if sisa[k] > 0:
+                    sisa[k] -= 1
+                    tetap.append(k)
+            if tetap:
+                tambah = []
+                for k in kanonik:
+                    if sisa[k] > 0:
+                        sisa[k] -= 1
+                        tambah.append(k)
+                blok = tuple(tetap + tambah)
+                handle = REGISTRI_DATASET.ambil(blok, lambda: lama.ubah(blok, partisi))
+        if handle is None:
+            handle = REGISTRI_DATASET.ambil(kanonik, lambda: DatasetGabungan(kanonik, partisi))
+        self._gabungan = handle
+        gabungan = self._gabungan.nilai
+        self.master_df, self.kubus = gabungan.master_df, gabungan.kubus
+        self.filter_master, self.filter_kubus = gabungan.filter_master, gabungan.filter_kubus
+        return True
+
+    def _nilai_kanonik(self):
+        return [h.nilai for h in _urut_kanonik([self.partisi[pid] for pid in self.urutan])]
+
+    def kosong(self):
+        """True jika tidak ada baris data sama sekali (belum ada file, atau semua gagal/kosong)."""
+        return all(self.partisi[pid].nilai[0].empty for pid in self.urutan)
+
+    def pratinjau(self, n=5):
+        """n baris pertama master_df, tanpa menyusun seluruh gabungan pada mode gabung=False."""
+        if self.gabung:
+            return self.master_df.head(n)
+        dfs = []
+        for df, _, _ in self._nilai_kanonik():
+            if not df.empty:
+                dfs.append(df.head(n))
+                if sum(len(d) for d in dfs) >= n:
+                    break
+        return _sambung(dfs).head(n) if dfs else pd.DataFrame()
+
+    def susun_master(self):
+        """master_df susunan saat ini; pada mode gabung=False disusun dari partisi setiap dipanggil (tidak disimpan)."""
+        if self.gabung:
+            return self.master_df
+        dfs = [df for df, _, _ in self._nilai_kanonik() if not df.empty]
+        return _sambung(dfs) if dfs else pd.DataFrame()
+
+    def pembangun_kubus(self):
+        """
+        Callable penyusun kubus susunan saat ini. Memegang partisinya sendiri, jadi hasilnya
+        tidak ikut berubah saat sinkron berikutnya (dipakai backend SQL untuk menulis ulang dataset).
+        """
+        if self.gabung:
+            kubus = self.kubus
+            return lambda: kubus
+        nilai = self._nilai_kanonik()
+
+        def bangun():
+            kubus_partisi = [kp for df, _, kp in nilai if not df.empty]
+            return bangun_kubus(pd.concat(kubus_partisi, ignore_index=True)) if kubus_partisi else pd.DataFrame()
+        return bangun
+
+def _top_n_per_grup(grouped, group_cols, top_n, kolom_seri=()):
+    """
+    Kernel ranking: satu kali sort (grup naik, kasus turun) lalu head() per grup,
+    tanpa lambda Python per grup. Sort multi-kolom bersifat stabil, jadi kasus
+    yang seri tetap berurutan sesuai abjad penyakit (urutan hasil groupby, atau
+    `kolom_seri` jika penyakit berupa kode).
+    """
+    kolom_seri = list(kolom_seri)
+    return (
+        grouped.sort_values(
+            group_cols + ['Total_Kasus'] + kolom_seri,
+            ascending=[True] * len(group_cols) + [False] + [True] * len(kolom_seri)
+        )
+        .groupby(group_cols, sort=False, observed=True).head(top_n)
         .reset_index(drop=True)
     )
+
+def _ranking_kode(df, group_cols, top_n):
+    """Ranking di atas kolom 'Kode_Penyakit'; hanya hasil Top N yang didekode ke teks."""
+    grouped = df.groupby(group_cols + ['Kode_Penyakit'], observed=True)['Total_Kasus'].sum().reset_index()
+    grouped['_seri'] = KAMUS_PENYAKIT.peringkat(grouped['Kode_Penyakit'].to_numpy())
+    result = _top_n_per_grup(grouped, group_cols, top_n, kolom_seri=['_seri'])
+    result = KAMUS_PENYAKIT.dekode(result.drop(columns='_seri'))
+    return result[group_cols + ['Jenis Penyakit', 'ICD X', 'Total_Kasus']]
+
+def hitung_ranking(df, group_cols, top_n=10):
+    """Menghitung Top N penyakit berdasarkan grup (Kecamatan/Puskesmas)."""
+    if 'Kode_Penyakit' in df.columns:
+        result = _ranking_kode(df, group_cols, top_n)
+    else:
+        # Grouping unik (menggabungkan penyakit yang sama dalam grup tersebut)
+        agg_cols = group_cols + ['Jenis Penyakit', 'ICD X']
+        grouped = df.groupby(agg_cols, observed=True)['Total_Kasus'].sum().reset_index()
+        result = _top_n_per_grup(grouped, group_cols, top_n)
     
     # UPDATE: Index dimulai dari 1
     result.index += 1
     return result
 
+def ranking_per_entitas(df, scope, top_n=20):
+    """
+    Drill-down seluruh entitas (Kecamatan/Puskesmas) dalam satu pass groupby; setara dengan
+    hitung_ranking(df[df[scope] == e], [scope], top_n) untuk setiap entitas e.
+    Returns: dict nama entitas -> (ranking, total kasus), urut abjad
+    """
+    ranking = hitung_ranking(df, [scope], top_n)
+    total = df.groupby(scope, observed=True)['Total_Kasus'].sum()
+    hasil = {}
+    for entitas, grup in ranking.groupby(scope, observed=True, sort=False):
+        grup = grup.reset_index(drop=True)
+        grup.index += 1
+        hasil[str(entitas)] = (grup, total[entitas])
+    return dict(sorted(hasil.items()))
+
+def top_penyakit(df, top_n=10):
+    """Top N penyakit dari seluruh baris df (tanpa pengelompokan wilayah), sudah didekode."""
+    grouped = df.groupby('Kode_Penyakit')['Total_Kasus'].sum().reset_index()
+    grouped['_seri'] = KAMUS_PENYAKIT.peringkat(grouped['Kode_Penyakit'].to_numpy())
+    top = grouped.sort_values(['Total_Kasus', '_seri'], ascending=[False, True]).head(top_n)
+    return KAMUS_PENYAKIT.dekode(top.drop(columns='_seri'))
+
+def _terbesar_stabil(df, kolom_a, kolom_b, n):
+    """
+    n baris teratas menurut (kolom_a, kolom_b) menurun, seri tetap urut posisi asal - sama dengan
+    sort_values([a, b], ascending=False).head(n), tapi lewat partial sort (np.partition) sehingga
+    hanya kandidat di atas ambang yang benar-benar diurutkan.
+    """
+    a = df[kolom_a].to_numpy()
+    b = df[kolom_b].to_numpy()
+    if 0 < n < len(df):
+        # Ambang kolom_a, lalu ambang kolom_b di antara baris yang tepat di ambang kolom_a
+        ambang_a = np.partition(a, len(a) - n)[len(a) - n]
+        di_atas = a > ambang_a
+        sisa = n - int(di_atas.sum())
+        di_ambang = a == ambang_a
+        b_ambang = b[di_ambang]
+        ambang_b = np.partition(b_ambang, len(b_ambang) - sisa)[len(b_ambang) - sisa]
+        kandidat = np.flatnonzero(di_atas | (di_ambang & (b >= ambang_b)))
+    else:
+        kandidat = np.arange(len(df))
+    # lexsort stabil: seri penuh tetap berurutan sesuai posisi asal
+    urut = kandidat[np.lexsort((-b[kandidat], -a[kandidat]))][:n]
+    return df.iloc[urut].reset_index(drop=True)
+
 def cari_penyakit_umum(df_ranking, group_col, top_n=5):
     """Mencari penyakit yang paling sering muncul di Top 10 berbagai wilayah."""
     total_groups = df_ranking[group_col].nunique()
 
-    freq = df_ranking.groupby(['Jenis Penyakit', 'ICD X']).size().reset_index(name='Frekuensi')
-    total = df_ranking.groupby(['Jenis Penyakit', 'ICD X'])['Total_Kasus'].sum().reset_index()
+    # Frekuensi & total kasus dalam satu groupby (named aggregation)
+    summary = df_ranking.groupby(['Jenis Penyakit', 'ICD X'], observed=True).agg(
+        Frekuensi=('Total_Kasus', 'size'), Total_Kasus=('Total_Kasus', 'sum')
+    ).reset_index()
 
-    summary = pd.merge(freq, total, on=['Jenis Penyakit', 'ICD X'])
+    result = _terbesar_stabil(summary, 'Frekuensi', 'Total_Kasus', top_n)
 
-    # Logic status sama persis, hanya disederhanakan pakai lambda untuk performa
-    summary['Status'] = summary['Frekuensi'].apply(
-        lambda x: "LOLOS (Ada di SEMUA)" if x == total_groups else f"HAMPIR (Absen di {total_groups - x} unit)"
+    # Status cukup dihitung untuk baris terpilih
+    absen = total_groups - result['Frekuensi']
+    result['Status'] = np.where(
+        absen == 0, "LOLOS (Ada di SEMUA)", "HAMPIR (Absen di " + absen.astype(str) + " unit)"
     )
-
-    result = summary.sort_values(['Frekuensi', 'Total_Kasus'], ascending=False).head(top_n).reset_index(drop=True)
     
     # UPDATE: Index dimulai dari 1
     result.index += 1
-    return result
\ No newline at end of file
+    return result
+
+def hitung_rekap(df, top_n_kec=10, top_n_pusk=10, top_n_umum=5):
+    """
+    Paket ranking standar dashboard/laporan.
+    Returns: (top_kec, top_pusk, common_kec, common_pusk)
+    """
+    top_kec = hitung_ranking(df, ['Kecamatan'], top_n=top_n_kec)
+    top_pusk = hitung_ranking(df, ['Puskesmas'], top_n=top_n_pusk)
+    common_kec = cari_penyakit_umum(top_kec, 'Kecamatan', top_n=top_n_umum)
+    common_pusk = cari_penyakit_umum(top_pusk, 'Puskesmas', top_n=top_n_umum)
+    return top_kec, top_pusk, common_kec, common_pusk
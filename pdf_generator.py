@@ -1,8 +1,35 @@
-from fpdf import FPDF
+from fpdf import FPDF, __version__ as VERSI_FPDF
 from datetime import datetime
+from io import BytesIO
+import copy
+import importlib.util
+import json
+import os
+import re
+import warnings
+import numpy as np
 import pandas as pd
 
-# --- THEME CONFIGURATION ---
+from disk_cache import DiskCache, hash_bytes
+
+# pypdf (requirements.txt) dipakai untuk menggabungkan bagian PDF yang dirender paralel
+ADA_PYPDF = importlib.util.find_spec('pypdf') is not None
+
+# Perkiraan biaya render relatif per baris tabel: cell() langsung vs table() dengan word-wrap
+BIAYA_BARIS_CEPAT = 1
+BIAYA_BARIS_WRAP = 20
+# Mode paralel otomatis aktif jika perkiraan biaya laporan custom minimal sebanyak ini
+AMBANG_BIAYA_PARALEL = 20_000
+
+# Cache PDF jadi di disk, key = hash isi data + config + tema (lihat kunci_laporan).
+# Naikkan VERSI_LAPORAN jika tata letak laporan berubah agar entry lama tidak terpakai.
+_CACHE_PDF = DiskCache('pdf', suffix='.pdf')
+VERSI_LAPORAN = '1'
+
+# Cache lebar teks per (font, ukuran, string) - nama penyakit/puskesmas banyak berulang antar baris
+_CACHE_LEBAR_TEKS = {}
+MAKS_CACHE_LEBAR_TEKS = 100_000
+
 # --- THEME CONFIGURATION ---
 THEMES = {
     'Modern Minimalist': {
@@ -37,18 +64,117 @@ THEMES = {
     }
 }
 
+# Font TTF opsional (Unicode, mis. diakritik di nama penyakit) menggantikan font bawaan PDF:
+# REKAP_PDF_FONT untuk tema sans-serif (helvetica), REKAP_PDF_FONT_SERIF untuk tema serif (times,
+# default ikut REKAP_PDF_FONT). Varian dicari di folder yang sama: <nama>-Bold.ttf, <nama>-Italic.ttf, dst.
+FONT_KUSTOM = {
+    'helvetica': os.environ.get('REKAP_PDF_FONT', ''),
+    'times': os.environ.get('REKAP_PDF_FONT_SERIF', '') or os.environ.get('REKAP_PDF_FONT', ''),
+}
+_AKHIRAN_VARIAN = {'B': ('Bold',), 'I': ('Italic', 'Oblique')}
+
+# Cache per proses (dipakai ulang semua PDFReport, termasuk di worker pool):
+# path TTF -> (TTFFont hasil parsing, isi file) dan nama tema -> (tema efektif, daftar font TTF)
+_CACHE_FONT = {}
+_CACHE_TEMA = {}
+
+# _pasang_font menyalin atribut internal TTFFont; tata letaknya hanya dijamin untuk fpdf2 2.8.x
+# (versi yang di-pin di requirements.txt). Versi lain memakai add_font publik (parsing per dokumen).
+FONT_CEPAT = VERSI_FPDF.split('.')[:2] == ['2', '8']
+
+def _file_varian(path, style):
+    """File TTF untuk style B/I di samping file regular; jika tidak ada pakai file regular."""
+    if not style:
+        return path
+    dasar, ext = os.path.splitext(path)
+    for akhiran in _AKHIRAN_VARIAN[style]:
+        kandidat = f"{dasar}-{akhiran}{ext}"
+        if os.path.exists(kandidat):
+            return kandidat
+    return path
+
+def _font_induk(path):
+    """
+    Parsing TTF (metrics, cmap, glyph id) cukup sekali per proses. Isi file ikut disimpan karena
+    setiap dokumen butuh objek TTFont sendiri (fpdf2 men-subset font itu in-place saat output).
+    Returns: (TTFFont, bytes) atau (None, None) jika font perlu glyph .notdef buatan fpdf2.
+    """
+    induk = _CACHE_FONT.get(path)
+    if induk is None:
+        from fontTools import ttLib
+
+        with open(path, 'rb') as f:
+            isi = f.read()
+        asli = ttLib.TTFont(BytesIO(isi), lazy=True)
+        if 'glyf' in asli and '.notdef' not in asli['glyf']:
+            induk = (None, None)
+        else:
+            pdf = FPDF()
+            pdf.add_font('induk', '', path)
+            induk = (pdf.fonts['induk'], isi)
+        _CACHE_FONT[path] = induk
+    return induk
+
+def _pasang_font(pdf, family, style, path):
+    """
+    Daftarkan font TTF ke dokumen dari hasil parsing yang di-cache (tanpa add_font/parsing ulang).
+    Di luar fpdf2 2.8.x (FONT_CEPAT False) jatuh ke add_font biasa.
+    """
+    from fontTools import ttLib
+    from fpdf.enums import TextEmphasis
+    from fpdf.fonts import SubsetMap
+
+    induk, isi = _font_induk(path) if FONT_CEPAT else (None, None)
+    if induk is None:
+        pdf.add_font(family, style, path)
+        return
+    font = copy.copy(induk)  # cmap, lebar & glyph id dipakai bersama (read-only)
+    font.i = len(pdf.fonts) + 1
+    font.fontkey = f"{family}{style}"
+    font.emphasis = TextEmphasis.coerce(style)
+    font.ttfont = ttLib.TTFont(BytesIO(isi), recalcTimestamp=False, lazy=True)
+    font.desc = copy.copy(induk.desc)  # Diisi nama subset & stream font saat output
+    font.missing_glyphs = []
+    font.biggest_size_pt = 0
+    font._hbfont = None
+    font.subset = SubsetMap(font)
+    pdf.fonts[font.fontkey] = font
+
+def _sumber_tema(theme_name):
+    """Tema efektif (font bawaan diganti family TTF jika dikonfigurasi) + font yang perlu dipasang, di-cache per proses."""
+    sumber = _CACHE_TEMA.get(theme_name)
+    if sumber is None:
+        tema = dict(THEMES.get(theme_name, THEMES['Modern Minimalist']))
+        fonts = []
+        for kunci in ('font_header', 'font_body'):
+            path = FONT_KUSTOM.get(tema[kunci])
+            if path:
+                family = f"rekap_{tema[kunci]}"
+                tema[kunci] = family
+                # Hanya style yang dipakai laporan; setiap font terdaftar ikut di-subset saat output
+                fonts += [(family, style, _file_varian(path, style)) for style in ('', 'B', 'I')]
+        sumber = _CACHE_TEMA[theme_name] = (tema, list(dict.fromkeys(fonts)))
+    return sumber
+
 class PDFReport(FPDF):
     """
     Custom FPDF class for generating Recap Reports.
     Includes custom header, footer, and utility methods for tables.
     """
     
-    def __init__(self, theme_name='Modern Minimalist'):
+    def __init__(self, theme_name='Modern Minimalist', show_header=True, show_footer=True):
         super().__init__()
         self.theme_name = theme_name
-        self.theme = THEMES.get(theme_name, THEMES['Modern Minimalist'])
+        self.theme, fonts = _sumber_tema(theme_name)
+        for family, style, path in fonts:
+            _pasang_font(self, family, style, path)
+        # Dimatikan saat render bagian paralel: footer (nomor halaman) dicap setelah digabung
+        self.show_header = show_header
+        self.show_footer = show_footer
 
     def header(self):
+        if not self.show_header:
+            return
         # Set Font based on Theme
         self.set_font(self.theme['font_header'], 'B', 15)
         
@@ -73,6 +199,8 @@ class PDFReport(FPDF):
         self.set_text_color(0, 0, 0)
 
     def footer(self):
+        if not self.show_footer:
+            return
         self.set_y(-15)
         self.set_font(self.theme['font_body'], 'I', 8)
         self.set_text_color(128, 128, 128)
@@ -98,45 +226,133 @@ class PDFReport(FPDF):
         self.multi_cell(0, 6, body)
         self.ln()
 
-    def add_dataframe_table(self, df):
-        if df.empty:
-            self.cell(0, 10, "Tidak ada data availabel.", new_x="LMARGIN", new_y="NEXT")
-            return
+    def text_width(self, text):
+        """Lebar teks (font aktif) dengan cache per string unik."""
+        key = (self.current_font.fontkey, self.font_size_pt, text)
+        width = _CACHE_LEBAR_TEKS.get(key)
+        if width is None:
+            if len(_CACHE_LEBAR_TEKS) > MAKS_CACHE_LEBAR_TEKS:
+                _CACHE_LEBAR_TEKS.clear()
+            width = _CACHE_LEBAR_TEKS[key] = self.get_string_width(text)
+        return width
 
-        self.set_font(self.theme['font_body'], size=9)
-        
-        # Theme Settings
-        bg_header = self.theme['header_bg'] if self.theme['table_fill_header'] else None
-        txt_header = self.theme['header_txt'] if self.theme['table_fill_header'] else (0,0,0)
-        
-        # Zebra Striping
-        stripe_color = self.theme['stripe_bg']
-        
-        # Prepare data
-        table_data = [df.columns.tolist()] + df.astype(str).values.tolist()
-        
-        # Render Table
+    def _column_widths(self, header, columns):
+        """
+        Lebar kolom dihitung sekali dari teks terlebar per kolom (font metrics), lalu
+        diskalakan ke lebar halaman. Returns: (lebar kolom, True jika semua sel muat 1 baris).
+        """
+        pad = 2 * self.c_margin
+        natural = []
+        for name, values in zip(header, columns):
+            self.set_font(style='B')
+            w_head = self.text_width(name)
+            self.set_font(style='')
+            natural.append(max([w_head] + [self.text_width(v) for v in set(values)]) + pad)
+
+        total = sum(natural)
+        if total <= self.epw:
+            # Semua muat: sisa ruang dibagi proporsional agar tabel tetap selebar halaman
+            return [self.epw * w / total for w in natural], True
+
+        # Tidak muat: kolom sempit tetap selebar isinya, kolom lebar berbagi sisa ruang
+        widths = list(natural)
+        lebar = set(range(len(natural)))
+        while True:
+            sisa = self.epw - sum(natural[j] for j in range(len(natural)) if j not in lebar)
+            jatah = sisa / len(lebar)
+            sempit = {j for j in lebar if natural[j] <= jatah}
+            if not sempit or sempit == lebar:
+                break
+            lebar -= sempit
+        total_lebar = sum(natural[j] for j in lebar)
+        for j in lebar:
+            widths[j] = sisa * natural[j] / total_lebar
+        return widths, False
+
+    def _add_table_api(self, table_data, col_widths=None):
+        """Render lewat fpdf2 table() (layout & word-wrap per sel). Dipakai jika ada teks yang perlu dibungkus."""
         with self.table(
             borders_layout=self.theme['table_borders'],
-            cell_fill_color=stripe_color,
+            cell_fill_color=self.theme['stripe_bg'],
             cell_fill_mode="ROWS", # Zebra striping
-            text_align="LEFT"
+            text_align="LEFT",
+            col_widths=col_widths
         ) as table:
-            # Header Row
-            header = table.row()
-            for col_name in table_data[0]:
-                cell = header.cell(col_name)
-                # Apply Header Style manually if needed for specialized font color
-                if self.theme['table_fill_header']:
-                    # fpdf2 table headers auto-style is tricky, we rely on general settings or simple render
-                    pass 
-            
-            # Data Rows
-            for data_row in table_data[1:]:
+            for data_row in table_data:
                 row = table.row()
                 for datum in data_row:
                     row.cell(datum)
 
+    def _add_table_fast(self, header, rows, widths):
+        """
+        Render cepat baris demi baris dengan cell() (tanpa pengukuran wrap per sel).
+        Tampilan mengikuti table(): header tebal diulang tiap halaman, zebra baris ganjil, pola border tema.
+        """
+        h = 2 * self.font_size  # Sama dengan tinggi baris default table()
+        last = len(widths) - 1
+        minimal = self.theme['table_borders'] == 'MINIMAL'
+        stripe = self.theme['stripe_bg']
+
+        def border(j, is_header):
+            if not minimal:
+                return 1
+            b = ('L' if j > 0 else '') + ('R' if j < last else '')
+            return b + 'B' if is_header else b or 0
+
+        border_head = [border(j, True) for j in range(len(widths))]
+        border_body = [border(j, False) for j in range(len(widths))]
+
+        def render_header():
+            self.set_font(style='B')
+            for j, (w, text) in enumerate(zip(widths, header)):
+                self.cell(w, h, text, border=border_head[j])
+            self.ln(h)
+            self.set_font(style='')
+
+        # Header + baris pertama selalu di halaman yang sama
+        if self.will_page_break(2 * h):
+            self.add_page()
+        render_header()
+
+        if stripe:
+            self.set_fill_color(*stripe)
+        for i, data_row in enumerate(rows, start=1):
+            if self.will_page_break(h):
+                self.add_page()
+                render_header()
+                if stripe:
+                    self.set_fill_color(*stripe)
+            fill = bool(stripe) and i % 2 == 1
+            for j, (w, text) in enumerate(zip(widths, data_row)):
+                self.cell(w, h, text, border=border_body[j], fill=fill)
+            self.ln(h)
+
+    def _table_text(self, df):
+        self.set_font(self.theme['font_body'], size=9)
+        header = [str(c) for c in df.columns]
+        columns = [df[c].astype(str).tolist() for c in df.columns]
+        return header, columns
+
+    def table_fits(self, df):
+        """True jika semua sel df muat satu baris (tabel bisa dirender lewat jalur cepat)."""
+        return self._column_widths(*self._table_text(df))[1]
+
+    def add_dataframe_table(self, df):
+        if df.empty:
+            self.cell(0, 10, "Tidak ada data availabel.", new_x="LMARGIN", new_y="NEXT")
+            return
+
+        # Prepare data: konversi per kolom sekali jalan
+        header, columns = self._table_text(df)
+        widths, fits = self._column_widths(header, columns)
+        rows = list(zip(*columns))
+
+        if fits:
+            self._add_table_fast(header, rows, widths)
+        else:
+            # Ada teks yang harus dibungkus: pakai table() dengan lebar kolom yang sama
+            self._add_table_api([header] + rows, widths)
+
     def add_chapter_section(self, title, df=None, columns=None, body_text=None, new_page=False):
         """Helper to add a standard report section (Title + Body/Table)."""
         if new_page and self.get_y() > 250:
@@ -155,8 +371,43 @@ class PDFReport(FPDF):
             self.add_dataframe_table(df[valid_cols])
 
 
-def create_pdf_report(metrics: dict, df_kec: pd.DataFrame, df_pusk: pd.DataFrame, df_common: pd.DataFrame, n_stats: dict, theme_name='Modern Minimalist') -> bytes:
-    """Legacy function for Standard Dashboard Report."""
+def _hash_isi(nilai):
+    """Potongan bytes untuk kunci cache: DataFrame di-hash per baris (isi + index), sisanya via JSON."""
+    if isinstance(nilai, pd.DataFrame):
+        return [
+            pd.util.hash_pandas_object(nilai, index=True).to_numpy().tobytes(),
+            json.dumps([[str(c), str(t)] for c, t in nilai.dtypes.items()]),
+        ]
+    return [json.dumps(nilai, sort_keys=True, default=str)]
+
+def kunci_laporan(jenis, data, config, theme_name):
+    """Kunci cache PDF berbasis isi: data (dict nama -> DataFrame/nilai), config, dan tema."""
+    parts = [VERSI_LAPORAN, jenis, theme_name, json.dumps(FONT_KUSTOM), json.dumps(config, sort_keys=True, default=str)]
+    for nama in sorted(data):
+        parts.append(nama)
+        parts += _hash_isi(data[nama])
+    return hash_bytes(*parts)
+
+def _dari_cache(kunci, buat, cache=True):
+    """Ambil PDF dari cache disk; jika belum ada, buat lalu simpan."""
+    if cache:
+        pdf_bytes = _CACHE_PDF.get(kunci)
+        if pdf_bytes is not None:
+            return pdf_bytes
+    pdf_bytes = bytes(buat())
+    if cache:
+        _CACHE_PDF.put(kunci, pdf_bytes)
+    return pdf_bytes
+
+def create_pdf_report(metrics: dict, df_kec: pd.DataFrame, df_pusk: pd.DataFrame, df_common: pd.DataFrame, n_stats: dict, theme_name='Modern Minimalist', cache=True) -> bytes:
+    """Legacy function for Standard Dashboard Report. Hasil identik diambil dari cache disk."""
+    kunci = kunci_laporan(
+        'standar', {'df_kec': df_kec, 'df_pusk': df_pusk, 'df_common': df_common},
+        {'metrics': metrics, 'n_stats': n_stats}, theme_name
+    )
+    return _dari_cache(kunci, lambda: _buat_pdf_report(metrics, df_kec, df_pusk, df_common, n_stats, theme_name), cache)
+
+def _buat_pdf_report(metrics, df_kec, df_pusk, df_common, n_stats, theme_name):
     pdf = PDFReport(theme_name=theme_name)
     pdf.add_page()
     
@@ -193,23 +444,13 @@ def create_pdf_report(metrics: dict, df_kec: pd.DataFrame, df_pusk: pd.DataFrame
 
     return pdf.output()
 
-def create_custom_pdf(config: dict, data: dict, theme_name='Modern Minimalist') -> bytes:
-    """
-    Generate Custom PDF based on user configuration.
-    Refactored for cleanliness and modularity.
-    """
-    pdf = PDFReport(theme_name=theme_name)
-    pdf.add_page()
-
-    # --- COVER / TITLE PAGE ---
-    title = config.get('title', 'Laporan Custom Rekap Data')
-    
-    # Manual Title Rendering for Cover
+def _cover(pdf, title):
+    """Judul laporan custom di halaman pertama."""
     pdf.set_y(pdf.get_y() + 10)
     pdf.set_font(pdf.theme['font_header'], 'B', 18)
     
     # Title Color Logic
-    if theme_name == 'Formal Monochrome':
+    if pdf.theme_name == 'Formal Monochrome':
         pdf.set_text_color(0, 0, 0)
     else:
         r,g,b = pdf.theme['header_bg']
@@ -219,79 +460,245 @@ def create_custom_pdf(config: dict, data: dict, theme_name='Modern Minimalist')
     pdf.ln(5)
     pdf.set_text_color(0,0,0) # Reset color
 
-    # --- DYNAMIC CHAPTERS ---
-    chapter_num = 1
+def _bab_tabel(pdf, nomor, judul, df, cols, force_new_page=False):
+    if force_new_page and pdf.get_y() > 240: pdf.add_page()
+    pdf.add_chapter_section(f"{nomor}. {judul}", df=df, columns=cols)
+
+def _bab_filter(pdf, nomor, label, df_filter, filter_metrics):
+    """Filter Wilayah (Drill Down)."""
+    pdf.add_page()
+    info = f"Wilayah: {label}\nTotal Kasus: {filter_metrics['kasus']:,}\n"
     
-    # Helper to condense logic
-    def process_section(key, df_key, title_fmt, cols=None, force_new_page=False):
-        nonlocal chapter_num
-        if config.get(key) and df_key in data and not data[df_key].empty:
-            if force_new_page and pdf.get_y() > 240: pdf.add_page()
-            
-            pdf.add_chapter_section(
-                f"{chapter_num}. {title_fmt}",
-                df=data[df_key],
-                columns=cols
-            )
-            chapter_num += 1
+    # Dynamic Columns
+    cols = ['Jenis Penyakit', 'Total_Kasus']
+    if 'Kecamatan' in df_filter.columns: cols.insert(0, 'Kecamatan')
+    if 'Puskesmas' in df_filter.columns: cols.insert(0, 'Puskesmas')
+    
+    pdf.add_chapter_section(
+        f"{nomor}. Laporan Spesifik: {label}",
+        body_text=info,
+        df=df_filter,
+        columns=cols
+    )
 
-    # 1. Top N Kecamatan
-    process_section('inc_kec', 'df_kec', "Top Penyakit per Kecamatan", ['Kecamatan', 'Jenis Penyakit', 'Total_Kasus'])
+def _bab_komparasi(pdf, nomor, comp_names, df_comp1, df_comp2, df_comp_intersect):
+    pdf.add_page()
+    pdf.chapter_title(f"{nomor}. Komparasi Puskesmas")
+    p1, p2 = comp_names
+    
+    def sub_header(text):
+        pdf.set_font(pdf.theme['font_header'], 'B', 10) # Use theme font
+        pdf.cell(0, 8, text, new_x="LMARGIN", new_y="NEXT")
+    
+    # Part A
+    sub_header(f"A. {p1} (Top 10)")
+    if not df_comp1.empty:
+        pdf.add_dataframe_table(df_comp1[['Jenis Penyakit', 'Total_Kasus']])
+    
+    pdf.ln(5)
+    # Part B
+    sub_header(f"B. {p2} (Top 10)")
+    if not df_comp2.empty:
+        pdf.add_dataframe_table(df_comp2[['Jenis Penyakit', 'Total_Kasus']])
+    
+    pdf.ln(5)
+    # Part C
+    sub_header(f"C. Irisan Penyakit (Sama-sama muncul di Top 10)")
+    if not df_comp_intersect.empty:
+        pdf.add_dataframe_table(df_comp_intersect)
+    else:
+        pdf.chapter_body("Tidak ada irisan penyakit signifikan.")
 
-    # 2. Top N Puskesmas
-    process_section('inc_pusk', 'df_pusk', "Top Penyakit per Puskesmas", ['Puskesmas', 'Jenis Penyakit', 'Total_Kasus'], force_new_page=True)
+# (key config, key data, judul, kolom, cek halaman baru) untuk bab tabel ranking
+BAB_TABEL_CUSTOM = [
+    ('inc_kec', 'df_kec', "Top Penyakit per Kecamatan", ['Kecamatan', 'Jenis Penyakit', 'Total_Kasus'], False),
+    ('inc_pusk', 'df_pusk', "Top Penyakit per Puskesmas", ['Puskesmas', 'Jenis Penyakit', 'Total_Kasus'], True),
+    ('inc_umum', 'df_umum', "Analisis Penyakit Dominan (Umum)", ['Jenis Penyakit', 'Frekuensi', 'Status'], True),
+]
 
-    # 3. Top N Umum
-    process_section('inc_umum', 'df_umum', "Analisis Penyakit Dominan (Umum)", ['Jenis Penyakit', 'Frekuensi', 'Status'], force_new_page=True)
+def _daftar_bab(config, data):
+    """Bab laporan custom sesuai config, sudah bernomor: list of (nomor, fungsi, args)."""
+    bab = []
+    for key, df_key, judul, cols, new_page in BAB_TABEL_CUSTOM:
+        if config.get(key) and df_key in data and not data[df_key].empty:
+            bab.append((_bab_tabel, (judul, data[df_key], cols, new_page)))
 
-    # 4. Filter Wilayah (Drill Down)
     if config.get('inc_filter') and not data.get('df_filter', pd.DataFrame()).empty:
-        pdf.add_page()
-        label = config.get('filter_label', 'Wilayah')
-        info = f"Wilayah: {label}\nTotal Kasus: {data['filter_metrics']['kasus']:,}\n"
-        
-        # Dynamic Columns
-        cols = ['Jenis Penyakit', 'Total_Kasus']
-        if 'Kecamatan' in data['df_filter'].columns: cols.insert(0, 'Kecamatan')
-        if 'Puskesmas' in data['df_filter'].columns: cols.insert(0, 'Puskesmas')
-        
-        pdf.add_chapter_section(
-            f"{chapter_num}. Laporan Spesifik: {label}",
-            body_text=info,
-            df=data['df_filter'],
-            columns=cols
-        )
-        chapter_num += 1
+        bab.append((_bab_filter, (config.get('filter_label', 'Wilayah'), data['df_filter'], data['filter_metrics'])))
 
-    # 5. Komparasi
     if config.get('inc_compare'):
-        pdf.add_page()
-        pdf.chapter_title(f"{chapter_num}. Komparasi Puskesmas")
-        p1, p2 = config.get('comp_names', ('A', 'B'))
-        
-        def sub_header(text):
-            pdf.set_font(pdf.theme['font_header'], 'B', 10) # Use theme font
-            pdf.cell(0, 8, text, new_x="LMARGIN", new_y="NEXT")
-        
-        # Part A
-        sub_header(f"A. {p1} (Top 10)")
-        if not data['df_comp1'].empty:
-            pdf.add_dataframe_table(data['df_comp1'][['Jenis Penyakit', 'Total_Kasus']])
-        
-        pdf.ln(5)
-        # Part B
-        sub_header(f"B. {p2} (Top 10)")
-        if not data['df_comp2'].empty:
-            pdf.add_dataframe_table(data['df_comp2'][['Jenis Penyakit', 'Total_Kasus']])
-        
-        pdf.ln(5)
-        # Part C
-        sub_header(f"C. Irisan Penyakit (Sama-sama muncul di Top 10)")
-        if not data['df_comp_intersect'].empty:
-            pdf.add_dataframe_table(data['df_comp_intersect'])
+        bab.append((_bab_komparasi, (
+            config.get('comp_names', ('A', 'B')), data['df_comp1'], data['df_comp2'], data['df_comp_intersect']
+        )))
+
+    return [(nomor, fungsi, args) for nomor, (fungsi, args) in enumerate(bab, 1)]
+
+def _bab_tabel_lanjutan(pdf, nomor, df, cols):
+    """Potongan lanjutan tabel besar di mode paralel (tanpa judul bab, header tabel tetap ada)."""
+    pdf.add_dataframe_table(df[[c for c in cols if c in df.columns]])
+
+def _potong_per_grup(df, kolom, ukuran):
+    """Potong df jadi bagian +-ukuran baris tanpa memisahkan grup (nilai `kolom` yang sama berurutan)."""
+    nilai = df[kolom].astype(str).to_numpy()
+    awal_grup = np.flatnonzero(np.r_[True, nilai[1:] != nilai[:-1]])
+    batas = [0]
+    for a in awal_grup:
+        if a - batas[-1] >= ukuran:
+            batas.append(a)
+    batas.append(len(df))
+    return [df.iloc[a:b] for a, b in zip(batas, batas[1:])]
+
+def _perkiraan_biaya(bab, theme_name):
+    """Baris tabel tertimbang: baris yang perlu word-wrap (table()) jauh lebih mahal dari jalur cepat."""
+    pdf = PDFReport(theme_name=theme_name)
+    biaya = 0
+    for _, _, args in bab:
+        for a in args:
+            if isinstance(a, pd.DataFrame) and not a.empty:
+                biaya += len(a) * (BIAYA_BARIS_CEPAT if pdf.table_fits(a) else BIAYA_BARIS_WRAP)
+    return biaya
+
+def _jobs_paralel(title, bab, n_workers):
+    """
+    Bagi laporan jadi job render: satu bab = satu job (cover ikut bab pertama), dan tabel
+    ranking yang jauh lebih besar dari rata-rata dipotong per grup agar beban worker seimbang.
+    Returns: list of (title atau None, daftar bab)
+    """
+    baris = [len(args[1]) if fungsi is _bab_tabel else 0 for _, fungsi, args in bab]
+    ukuran = max(1, -(-sum(baris) // n_workers))
+
+    jobs = []
+    for (nomor, fungsi, args), n in zip(bab, baris):
+        if fungsi is _bab_tabel and n > ukuran:
+            judul, df, cols, new_page = args
+            potongan = _potong_per_grup(df, cols[0], ukuran)
+            jobs.append([(nomor, _bab_tabel, (judul, potongan[0], cols, new_page))])
+            jobs += [[(nomor, _bab_tabel_lanjutan, (p, cols))] for p in potongan[1:]]
         else:
-            pdf.chapter_body("Tidak ada irisan penyakit signifikan.")
-            
-        chapter_num += 1
+            jobs.append([(nomor, fungsi, args)])
+    return [(title if i == 0 else None, job) for i, job in enumerate(jobs)]
 
-    return pdf.output()
+def _render_bagian(theme_name, title, bab, show_footer=True):
+    """Render cover (jika title diberikan) + daftar bab ke satu PDFReport. Returns: bytes PDF."""
+    pdf = PDFReport(theme_name=theme_name, show_footer=show_footer)
+    pdf.add_page()
+    if title is not None:
+        _cover(pdf, title)
+    for nomor, fungsi, args in bab:
+        fungsi(pdf, nomor, *args)
+    return bytes(pdf.output())
+
+def _gabung_halaman(bagian, theme_name):
+    """Gabungkan PDF per bagian lalu cap footer bernomor halaman kontinu di setiap halaman."""
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for isi in bagian:
+        writer.append(PdfReader(BytesIO(isi)))
+
+    # Overlay: halaman kosong berisi footer PDFReport saja, nomornya sesuai urutan gabungan
+    overlay = PDFReport(theme_name=theme_name, show_header=False)
+    for _ in writer.pages:
+        overlay.add_page()
+    footer = PdfReader(BytesIO(bytes(overlay.output()))).pages
+    for page, cap in zip(writer.pages, footer):
+        page.merge_page(cap)
+
+    buf = BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+def _render_paralel(theme_name, title, bab, max_workers=None):
+    """
+    Render job (lihat _jobs_paralel) di pool proses lalu gabungkan. Setiap job mulai di halaman baru.
+    Returns: bytes PDF, atau None jika pool tidak bisa dipakai (pemanggil fallback ke serial).
+    """
+    from logic import _jalankan_di_pool, ukuran_pool
+
+    n_workers = max_workers or ukuran_pool()
+    if n_workers < 2:
+        return None
+    bagian = _jalankan_di_pool(
+        _render_bagian, [(theme_name, judul, job, False) for judul, job in _jobs_paralel(title, bab, n_workers)], max_workers
+    )
+    if bagian is None:
+        return None
+    return _gabung_halaman(bagian, theme_name)
+
+def create_custom_pdf(config: dict, data: dict, theme_name='Modern Minimalist', paralel=None, max_workers=None, cache=True) -> bytes:
+    """
+    Generate Custom PDF based on user configuration.
+    paralel: True = render per bab/potongan tabel di proses terpisah lalu gabung (butuh pypdf),
+    False = serial, None = otomatis (paralel jika perkiraan biaya >= AMBANG_BIAYA_PARALEL).
+    Di mode paralel setiap bab/potongan dimulai di halaman baru; header & nomor halaman tetap kontinu.
+    Hasil untuk data, config & tema yang sama diambil dari cache disk.
+    """
+    kunci = kunci_laporan('custom', data, {'config': config, 'paralel': paralel}, theme_name)
+    return _dari_cache(kunci, lambda: _buat_custom_pdf(config, data, theme_name, paralel, max_workers), cache)
+
+def _buat_custom_pdf(config, data, theme_name, paralel, max_workers):
+    title = config.get('title', 'Laporan Custom Rekap Data')
+    bab = _daftar_bab(config, data)
+
+    if paralel is None:
+        paralel = _perkiraan_biaya(bab, theme_name) >= AMBANG_BIAYA_PARALEL
+    if paralel and bab and not ADA_PYPDF:
+        warnings.warn("pypdf tidak terpasang: Laporan Custom dirender serial (pip install pypdf untuk mode paralel)")
+    elif paralel and bab:
+        hasil = _render_paralel(theme_name, title, bab, max_workers)
+        if hasil is not None:
+            return hasil
+
+    return _render_bagian(theme_name, title, bab)
+
+def nama_berkas_entitas(scope, entitas, terpakai=None):
+    """
+    Nama file PDF per entitas yang aman untuk ZIP/filesystem, mis. 'Kecamatan_SEMARANG_UTARA.pdf'.
+    terpakai: set nama yang sudah dipakai (diperbarui). Entitas berbeda yang jadi nama sama
+    (mis. 'BULU LOR' & 'BULU-LOR') diberi akhiran angka: 'Puskesmas_BULU_LOR_2.pdf'.
+    """
+    aman = re.sub(r'[^0-9A-Za-z]+', '_', str(entitas)).strip('_') or 'TANPA_NAMA'
+    nama, ke = f"{scope}_{aman}.pdf", 1
+    if terpakai is None:
+        return nama
+    # Bandingkan tanpa membedakan huruf besar/kecil: filesystem Windows/macOS case-insensitive
+    while nama.casefold() in terpakai:
+        ke += 1
+        nama = f"{scope}_{aman}_{ke}.pdf"
+    terpakai.add(nama.casefold())
+    return nama
+
+def _render_banyak(theme_name, jobs, max_workers=None):
+    """Render banyak laporan custom (list of (config, data)) secara serial per laporan, tersebar di pool proses."""
+    from logic import _jalankan_di_pool, ukuran_pool
+
+    if min(max_workers or ukuran_pool(), len(jobs)) > 1:
+        hasil = _jalankan_di_pool(
+            _buat_custom_pdf, [(config, data, theme_name, False, None) for config, data in jobs], max_workers
+        )
+        if hasil is not None:
+            return hasil
+    return [_buat_custom_pdf(config, data, theme_name, False, None) for config, data in jobs]
+
+def create_batch_pdf(title, scope, per_entitas, theme_name='Modern Minimalist', max_workers=None, cache=True) -> dict:
+    """
+    Satu PDF drill-down per entitas (Kecamatan/Puskesmas) dari hasil logic.ranking_per_entitas.
+    Laporan yang sudah ada di cache disk tidak dirender ulang; sisanya dirender paralel di pool proses.
+    Returns: dict nama file PDF -> bytes, urut sesuai per_entitas
+    """
+    hasil, kunci_belum, jobs, terpakai = {}, {}, [], set()
+    for entitas, (df_filter, total_kasus) in per_entitas.items():
+        nama = nama_berkas_entitas(scope, entitas, terpakai)
+        config = {'title': f"{title} - {entitas}", 'inc_filter': True, 'filter_label': f"{entitas} ({scope})"}
+        data = {'df_filter': df_filter, 'filter_metrics': {'kasus': total_kasus}}
+        kunci = kunci_laporan('custom', data, {'config': config, 'paralel': False}, theme_name)
+        hasil[nama] = _CACHE_PDF.get(kunci) if cache else None
+        if hasil[nama] is None:
+            kunci_belum[nama] = kunci
+            jobs.append((config, data))
+
+    for (nama, kunci), pdf_bytes in zip(kunci_belum.items(), _render_banyak(theme_name, jobs, max_workers)):
+        hasil[nama] = pdf_bytes
+        if cache:
+            _CACHE_PDF.put(kunci, pdf_bytes)
+    return hasil
@@ -0,0 +1,307 @@
+"""
+Backend query SQL opsional (SQLite, bawaan Python) untuk ranking & drill-down.
+
+Kubus agregat (Puskesmas x Kecamatan x penyakit -> Total_Kasus) disimpan sekali di file
+database bersama; ranking, analisis penyakit umum, filter wilayah dan komparasi dijalankan
+sebagai query window function (ROW_NUMBER() OVER (PARTITION BY ...)). Sesi yang memuat data
+yang sama memakai satu salinan di disk (key: hash isi kubus).
+
+Aktif jika REKAP_DB berisi path file database, mis. REKAP_DB=./.rekap_cache/rekap.sqlite
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from disk_cache import hash_bytes
+
+DB_PATH = os.environ.get('REKAP_DB', '')
+# Dataset yang disimpan di database (LRU berdasarkan waktu terakhir disimpan/ditulis ulang sesi)
+MAKS_DATASET = int(os.environ.get('REKAP_DB_MAKS', '20') or 0)
+
+# ROW_NUMBER() butuh SQLite >= 3.25, json_each (filter daftar) butuh JSON1 (bawaan sejak 3.38)
+ADA_SQLITE = sqlite3.sqlite_version_info >= (3, 38)
+AKTIF = bool(DB_PATH) and ADA_SQLITE
+
+# Nama kolom wilayah di DataFrame -> kolom tabel
+_KOLOM = {'Puskesmas': 'puskesmas', 'Kecamatan': 'kecamatan'}
+_KOLOM_KUBUS_TEKS = ['Puskesmas', 'Kecamatan', 'Jenis Penyakit', 'ICD X', 'Total_Kasus']
+
+_SKEMA = """
+CREATE TABLE IF NOT EXISTS dataset (id TEXT PRIMARY KEY, dipakai REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS kubus (
+    dataset TEXT NOT NULL, puskesmas TEXT, kecamatan TEXT, jenis TEXT, icd TEXT, total REAL
+);
+CREATE INDEX IF NOT EXISTS kubus_puskesmas ON kubus (dataset, puskesmas, jenis, icd, total);
+CREATE INDEX IF NOT EXISTS kubus_kecamatan ON kubus (dataset, kecamatan, jenis, icd, total);
+"""
+
+_lokal = threading.local()
+
+
+def _koneksi(path=None):
+    """Satu koneksi per thread per file (koneksi sqlite3 tidak boleh dipakai lintas thread)."""
+    path = path or DB_PATH
+    conns = getattr(_lokal, 'conns', None)
+    if conns is None:
+        conns = _lokal.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        # WAL: banyak sesi bisa membaca sementara satu sesi menulis
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SKEMA)
+        conns[path] = conn
+    return conn
+
+
+def kunci_kubus(kubus):
+    """Hash isi kubus teks (urutan baris tidak berpengaruh)."""
+    baris = pd.util.hash_pandas_object(kubus[_KOLOM_KUBUS_TEKS], index=False).to_numpy()
+    baris.sort()
+    return hash_bytes(baris.tobytes())
+
+
+def _tulis_dataset(conn, ds, kubus):
+    """Tulis isi kubus sebagai dataset ds (dalam transaksi pemanggil) lalu buang dataset terlama di luar MAKS_DATASET."""
+    data = kubus[_KOLOM_KUBUS_TEKS].astype({'Puskesmas': str, 'Kecamatan': str})
+    conn.executemany(
+        "INSERT INTO kubus VALUES (?, ?, ?, ?, ?, ?)",
+        ((ds, *row) for row in data.itertuples(index=False, name=None))
+    )
+    if MAKS_DATASET:
+        lama = [r[0] for r in conn.execute(
+            "SELECT id FROM dataset ORDER BY dipakai DESC LIMIT -1 OFFSET ?", (MAKS_DATASET,)
+        )]
+        conn.executemany("DELETE FROM kubus WHERE dataset = ?", [(i,) for i in lama])
+        conn.executemany("DELETE FROM dataset WHERE id = ?", [(i,) for i in lama])
+
+
+def _pakai_dataset(conn, ds, bangun):
+    """
+    Simpan dataset (dari bangun(), kubus teks) jika belum ada, atau tandai baru saja dipakai
+    (urutan LRU). Hanya dipanggil saat dataset disimpan atau ditulis ulang, bukan setiap query.
+    Returns: True jika dataset ditulis.
+    """
+    sekarang = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        baru = conn.execute("INSERT OR IGNORE INTO dataset VALUES (?, ?)", (ds, sekarang)).rowcount
+        if baru:
+            _tulis_dataset(conn, ds, bangun())
+        else:
+            conn.execute("UPDATE dataset SET dipakai = ? WHERE id = ?", (sekarang, ds))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return bool(baru)
+
+
+def simpan_kubus(kubus, path=None, bangun=None):
+    """
+    Simpan kubus teks (kolom Puskesmas, Kecamatan, Jenis Penyakit, ICD X, Total_Kasus)
+    jika belum ada; dataset yang sama dari sesi lain tidak ditulis ulang.
+    bangun: callable yang menyusun ulang kubus teks bila dataset tergusur (LRU) sebelum handle
+    selesai dipakai; default handle menyimpan referensi ke `kubus`.
+    Returns: KubusSQL untuk dataset tersebut
+    """
+    ds = kunci_kubus(kubus)
+    _pakai_dataset(_koneksi(path), ds, lambda: kubus)
+    return KubusSQL(ds, path, bangun=bangun or (lambda: kubus))
+
+
+def _json(nilai):
+    return json.dumps([str(v) for v in nilai])
+
+
+class KubusSQL:
+    """
+    Handle ringan ke satu dataset di database, opsional dengan filter penyakit.
+    Hasil setiap method sama (isi, urutan & penomoran index) dengan fungsi pandas di logic.py.
+    Query hanya membaca (tanpa lock tulis, sesi lain bisa query bersamaan); dataset yang sudah
+    tergusur ditulis ulang lewat bangun, sehingga handle lama tidak diam-diam mengembalikan hasil kosong.
+    """
+
+    def __init__(self, dataset, path=None, where=(), params=(), bangun=None):
+        self.dataset = dataset
+        self.path = path
+        self._where = list(where)
+        self._params = list(params)
+        self._bangun = bangun
+
+    def filter(self, inc_a=(), inc_l=(), exc_a=(), exc_l=()):
+        """Setara IndeksFilter.terapkan: include (huruf awal ICD ATAU label) lalu exclude."""
+        alpha = "upper(substr(icd, 1, 1))"
+        label = "icd || ' - ' || jenis"
+        where, params = list(self._where), list(self._params)
+        if inc_a or inc_l:
+            where.append(f"({alpha} IN (SELECT value FROM json_each(?)) OR {label} IN (SELECT value FROM json_each(?)))")
+            params += [_json(inc_a), _json(inc_l)]
+        if exc_a or exc_l:
+            where.append(f"NOT ({alpha} IN (SELECT value FROM json_each(?)) OR {label} IN (SELECT value FROM json_each(?)))")
+            params += [_json(exc_a), _json(exc_l)]
+        return KubusSQL(self.dataset, self.path, where, params, self._bangun)
+
+    def _sumber(self, where=(), params=()):
+        """Subquery baris kubus dataset ini + filter handle + filter tambahan."""
+        kondisi = ["dataset = ?"] + self._where + list(where)
+        return f"SELECT * FROM kubus WHERE {' AND '.join(kondisi)}", [self.dataset] + self._params + list(params)
+
+    def _eksekusi(self, sql, params):
+        conn = _koneksi(self.path)
+        # Transaksi baca: snapshot WAL menjamin dataset yang ada di awal terbaca utuh
+        # walau sesi lain menggusurnya di tengah query
+        conn.execute("BEGIN")
+        try:
+            ada = conn.execute("SELECT 1 FROM dataset WHERE id = ?", (self.dataset,)).fetchone()
+            if ada or self._bangun is None:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        _pakai_dataset(conn, self.dataset, self._bangun)
+        return conn.execute(sql, params).fetchall()
+
+    def _query(self, sql, params, kolom):
+        return pd.DataFrame(self._eksekusi(sql, params), columns=kolom)
+
+    def _sql_ranking(self, group_col, top_n, where=(), params=()):
+        """CTE ranking: Top N penyakit per grup lewat ROW_NUMBER, seri urut abjad (Jenis Penyakit, ICD X)."""
+        kolom = _KOLOM[group_col]
+        sumber, params = self._sumber(where, params)
+        sql = f"""
+            WITH g AS (
+                SELECT {kolom} AS grup, jenis, icd, SUM(total) AS total
+                FROM ({sumber}) GROUP BY {kolom}, jenis, icd
+            ), r AS (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY grup ORDER BY total DESC, jenis, icd) AS rn FROM g
+            )
+            SELECT grup, jenis, icd, total, rn FROM r WHERE rn <= ?
+        """
+        return sql, params + [top_n]
+
+    def ranking(self, group_col, top_n=10, where=(), params=()):
+        """Setara hitung_ranking(df, [group_col], top_n)."""
+        sql, params = self._sql_ranking(group_col, top_n, where, params)
+        hasil = self._query(
+            f"SELECT grup, jenis, icd, total FROM ({sql}) ORDER BY grup, rn", params, [group_col, 'Jenis Penyakit', 'ICD X', 'Total_Kasus']
+        )
+        hasil.index += 1
+        return hasil
+
+    def penyakit_umum(self, group_col, top_n_ranking=10, top_n=5):
+        """Setara cari_penyakit_umum(hitung_ranking(df, [group_col], top_n_ranking), group_col, top_n)."""
+        sql, params = self._sql_ranking(group_col, top_n_ranking)
+        hasil = self._query(f"""
+            WITH top AS ({sql}),
+            n AS (SELECT COUNT(DISTINCT grup) AS n FROM top),
+            s AS (SELECT jenis, icd, COUNT(*) AS frek, SUM(total) AS total FROM top GROUP BY jenis, icd)
+            SELECT jenis, icd, frek, total,
+                CASE WHEN n.n = frek THEN 'LOLOS (Ada di SEMUA)'
+                     ELSE 'HAMPIR (Absen di ' || (n.n - frek) || ' unit)' END
+            FROM s, n ORDER BY frek DESC, total DESC, jenis, icd LIMIT ?
+        """, params + [top_n], ['Jenis Penyakit', 'ICD X', 'Frekuensi', 'Total_Kasus', 'Status'])
+        hasil.index += 1
+        return hasil
+
+    def rekap(self, top_n_kec=10, top_n_pusk=10, top_n_umum=5):
+        """Setara hitung_rekap. Returns: (top_kec, top_pusk, common_kec, common_pusk)"""
+        return (
+            self.ranking('Kecamatan', top_n_kec),
+            self.ranking('Puskesmas', top_n_pusk),
+            self.penyakit_umum('Kecamatan', top_n_kec, top_n_umum),
+            self.penyakit_umum('Puskesmas', top_n_pusk, top_n_umum),
+        )
+
+    def ringkasan(self):
+        """Metrik dashboard. Returns: (jumlah baris kubus, jumlah Puskesmas, total kasus)"""
+        sumber, params = self._sumber()
+        (baris, n_pusk, total), = self._eksekusi(
+            f"SELECT COUNT(*), COUNT(DISTINCT puskesmas), COALESCE(SUM(total), 0) FROM ({sumber})", params
+        )
+        return baris, n_pusk, total
+
+    def wilayah(self, scope, entitas, top_n=10):
+        """
+        Drill-down satu Kecamatan/Puskesmas (mode Filter Wilayah).
+        Returns: (ranking Top N, dict total/unik/jumlah_pusk/kecamatan)
+        """
+        where = [f"{_KOLOM[scope]} = ?"]
+        sumber, params = self._sumber(where, [entitas])
+        (total, unik, n_pusk, kec), = self._eksekusi(f"""
+            SELECT COALESCE(SUM(total), 0), COUNT(DISTINCT jenis), COUNT(DISTINCT puskesmas), MIN(kecamatan)
+            FROM ({sumber})
+        """, params)
+        metrik = {'total': total, 'unik': unik, 'jumlah_pusk': n_pusk, 'kecamatan': kec}
+        return self.ranking(scope, top_n, where, [entitas]), metrik
+
+    def _sql_top(self, puskesmas):
+        """Total per penyakit di satu Puskesmas + peringkat (rn), seri urut abjad."""
+        sumber, params = self._sumber(["puskesmas = ?"], [puskesmas])
+        sql = f"""
+            SELECT jenis, icd, SUM(total) AS total,
+                ROW_NUMBER() OVER (ORDER BY SUM(total) DESC, jenis, icd) AS rn
+            FROM ({sumber}) GROUP BY jenis, icd
+        """
+        return sql, params
+
+    def top_penyakit(self, puskesmas, top_n=10):
+        """Setara top_penyakit(kubus[kubus['Puskesmas'] == puskesmas], top_n)."""
+        sql, params = self._sql_top(puskesmas)
+        return self._query(
+            f"SELECT jenis, icd, total FROM ({sql}) WHERE rn <= ? ORDER BY rn",
+            params + [top_n], ['Jenis Penyakit', 'ICD X', 'Total_Kasus']
+        )
+
+    def komparasi(self, p1, p2, top_n=5):
+        """
+        Head-to-head dua Puskesmas (mode Komparasi).
+        Returns: (total p1, total p2, top p1, top p2, irisan Top N berdasarkan Jenis Penyakit)
+        """
+        sumber, params = self._sumber(["puskesmas IN (?, ?)"], [p1, p2])
+        total = dict(self._eksekusi(
+            f"SELECT puskesmas, SUM(total) FROM ({sumber}) GROUP BY puskesmas", params
+        ))
+        sql1, params1 = self._sql_top(p1)
+        sql2, params2 = self._sql_top(p2)
+        irisan = self._query(f"""
+            SELECT a.jenis, a.total, b.total
+            FROM ({sql1}) a JOIN ({sql2}) b ON a.jenis = b.jenis
+            WHERE a.rn <= ? AND b.rn <= ? ORDER BY a.rn, b.rn
+        """, params1 + params2 + [top_n, top_n], ['Jenis Penyakit', f'Total_Kasus_{p1}', f'Total_Kasus_{p2}'])
+        return (
+            total.get(p1, 0), total.get(p2, 0),
+            self.top_penyakit(p1, top_n), self.top_penyakit(p2, top_n), irisan
+        )
+
+    def ranking_per_entitas(self, scope, top_n=20):
+        """Setara ranking_per_entitas(kubus, scope, top_n). Returns: dict entitas -> (ranking, total), urut abjad"""
+        ranking = self.ranking(scope, top_n)
+        sumber, params = self._sumber()
+        total = dict(self._eksekusi(f"SELECT {_KOLOM[scope]}, SUM(total) FROM ({sumber}) GROUP BY 1", params))
+        hasil = {}
+        for entitas, grup in ranking.groupby(scope, sort=False):
+            grup = grup.reset_index(drop=True)
+            grup.index += 1
+            hasil[str(entitas)] = (grup, total[entitas])
+        return dict(sorted(hasil.items()))
+
+    def daftar(self, scope, kecamatan=None):
+        """Nama Kecamatan/Puskesmas yang ada di dataset (urut abjad), opsional hanya di satu Kecamatan."""
+        where, params = (["kecamatan = ?"], [kecamatan]) if kecamatan is not None else ((), ())
+        sumber, params = self._sumber(where, params)
+        kolom = _KOLOM[scope]
+        baris = self._eksekusi(f"SELECT DISTINCT {kolom} FROM ({sumber}) WHERE {kolom} IS NOT NULL", params)
+        return sorted(str(r[0]) for r in baris)
+
+    def penyakit(self):
+        """Pilihan filter penyakit yang ada di dataset. Returns: (label 'ICD X - Jenis Penyakit', huruf awal ICD), urut abjad"""
+        sumber, params = self._sumber()
+        baris = self._eksekusi(f"SELECT DISTINCT icd, jenis FROM ({sumber})", params)
+        label = sorted({f"{icd} - {jenis}" for icd, jenis in baris})
+        alpha = sorted({str(icd)[:1].upper() for icd, _ in baris})
+        return label, alpha
@@ -0,0 +1,59 @@
+import io
+import os
+import random
+import sys
+import tempfile
+
+import pytest
+
+# Modul aplikasi berupa file datar di root repo; cache disk test dipisah dari cache aplikasi
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['REKAP_CACHE_DIR'] = tempfile.mkdtemp(prefix='rekap_test_cache_')
+os.environ.pop('REKAP_DB', None)
+
+# Nama file = nama di mapping_kecamatan.csv (PONCOL & MIROTO satu kecamatan)
+PUSKESMAS_SAMPEL = ['PONCOL', 'MIROTO', 'BANDARHARJO', 'BULU LOR', 'HALMAHERA', 'KAGOK', 'NGEREP']
+
+PENYAKIT = [(f'{huruf}{i:02d}', f'Penyakit {huruf}{i:02d}') for huruf in 'ABJK' for i in range(10)]
+
+
+def buat_xlsx(baris, header=None):
+    """Workbook format laporan: baris 1 judul, baris 2 header (A-C teks, D-AY angka), lalu data."""
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['LAPORAN BULANAN LB1'])
+    ws.append(header or ['No', 'Jenis Penyakit', 'ICD X'] + [f'K{i}' for i in range(48)])
+    for row in baris:
+        ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _baris_acak(rng, n):
+    """Baris data acak: sebagian penyakit berulang, sel angka kosong/'-', plus baris TOTAL."""
+    baris = []
+    for no, (icd, jenis) in enumerate(rng.sample(PENYAKIT, n), 1):
+        angka = [rng.choice([None, '-', 0]) if rng.random() < 0.3 else rng.randint(1, 5000) for _ in range(48)]
+        baris.append([no, f'  {jenis.lower()} ', icd] + angka)
+    icd, jenis = rng.choice(PENYAKIT)
+    baris.append([n + 1, jenis, icd] + [rng.randint(1, 9)] + [None] * 47)
+    baris.append([None, 'TOTAL', None] + [99999] * 48)
+    return baris
+
+
+@pytest.fixture(scope='session')
+def file_sampel():
+    """list of (nama_file, bytes) untuk beberapa puskesmas, deterministik."""
+    rng = random.Random(2026)
+    return [(f'{nama}.xlsx', buat_xlsx(_baris_acak(rng, 25))) for nama in PUSKESMAS_SAMPEL]
+
+
+@pytest.fixture
+def tanpa_cache(monkeypatch):
+    """Matikan cache hasil parsing agar setiap pemanggilan benar-benar mem-parse file."""
+    import logic
+    from disk_cache import DiskCache
+    monkeypatch.setattr(logic, '_CACHE_PARSING', DiskCache('parsed', max_mb=0))
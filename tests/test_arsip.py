@@ -0,0 +1,56 @@
+import os
+
+import pandas as pd
+import pytest
+
+import logic
+
+pytest.importorskip('pyarrow')
+import arsip  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def master_df(file_sampel):
+    master_df, _, _ = logic.bangun_dataset(logic.baca_banyak_file(file_sampel, max_workers=1))
+    return logic.KAMUS_PENYAKIT.dekode(master_df)[logic.KOLOM_MASTER]
+
+
+@pytest.fixture
+def root(tmp_path, master_df, monkeypatch):
+    monkeypatch.setattr(arsip, '_CACHE_PARTISI', arsip.OrderedDict())
+    monkeypatch.setattr(arsip, '_ukuran_cache', 0)
+    arsip.simpan_periode(master_df, 2026, 1, str(tmp_path))
+    arsip.simpan_periode(master_df[master_df['Puskesmas'] == 'PONCOL'], 2026, 2, str(tmp_path))
+    return str(tmp_path)
+
+
+def test_periode_dan_rentang(root, master_df):
+    assert arsip.daftar_periode(root) == [(2026, 1), (2026, 2)]
+    hasil = arsip.muat_rentang((2026, 2), (2026, 2), root=root)
+    assert [log['file'] for _, _, log in hasil] == ['2026-02/PONCOL']
+    semua = pd.concat([df for _, df, _ in arsip.muat_rentang((2026, 1), (2026, 1), root=root)])
+    assert semua['Total_Kasus'].sum() == master_df['Total_Kasus'].sum()
+
+
+def test_folder_bukan_angka_dilewati(root):
+    os.makedirs(os.path.join(root, 'tahun=lama', 'bulan=01'))
+    os.makedirs(os.path.join(root, 'tahun=2026', 'bulan=xx'))
+    assert arsip.daftar_periode(root) == [(2026, 1), (2026, 2)]
+
+
+def test_cache_partisi_dibatasi_ukuran(root, monkeypatch):
+    paths = [path for _, _, path in arsip.partisi_rentang((2026, 1), (2026, 2), root=root)]
+    ukuran = [int(pd.read_parquet(p).memory_usage(deep=True).sum()) for p in paths]
+    # Batas cukup untuk partisi terbesar saja: cache tidak pernah melebihinya
+    monkeypatch.setattr(arsip, 'MAKS_CACHE_MB', max(ukuran) / (1024 * 1024))
+    for p in paths:
+        assert arsip.baca_partisi(p) is arsip.baca_partisi(p)
+        assert arsip._ukuran_cache <= max(ukuran)
+    assert arsip._ukuran_cache == sum(n for _, _, n in arsip._CACHE_PARTISI.values())
+    assert list(arsip._CACHE_PARTISI)[-1] == paths[-1]
+
+    monkeypatch.setattr(arsip, 'MAKS_CACHE_MB', 0)
+    arsip._CACHE_PARTISI.clear()
+    monkeypatch.setattr(arsip, '_ukuran_cache', 0)
+    arsip.baca_partisi(paths[0])
+    assert len(arsip._CACHE_PARTISI) == 0
@@ -0,0 +1,141 @@
+import gc
+
+import pandas as pd
+import pytest
+
+import logic
+from logic import REGISTRI_DATASET, REGISTRI_PARTISI, DatasetInkremental
+
+
+def _upload(file_sampel, awalan='id'):
+    """Format DatasetInkremental.sinkron: (file_id, nama, fungsi_ambil_bytes)."""
+    return [(f'{awalan}{i}', nama, (lambda isi=isi: isi)) for i, (nama, isi) in enumerate(file_sampel)]
+
+
+def _urut(df):
+    df = logic.KAMUS_PENYAKIT.dekode(df)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(str)
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def _cek_sama_dengan_bangun_ulang(dataset, files):
+    master_df, kubus, _ = logic.bangun_dataset(logic.baca_banyak_file([(n, ambil()) for _, n, ambil in files], max_workers=1))
+    for hasil, acuan in [(dataset.master_df, master_df), (dataset.kubus, kubus)]:
+        pd.testing.assert_frame_equal(_urut(hasil), _urut(acuan))
+    for hasil, acuan in zip(logic.hitung_rekap(dataset.kubus), logic.hitung_rekap(kubus)):
+        pd.testing.assert_frame_equal(hasil, acuan)
+    assert list(dataset.kubus['Puskesmas'].cat.categories) == list(kubus['Puskesmas'].cat.categories)
+
+
+@pytest.fixture(autouse=True)
+def registri_bersih():
+    gc.collect()
+    yield
+    gc.collect()
+
+
+def test_tambah_dan_hapus_file_sama_dengan_bangun_ulang(file_sampel):
+    files = _upload(file_sampel)
+    ds = DatasetInkremental()
+    assert ds.sinkron(files[:4], max_workers=1)
+    _cek_sama_dengan_bangun_ulang(ds, files[:4])
+
+    # File terlambat: hanya file baru yang di-parse, baris lama tetap di depan
+    master_lama = ds.master_df
+    assert ds.sinkron(files[:5], max_workers=1)
+    _cek_sama_dengan_bangun_ulang(ds, files[:5])
+    pd.testing.assert_frame_equal(
+        ds.master_df.iloc[:len(master_lama)].reset_index(drop=True), master_lama, check_categorical=False
+    )
+
+    assert ds.sinkron(files[1:3] + files[4:6], max_workers=1)
+    _cek_sama_dengan_bangun_ulang(ds, files[1:3] + files[4:6])
+    assert ds.filter_master.df is ds.master_df
+
+    # Upload ganda file yang sama tetap dihitung dua kali
+    dobel = files[1:3] + [('dobel', files[1][1], files[1][2])]
+    assert ds.sinkron(dobel, max_workers=1)
+    _cek_sama_dengan_bangun_ulang(ds, dobel)
+    assert not ds.sinkron(dobel, max_workers=1)
+
+
+def test_rerun_tanpa_perubahan_tidak_membaca_file(file_sampel):
+    files = _upload(file_sampel[:3])
+    ds = DatasetInkremental()
+    ds.sinkron(files, max_workers=1)
+
+    def gagal():
+        raise AssertionError('file lama tidak boleh dibaca ulang')
+
+    assert not ds.sinkron([(fid, nama, gagal) for fid, nama, _ in files], max_workers=1)
+
+
+def test_kunci_dari_pemanggil_tidak_dihash_ulang(file_sampel, tanpa_cache, monkeypatch):
+    kunci = [logic.kunci_cache_file(nama, isi) for nama, isi in file_sampel[:2]]
+
+    def gagal(*args, **kwargs):
+        raise AssertionError('kunci sudah diberikan pemanggil')
+
+    monkeypatch.setattr(logic, 'kunci_cache_file', gagal)
+    hasil = logic.baca_banyak_file(file_sampel[:2], max_workers=1, kunci=kunci)
+    assert [log['status'] for _, log in hasil] == ['SUCCESS', 'SUCCESS']
+
+
+def test_tanpa_gabungan_di_memori(file_sampel):
+    files = _upload(file_sampel[:4])
+    acuan = DatasetInkremental()
+    acuan.sinkron(files, max_workers=1)
+    ds = DatasetInkremental(gabung=False)
+    assert ds.kosong()
+    assert ds.sinkron(files, max_workers=1)
+
+    assert ds.master_df.empty and ds.kubus.empty and ds._gabungan is None
+    assert not ds.kosong()
+    pd.testing.assert_frame_equal(ds.susun_master(), acuan.master_df)
+    pd.testing.assert_frame_equal(ds.pratinjau(), acuan.master_df.head(), check_categorical=False)
+    bangun = ds.pembangun_kubus()
+    pd.testing.assert_frame_equal(_urut(bangun()), _urut(acuan.kubus))
+
+    # Kubus yang dipegang backend SQL tidak ikut berubah saat daftar file berubah
+    ds.sinkron(files[:2], max_workers=1)
+    pd.testing.assert_frame_equal(_urut(bangun()), _urut(acuan.kubus))
+
+
+def test_registri_berbagi_dan_menghitung_referensi(file_sampel):
+    files = _upload(file_sampel[:4])
+    a = DatasetInkremental()
+    a.sinkron(files, max_workers=1)
+    kunci = a._gabungan.kunci
+
+    # Sesi lain, file sama dengan id & urutan upload berbeda: frame yang sama dipakai
+    b = DatasetInkremental()
+    b.sinkron(list(reversed(_upload(file_sampel[:4], 'lain'))), max_workers=1)
+    assert b.master_df is a.master_df
+    assert REGISTRI_DATASET.jumlah_referensi(kunci) == 2
+    assert all(REGISTRI_PARTISI.jumlah_referensi(h.kunci) == 2 for h in a.partisi.values())
+
+    b.sinkron(_upload(file_sampel[:2], 'lain'), max_workers=1)
+    assert REGISTRI_DATASET.jumlah_referensi(kunci) == 1
+
+    partisi = [h.kunci for h in a.partisi.values()]
+    del a
+    gc.collect()
+    assert REGISTRI_DATASET.jumlah_referensi(kunci) == 0
+    assert [REGISTRI_PARTISI.jumlah_referensi(k) for k in partisi] == [1, 1, 0, 0]
+    del b
+    gc.collect()
+    assert all(REGISTRI_PARTISI.jumlah_referensi(k) == 0 for k in partisi)
+
+
+def test_ambil_hanya_membangun_sekali():
+    registri = logic.RegistriBersama()
+    dibangun = []
+    h1 = registri.ambil('k', lambda: dibangun.append(1) or 'nilai')
+    h2 = registri.ambil('k', lambda: dibangun.append(2) or 'lain')
+    assert (h1.nilai, h2.nilai, dibangun) == ('nilai', 'nilai', [1])
+    assert registri.jumlah_referensi('k') == 2
+    del h1, h2
+    gc.collect()
+    assert len(registri) == 0 and registri.cari('k') is None
@@ -0,0 +1,67 @@
+import os
+
+import pandas as pd
+import pytest
+
+import logic
+from disk_cache import DiskCache, hash_bytes
+
+
+def test_put_get_dan_eviksi_lru(tmp_path):
+    cache = DiskCache('uji', directory=str(tmp_path), max_mb=1)
+    cache.put('a', b'x' * 600_000)
+    cache.put('b', b'y' * 600_000)
+    assert cache.get('a') is None
+    assert cache.get('b') == b'y' * 600_000
+
+
+def test_scan_folder_hanya_saat_melewati_batas(tmp_path, monkeypatch):
+    cache = DiskCache('uji', directory=str(tmp_path), max_mb=1)
+    scan = []
+    asli = cache._entries
+    monkeypatch.setattr(cache, '_entries', lambda: scan.append(1) or asli())
+    for i in range(5):
+        cache.put(f'k{i}', b'x' * 100_000)
+    cache.put('k0', b'y' * 100_000)  # Timpa entry: ukuran lama tidak dihitung dua kali
+    assert len(scan) == 1 and cache._total == 500_000
+    cache.put('besar', b'z' * 600_000)
+    assert len(scan) == 2 and cache._total <= 1024 * 1024
+    assert cache.get('besar') is not None
+
+
+def test_file_sementara_dihapus_jika_gagal(tmp_path, monkeypatch):
+    cache = DiskCache('uji', directory=str(tmp_path))
+
+    def gagal(src, dst):
+        raise OSError('disk penuh')
+
+    monkeypatch.setattr(os, 'replace', gagal)
+    cache.put('a', b'isi')
+    assert os.listdir(cache.directory) == []
+
+    def terputus(src, dst):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(os, 'replace', terputus)
+    with pytest.raises(KeyboardInterrupt):
+        cache.put('a', b'isi')
+    assert os.listdir(cache.directory) == []
+
+
+def test_baca_banyak_file_pakai_cache(file_sampel, monkeypatch, tmp_path):
+    monkeypatch.setattr(logic, '_CACHE_PARSING', DiskCache('parsed', directory=str(tmp_path), suffix='.parquet'))
+    pertama = logic.baca_banyak_file(file_sampel[:3], max_workers=1)
+
+    def gagal(*args, **kwargs):
+        raise AssertionError('file yang sudah di-cache tidak boleh di-parse ulang')
+
+    monkeypatch.setattr(logic, '_proses_paralel', gagal)
+    kedua = logic.baca_banyak_file(file_sampel[:3], max_workers=1)
+    for (df1, log1), (df2, log2) in zip(pertama, kedua):
+        pd.testing.assert_frame_equal(df1, df2)
+        assert log1 == log2
+
+
+def test_hash_bytes_memakai_prefix_panjang():
+    assert hash_bytes('ab', 'c') != hash_bytes('a', 'bc')
+    assert hash_bytes('abc') == hash_bytes(b'abc')
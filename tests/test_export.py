@@ -0,0 +1,45 @@
+import io
+import threading
+import zipfile
+
+import pandas as pd
+
+import export
+
+
+def _data(n):
+    return {'Data Mentah': pd.DataFrame({'Puskesmas': ['PONCOL'] * n, 'Total_Kasus': range(n)})}
+
+
+def test_unduhan_bersamaan_membaca_isi_utuh(monkeypatch):
+    monkeypatch.setattr(export, 'BATAS_SPOOL_MB', 0)  # Paksa file spool pindah ke disk
+    monkeypatch.setattr(export, 'UKURAN_BACA', 1000)
+    f = export.buat_zip(_data(20_000))
+    acuan = export.buka_unduhan(f).read()
+    hasil, error = [], []
+
+    def unduh():
+        try:
+            hasil.append(export.buka_unduhan(f).read())
+        except Exception as e:
+            error.append(e)
+
+    threads = [threading.Thread(target=unduh) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert error == []
+    assert hasil == [acuan] * 8
+    with zipfile.ZipFile(io.BytesIO(acuan)) as zf:
+        assert pd.read_csv(zf.open('Data Mentah.csv'))['Total_Kasus'].sum() == sum(range(20_000))
+
+
+def test_posisi_baca_tiap_handle_terpisah():
+    f = export.buat_berkas(_data(100)['Data Mentah'])
+    a, b = export.buka_unduhan(f), export.buka_unduhan(f)
+    awal = a.read(10)
+    assert b.read(10) == awal
+    assert a.read() == b.read()
+    assert b.seek(0, io.SEEK_END) == a.tell()
+    assert b.read() == b''
@@ -0,0 +1,77 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import logic
+from conftest import buat_xlsx
+
+
+class FileUpload(io.BytesIO):
+    def __init__(self, isi, name):
+        super().__init__(isi)
+        self.name = name
+
+
+def baca_baseline(isi, nama):
+    """Logika pembersihan versi awal (pd.read_excel penuh) sebagai acuan hasil."""
+    df = pd.read_excel(io.BytesIO(isi), header=1, engine='openpyxl')
+    df = df[~df['Jenis Penyakit'].astype(str).str.contains('TOTAL|JUMLAH|SUB TOTAL', case=False, na=False)]
+    total = df.iloc[:, 3:51].apply(pd.to_numeric, errors='coerce').fillna(0).sum(axis=1)
+    hasil = pd.DataFrame({
+        'Jenis Penyakit': df['Jenis Penyakit'].astype(str).str.strip().str.upper(),
+        'ICD X': df['ICD X'].astype(str).str.strip().str.upper(),
+        'Total_Kasus': total,
+    })
+    return hasil[hasil['Total_Kasus'] > 0].reset_index(drop=True)
+
+
+@pytest.fixture(params=['calamine', 'openpyxl'])
+def engine(request, monkeypatch):
+    if request.param == 'calamine':
+        pytest.importorskip('python_calamine')
+    monkeypatch.setattr(logic, 'ENGINE_EXCEL', request.param)
+    return request.param
+
+
+def test_sama_dengan_baseline(engine, file_sampel):
+    for nama, isi in file_sampel:
+        df, log = logic.baca_dan_bersihkan_file(FileUpload(isi, nama))
+        assert log['status'] == 'SUCCESS', log
+        pd.testing.assert_frame_equal(df[['Jenis Penyakit', 'ICD X', 'Total_Kasus']], baca_baseline(isi, nama))
+        assert set(df['Puskesmas']) == {os.path.splitext(nama)[0]}
+
+
+def test_sel_teks_kosong_jadi_nan_seperti_baseline(engine):
+    isi = buat_xlsx([
+        [1, None, 'A09', 3],
+        [2, 'Diare', None, 4],
+        [3, 'Flu', 'J11', None, '-', 'x'],
+    ])
+    df, _ = logic.baca_dan_bersihkan_file(FileUpload(isi, 'PONCOL.xlsx'))
+    pd.testing.assert_frame_equal(df[['Jenis Penyakit', 'ICD X', 'Total_Kasus']], baca_baseline(isi, 'PONCOL.xlsx'))
+    assert df['Jenis Penyakit'].tolist() == ['NAN', 'DIARE']
+    assert df['ICD X'].tolist() == ['A09', 'NAN']
+
+
+def test_kolom_wajib_hilang(engine):
+    isi = buat_xlsx([[1, 'Diare', 'A09', 3]], header=['No', 'Penyakit', 'Kode'] + [f'K{i}' for i in range(48)])
+    df, log = logic.baca_dan_bersihkan_file(FileUpload(isi, 'PONCOL.xlsx'))
+    assert df.empty
+    assert log['status'] == 'ERROR'
+
+
+def test_file_rusak_dilaporkan_error():
+    df, log = logic.baca_dan_bersihkan_file(FileUpload(b'bukan excel', 'PONCOL.xlsx'))
+    assert df.empty
+    assert log['status'] == 'ERROR'
+
+
+def test_angka_bulat_int32_dan_pecahan_float():
+    blok = pd.DataFrame({'a': [1, None, '2'], 'b': ['-', 3, 4.5]})
+    nilai = logic._angka_blok(blok)
+    assert nilai.dtype == np.float64
+    np.testing.assert_array_equal(nilai, [[1, 0], [0, 3], [2, 4.5]])
+    assert logic._angka_blok(pd.DataFrame({'a': [1, None], 'b': [2, 3]})).dtype == np.int32
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+import logic
+import pdf_generator
+
+
+@pytest.fixture(scope='module')
+def per_puskesmas(file_sampel):
+    _, kubus, _ = logic.bangun_dataset(logic.baca_banyak_file(file_sampel, max_workers=1))
+    return logic.ranking_per_entitas(kubus, 'Puskesmas', top_n=5)
+
+
+def test_tanpa_pypdf_serial_dengan_peringatan(per_puskesmas, monkeypatch):
+    entitas, (df_filter, total) = next(iter(per_puskesmas.items()))
+    config = {'title': 'Uji', 'inc_filter': True, 'filter_label': entitas}
+    data = {'df_filter': df_filter, 'filter_metrics': {'kasus': total}}
+    monkeypatch.setattr(pdf_generator, 'ADA_PYPDF', False)
+    with pytest.warns(UserWarning, match='pypdf'):
+        hasil = pdf_generator.create_custom_pdf(config, data, paralel=True, cache=False)
+    assert hasil.startswith(b'%PDF')
+
+
+def test_nama_berkas_bertabrakan_diberi_akhiran(per_puskesmas):
+    terpakai = set()
+    nama = [pdf_generator.nama_berkas_entitas('Puskesmas', e, terpakai) for e in ['BULU LOR', 'BULU-LOR', 'bulu lor', 'BULU LOR 2']]
+    assert nama == ['Puskesmas_BULU_LOR.pdf', 'Puskesmas_BULU_LOR_2.pdf', 'Puskesmas_bulu_lor_3.pdf', 'Puskesmas_BULU_LOR_2_2.pdf']
+
+    per_entitas = dict(zip(['BULU LOR', 'BULU-LOR'], per_puskesmas.values()))
+    hasil = pdf_generator.create_batch_pdf('Uji', 'Puskesmas', per_entitas, max_workers=1, cache=False)
+    assert list(hasil) == ['Puskesmas_BULU_LOR.pdf', 'Puskesmas_BULU_LOR_2.pdf']
+    assert hasil['Puskesmas_BULU_LOR.pdf'] != hasil['Puskesmas_BULU_LOR_2.pdf']
+
+
+@pytest.mark.parametrize('cepat', [True, False])
+def test_font_kustom_cache_dan_add_font(monkeypatch, cepat):
+    path = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+    if not os.path.exists(path):
+        pytest.skip('font DejaVu tidak tersedia')
+    monkeypatch.setattr(pdf_generator, 'FONT_CEPAT', cepat)
+    monkeypatch.setitem(pdf_generator.FONT_KUSTOM, 'helvetica', path)
+    monkeypatch.setattr(pdf_generator, '_CACHE_TEMA', {})
+    hasil = []
+    for _ in range(2):
+        pdf = pdf_generator.PDFReport('Modern Minimalist')
+        pdf.add_page()
+        pdf.set_font(pdf.theme['font_body'], '', 10)
+        pdf.cell(0, 10, 'Demam berdarah – ĕ')
+        hasil.append(bytes(pdf.output()))
+    assert all(h.startswith(b'%PDF') for h in hasil)
+    assert b'DejaVuSans' in hasil[1]
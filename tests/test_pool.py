@@ -0,0 +1,92 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import logic
+
+
+@pytest.fixture
+def pool_dua(monkeypatch, tanpa_cache):
+    """Pool bersama 2 worker yang dibuat ulang untuk test ini lalu ditutup."""
+    logic._tutup_pool()
+    monkeypatch.setattr(logic, 'JUMLAH_WORKER', 2)
+    yield
+    logic._tutup_pool()
+
+
+def _sama(hasil, acuan):
+    assert len(hasil) == len(acuan)
+    for (df, log), (df_acuan, log_acuan) in zip(hasil, acuan):
+        pd.testing.assert_frame_equal(df, df_acuan)
+        assert log == log_acuan
+
+
+def test_paralel_sama_dengan_serial(file_sampel, pool_dua):
+    acuan = logic.baca_banyak_file(file_sampel, max_workers=1)
+    _sama(logic.baca_banyak_file(file_sampel), acuan)
+    assert logic._POOL is not None and logic._POOL._max_workers == 2
+
+
+def test_max_workers_menentukan_ukuran_pool_baru(file_sampel, tanpa_cache):
+    logic._tutup_pool()
+    try:
+        logic.baca_banyak_file(file_sampel, max_workers=3)
+        assert logic._POOL._max_workers == 3
+    finally:
+        logic._tutup_pool()
+
+
+def test_pool_dipakai_bersama_banyak_thread(file_sampel, pool_dua):
+    acuan = logic.baca_banyak_file(file_sampel, max_workers=1)
+    pool = logic._ambil_pool()
+    hasil, error = {}, []
+
+    def jalankan(n):
+        try:
+            # Jumlah file berbeda per "sesi": pool tidak boleh di-resize/ditutup di tengah jalan
+            for _ in range(3):
+                hasil[n] = logic.baca_banyak_file(file_sampel[:n], max_workers=n)
+        except Exception as e:
+            error.append(e)
+
+    threads = [threading.Thread(target=jalankan, args=(n,)) for n in (2, 3, 5, 7)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert error == []
+    for n, h in hasil.items():
+        _sama(h, acuan[:n])
+    assert logic._POOL is pool
+
+
+def test_pool_ditutup_fallback_serial(file_sampel, pool_dua):
+    acuan = logic.baca_banyak_file(file_sampel[:3], max_workers=1)
+    pool = logic._ambil_pool()
+    pool.shutdown()
+    _sama(logic.baca_banyak_file(file_sampel[:3]), acuan)
+    # Pool yang sudah mati dibuang; pemanggil berikutnya mendapat pool baru
+    assert logic._POOL is None
+    _sama(logic.baca_banyak_file(file_sampel[:3]), acuan)
+    assert logic._POOL is not pool
+
+
+def test_pool_gagal_tidak_membuang_pool_baru(pool_dua):
+    lama = logic._ambil_pool()
+    logic._tutup_pool()
+    baru = logic._ambil_pool()
+    logic._pool_gagal(lama)
+    assert logic._POOL is baru
+
+
+@pytest.mark.parametrize('fungsi,args,error', [(int, 'x', ValueError), (os.stat, '/tidak/ada', OSError)])
+def test_error_job_diteruskan_tanpa_membuang_pool(pool_dua, fungsi, args, error):
+    pool = logic._ambil_pool()
+    with pytest.raises(error):
+        logic._jalankan_di_pool(fungsi, [(args,), (args,)])
+    # Error milik job bukan tanda pool rusak: pool bersama tetap dipakai sesi lain
+    assert logic._POOL is pool
+    assert logic._jalankan_di_pool(abs, [(-1,), (-2,)]) == [1, 2]
@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+import logic
+
+# Acuan versi awal memakai groupby.apply atas kolom grup (deprecated di pandas 2.2)
+pytestmark = pytest.mark.filterwarnings('ignore:DataFrameGroupBy.apply:FutureWarning')
+
+
+def ranking_baseline(df, group_cols, top_n=10):
+    """hitung_ranking versi awal (groupby.apply per grup) sebagai acuan."""
+    grouped = df.groupby(group_cols + ['Jenis Penyakit', 'ICD X'])['Total_Kasus'].sum().reset_index()
+    result = (
+        grouped.sort_values(group_cols + ['Total_Kasus'])
+        .groupby(group_cols, group_keys=False)
+        .apply(lambda x: x.sort_values('Total_Kasus', ascending=False).head(top_n))
+        .reset_index(drop=True)
+    )
+    result.index += 1
+    return result
+
+
+def umum_baseline(df_ranking, group_col, top_n=5):
+    """cari_penyakit_umum versi awal sebagai acuan."""
+    total_groups = df_ranking[group_col].nunique()
+    freq = df_ranking.groupby(['Jenis Penyakit', 'ICD X']).size().reset_index(name='Frekuensi')
+    total = df_ranking.groupby(['Jenis Penyakit', 'ICD X'])['Total_Kasus'].sum().reset_index()
+    summary = pd.merge(freq, total, on=['Jenis Penyakit', 'ICD X'])
+    summary['Status'] = summary['Frekuensi'].apply(
+        lambda x: "LOLOS (Ada di SEMUA)" if x == total_groups else f"HAMPIR (Absen di {total_groups - x} unit)"
+    )
+    result = summary.sort_values(['Frekuensi', 'Total_Kasus'], ascending=False).head(top_n).reset_index(drop=True)
+    result.index += 1
+    return result
+
+
+def teks(df):
+    """Samakan tipe kolom (kategori -> str) agar hanya isi & urutan yang dibandingkan."""
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(str)
+    return df
+
+
+@pytest.fixture(scope='module')
+def dataset(file_sampel):
+    master_df, kubus, logs = logic.bangun_dataset(logic.baca_banyak_file(file_sampel, max_workers=1))
+    return logic.KAMUS_PENYAKIT.dekode(master_df), kubus
+
+
+@pytest.mark.parametrize('scope,top_n', [('Kecamatan', 10), ('Puskesmas', 10), ('Puskesmas', 3)])
+def test_ranking_sama_dengan_baseline(dataset, scope, top_n):
+    master_teks, kubus = dataset
+    acuan = ranking_baseline(teks(master_teks), [scope], top_n)
+    pd.testing.assert_frame_equal(teks(logic.hitung_ranking(kubus, [scope], top_n)), acuan[[scope, 'Jenis Penyakit', 'ICD X', 'Total_Kasus']])
+    # Jalur teks (tanpa kode penyakit) harus sama juga
+    pd.testing.assert_frame_equal(teks(logic.hitung_ranking(master_teks, [scope], top_n)), acuan)
+
+
+def test_rekap_penyakit_umum_sama_dengan_baseline(dataset):
+    master_teks, kubus = dataset
+    top_kec, top_pusk, common_kec, common_pusk = logic.hitung_rekap(kubus, 10, 10, 5)
+    for ranking, scope, hasil in [(top_kec, 'Kecamatan', common_kec), (top_pusk, 'Puskesmas', common_pusk)]:
+        acuan = umum_baseline(teks(ranking_baseline(teks(master_teks), [scope])), scope)
+        pd.testing.assert_frame_equal(teks(hasil), acuan, check_dtype=False)
+
+
+def test_ranking_per_entitas_setara_filter_per_entitas(dataset):
+    _, kubus = dataset
+    hasil = logic.ranking_per_entitas(kubus, 'Puskesmas', top_n=5)
+    for entitas, (ranking, total) in hasil.items():
+        bagian = kubus[kubus['Puskesmas'] == entitas]
+        pd.testing.assert_frame_equal(teks(ranking), teks(logic.hitung_ranking(bagian, ['Puskesmas'], 5)))
+        assert total == bagian['Total_Kasus'].sum()
+
+
+def test_filter_include_exclude(dataset):
+    master_teks, kubus = dataset
+    indeks = logic.IndeksFilter(kubus)
+    hasil = logic.KAMUS_PENYAKIT.dekode(indeks.terapkan(inc_a=['A', 'B'], exc_l=['A00 - PENYAKIT A00']))
+    icd = hasil['ICD X'].str[0]
+    assert set(icd) <= {'A', 'B'}
+    assert 'A00' not in set(hasil['ICD X'])
+    assert indeks.terapkan() is kubus
@@ -0,0 +1,148 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import logic
+import sql_backend
+
+pytestmark = pytest.mark.skipif(not sql_backend.ADA_SQLITE, reason='SQLite >= 3.38 dibutuhkan')
+
+
+def teks(df):
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(str)
+    return df
+
+
+def sama(a, b):
+    pd.testing.assert_frame_equal(teks(a), teks(b), check_dtype=False)
+
+
+@pytest.fixture(scope='module')
+def kubus(file_sampel):
+    _, kubus, _ = logic.bangun_dataset(logic.baca_banyak_file(file_sampel, max_workers=1))
+    return kubus
+
+
+@pytest.fixture
+def handle(kubus, tmp_path):
+    return sql_backend.simpan_kubus(logic.KAMUS_PENYAKIT.dekode(kubus), path=str(tmp_path / 'rekap.sqlite'))
+
+
+def test_rekap_sama_dengan_pandas(kubus, handle):
+    for hasil, acuan in zip(handle.rekap(10, 7, 5), logic.hitung_rekap(kubus, 10, 7, 5)):
+        sama(hasil, acuan)
+
+
+@pytest.mark.parametrize('filter_', [
+    dict(inc_a=['A', 'J']),
+    dict(inc_a=['A'], inc_l=['K05 - PENYAKIT K05']),
+    dict(exc_a=['B'], exc_l=['A01 - PENYAKIT A01']),
+])
+def test_rekap_terfilter_sama_dengan_pandas(kubus, handle, filter_):
+    acuan = logic.hitung_rekap(logic.IndeksFilter(kubus).terapkan(**filter_))
+    for hasil, harapan in zip(handle.filter(**filter_).rekap(), acuan):
+        sama(hasil, harapan)
+
+
+def test_ringkasan(kubus, handle):
+    view = logic.IndeksFilter(kubus).terapkan(inc_a=['A'])
+    baris, n_pusk, total = handle.filter(inc_a=['A']).ringkasan()
+    assert (baris, n_pusk, total) == (len(view), view['Puskesmas'].nunique(), view['Total_Kasus'].sum())
+
+
+def test_wilayah_dan_komparasi(kubus, handle):
+    kec = str(kubus['Kecamatan'].cat.categories[0])
+    ranking, metrik = handle.wilayah('Kecamatan', kec)
+    bagian = kubus[kubus['Kecamatan'] == kec]
+    sama(ranking, logic.hitung_ranking(bagian, ['Kecamatan'], 10))
+    assert metrik['total'] == bagian['Total_Kasus'].sum()
+    assert metrik['jumlah_pusk'] == bagian['Puskesmas'].nunique()
+
+    p1, p2 = (str(p) for p in kubus['Puskesmas'].cat.categories[:2])
+    total1, total2, top1, top2, irisan = handle.komparasi(p1, p2, top_n=5)
+    acuan1 = logic.top_penyakit(kubus[kubus['Puskesmas'] == p1], 5).reset_index(drop=True)
+    acuan2 = logic.top_penyakit(kubus[kubus['Puskesmas'] == p2], 5).reset_index(drop=True)
+    sama(top1, acuan1)
+    sama(top2, acuan2)
+    assert total1 == kubus.loc[kubus['Puskesmas'] == p1, 'Total_Kasus'].sum()
+    assert total2 == kubus.loc[kubus['Puskesmas'] == p2, 'Total_Kasus'].sum()
+    acuan = pd.merge(
+        acuan1[['Jenis Penyakit', 'Total_Kasus']], acuan2[['Jenis Penyakit', 'Total_Kasus']],
+        on='Jenis Penyakit', suffixes=(f'_{p1}', f'_{p2}')
+    )
+    sama(irisan, acuan)
+
+
+def _kubus_kecil(total):
+    return pd.DataFrame({
+        'Puskesmas': ['A', 'B'], 'Kecamatan': ['K', 'K'], 'Jenis Penyakit': ['X', 'Y'],
+        'ICD X': ['A01', 'B01'], 'Total_Kasus': [float(total), 2.0],
+    })
+
+
+def test_dataset_sama_tidak_ditulis_ulang(tmp_path):
+    path = str(tmp_path / 'rekap.sqlite')
+    a = sql_backend.simpan_kubus(_kubus_kecil(1), path=path)
+    b = sql_backend.simpan_kubus(_kubus_kecil(1).iloc[::-1], path=path)
+    assert a.dataset == b.dataset
+    assert sql_backend._koneksi(path).execute("SELECT COUNT(*) FROM kubus").fetchone() == (2,)
+
+
+def test_dataset_tergusur_ditulis_ulang_saat_query(tmp_path, monkeypatch):
+    monkeypatch.setattr(sql_backend, 'MAKS_DATASET', 2)
+    path = str(tmp_path / 'rekap.sqlite')
+    lama = sql_backend.simpan_kubus(_kubus_kecil(1), path=path)
+    acuan = lama.ranking('Puskesmas')
+    sql_backend.simpan_kubus(_kubus_kecil(3), path=path)
+    sql_backend.simpan_kubus(_kubus_kecil(4), path=path)
+    ada = [r[0] for r in sql_backend._koneksi(path).execute("SELECT id FROM dataset")]
+    assert lama.dataset not in ada
+
+    # Handle lama tetap memberi hasil lengkap (dataset ditulis ulang), bukan frame kosong
+    sama(lama.ranking('Puskesmas'), acuan)
+    assert len(sql_backend._koneksi(path).execute("SELECT id FROM dataset").fetchall()) == 2
+
+
+def test_query_hanya_membaca(tmp_path):
+    path = str(tmp_path / 'rekap.sqlite')
+    handle = sql_backend.simpan_kubus(_kubus_kecil(1), path=path)
+    conn = sql_backend._koneksi(path)
+    dipakai = conn.execute("SELECT dipakai FROM dataset").fetchall()
+
+    # Sesi lain sedang memegang lock tulis: query tetap jalan (WAL) tanpa menunggu
+    penulis = sqlite3.connect(path, isolation_level=None)
+    penulis.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("PRAGMA busy_timeout = 100")
+        assert len(handle.ranking('Puskesmas')) == 2
+    finally:
+        penulis.execute("ROLLBACK")
+        conn.execute("PRAGMA busy_timeout = 30000")
+    assert conn.execute("SELECT dipakai FROM dataset").fetchall() == dipakai
+
+
+def test_ranking_per_entitas_dan_daftar(kubus, handle):
+    for scope in ['Kecamatan', 'Puskesmas']:
+        hasil = handle.ranking_per_entitas(scope, top_n=5)
+        acuan = logic.ranking_per_entitas(kubus, scope, top_n=5)
+        assert list(hasil) == list(acuan)
+        for entitas, (ranking, total) in hasil.items():
+            sama(ranking, acuan[entitas][0])
+            assert np.isclose(total, acuan[entitas][1])
+        assert handle.daftar(scope) == sorted(kubus[scope].astype(str).unique())
+
+    kec = str(kubus['Kecamatan'].cat.categories[0])
+    pusk = kubus.loc[kubus['Kecamatan'] == kec, 'Puskesmas'].astype(str).unique()
+    assert handle.daftar('Puskesmas', kecamatan=kec) == sorted(pusk)
+
+
+def test_pilihan_penyakit(kubus, handle):
+    kode = np.unique(kubus['Kode_Penyakit'].to_numpy())
+    label, alpha = handle.penyakit()
+    assert label == sorted(set(logic.KAMUS_PENYAKIT.label(kode)))
+    assert alpha == sorted(set(logic.KAMUS_PENYAKIT.alpha(kode)))
@@ -0,0 +1,88 @@
+import pytest
+
+from wilayah import RESOLVER, TIDAK_TERDAFTAR, ResolverPuskesmas, jarak_edit, token_nama
+
+
+@pytest.mark.parametrize('nama_file,puskesmas,metode', [
+    ('PONCOL.xlsx', 'PONCOL', 'persis'),
+    ('Bulu lor.xlsx', 'BULU LOR', 'persis'),
+    ('Pusk_Poncol_Jan.xlsx', 'PONCOL', 'normalisasi'),
+    ('PONCOL (1).xlsx', 'PONCOL', 'normalisasi'),
+    ('BULULOR.xlsx', 'BULU LOR', 'normalisasi'),
+    ('MIJEN2.xlsx', 'MIJEN', 'normalisasi'),
+    ('Pkm Kedungmundu Februari 2026.xlsx', 'KEDUNGMUNDU', 'normalisasi'),
+    ('KAGOK CANDISARI.xlsx', 'KAGOK', 'potongan'),
+    ('Halmhera.xlsx', 'HALMAHERA', 'fuzzy'),
+    ('Ngrep.xlsx', 'NGEREP', 'fuzzy'),
+    ('Tlogosari Wetn.xlsx', 'TLOGOSARI WETAN', 'fuzzy'),
+])
+def test_cocok(nama_file, puskesmas, metode):
+    hasil = RESOLVER.cari(nama_file)
+    assert (hasil['puskesmas'], hasil['metode']) == (puskesmas, metode)
+    assert hasil['kecamatan'] == RESOLVER.mapping[puskesmas]
+
+
+@pytest.mark.parametrize('nama_file,metode', [
+    # Nama kecamatan, bukan puskesmas: 0.75 terhadap SEKARAN, di bawah AMBANG_FUZZY
+    ('Semarang.xlsx', 'tidak cocok'),
+    # Awalan dua puskesmas (KULON/WETAN) dan potongan nama LAMPER TENGAH: sengaja tidak ditebak
+    ('Tlogosari.xlsx', 'tidak cocok'),
+    ('Lamper.xlsx', 'tidak cocok'),
+    ('xyz.xlsx', 'tidak cocok'),
+    # Dua nama puskesmas di satu nama file
+    ('GENUK BANGETAYU.xlsx', 'ambigu'),
+])
+def test_sengaja_tidak_cocok(nama_file, metode):
+    hasil = RESOLVER.cari(nama_file)
+    assert hasil['metode'] == metode
+    assert hasil['kecamatan'] == TIDAK_TERDAFTAR
+
+
+def test_kata_pengisi_tidak_dibuang_dari_mapping():
+    resolver = ResolverPuskesmas({'PUSK SARI': 'K1', 'SARI': 'K2', 'DATA': 'K3'})
+    assert resolver.cari('pusk sari.xlsx')['puskesmas'] == 'PUSK SARI'
+    assert resolver.cari('PKM Sari Jan.xlsx')['puskesmas'] == 'SARI'
+    assert resolver.cari('DATA.xlsx')['puskesmas'] == 'DATA'
+
+
+def test_kunci_mapping_bertabrakan_jadi_ambigu():
+    resolver = ResolverPuskesmas({'B-C': 'K1', 'B C': 'K2', 'D': 'K3'})
+    hasil = resolver.cari('BC.xlsx')
+    assert hasil['metode'] == 'ambigu'
+    assert hasil['kandidat'] == 'B C, B-C'
+    assert resolver.cari('D BC.xlsx')['metode'] == 'ambigu'
+
+
+def test_versi_berubah_jika_mapping_berubah():
+    assert ResolverPuskesmas({'A': 'K1'}).versi != ResolverPuskesmas({'A': 'K2'}).versi
+
+
+def test_token_dan_jarak_edit():
+    assert token_nama('Pusk_Mijen2_Januari') == ['MIJEN']
+    assert token_nama('Pusk Mijen', buang_pengisi=False) == ['PUSK', 'MIJEN']
+    assert jarak_edit('NGREP', 'NGEREP') == 1
+    assert jarak_edit('SEMARANG', 'SEKARAN') == 2
+    assert jarak_edit('', 'ABC') == 3
+
+
+def test_mapping_tidak_ada_jadi_kosong_dengan_peringatan(monkeypatch, tmp_path):
+    import wilayah
+    monkeypatch.setattr(wilayah, 'MAPPING_FILE', str(tmp_path / 'tidak_ada.csv'))
+    monkeypatch.setattr(wilayah, 'GALAT_MAPPING', None)
+    with pytest.warns(UserWarning, match='tidak_ada.csv'):
+        mapping = wilayah._muat_mapping_default()
+    assert mapping == {}
+    assert 'tidak_ada.csv' in wilayah.GALAT_MAPPING
+    assert ResolverPuskesmas(mapping).cari('PONCOL.xlsx')['kecamatan'] == TIDAK_TERDAFTAR
+
+
+def test_puskesmas_ganda():
+    from wilayah import puskesmas_ganda
+    logs = [
+        {'file': 'Pusk_Poncol_Jan.xlsx', 'status': 'SUCCESS', 'puskesmas': 'PONCOL'},
+        {'file': 'PONCOL.xlsx', 'status': 'SUCCESS', 'puskesmas': 'PONCOL'},
+        {'file': 'BULU.xlsx', 'status': 'SUCCESS', 'puskesmas': 'BULU'},
+        {'file': 'rusak.xlsx', 'status': 'ERROR', 'puskesmas': 'BULU'},
+        {'file': 'master.parquet', 'status': 'SUCCESS'},
+    ]
+    assert puskesmas_ganda(logs) == {'PONCOL': ['PONCOL.xlsx', 'Pusk_Poncol_Jan.xlsx']}
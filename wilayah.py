@@ -0,0 +1,208 @@
+"""
+Resolver nama Puskesmas -> Kecamatan dari nama file.
+
+Mapping dibaca dari file CSV eksternal (kolom: puskesmas, kecamatan), default
+mapping_kecamatan.csv di folder aplikasi atau env REKAP_MAPPING. Nama file
+dinormalisasi (huruf besar, tanda baca, kata pengisi seperti PUSK/PKM/bulan/angka
+dibuang) lalu dicocokkan bertahap: persis -> potongan kata -> fuzzy (jarak edit) dengan
+kandidat dari indeks terbalik trigram, sehingga biaya per file tidak bergantung pada
+jumlah puskesmas.
+"""
+import csv
+import os
+import re
+import warnings
+from collections import Counter
+
+from disk_cache import hash_bytes
+
+MAPPING_FILE = os.environ.get(
+    'REKAP_MAPPING', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mapping_kecamatan.csv')
+)
+
+# Skor minimum (1 - jarak edit / panjang nama) agar kecocokan fuzzy diterima - kira-kira satu
+# salah ketik per 5 huruf: 'NGREP' -> NGEREP (0.83) lolos, 'SEMARANG' -> SEKARAN (0.75) tidak - dan
+# selisih minimum terhadap nama terdekat kedua (mis. 'TLOGOSARI' ambigu antara KULON dan WETAN)
+AMBANG_FUZZY = 0.8
+SELISIH_FUZZY = 0.1
+
+# Kandidat fuzzy per potongan teks: nama dengan trigram bersama terbanyak (dari indeks terbalik);
+# jarak edit hanya dihitung untuk kandidat ini
+MAKS_KANDIDAT = 10
+
+# Potongan kata yang dicoba untuk pencocokan persis (nama puskesmas terpanjang: 3 kata)
+MAKS_KATA = 3
+
+TIDAK_TERDAFTAR = 'TIDAK TERDAFTAR'
+
+# Pesan galat jika MAPPING_FILE gagal dibaca saat import (None = mapping termuat)
+GALAT_MAPPING = None
+
+# Naikkan setiap kali aturan pencocokan berubah (ikut masuk ResolverPuskesmas.versi)
+VERSI_RESOLVER = '2'
+
+# Kata pengisi yang lazim ada di nama file laporan, bukan bagian nama puskesmas
+KATA_PENGISI = {
+    'PUSK', 'PUSKESMAS', 'PKM', 'UPTD', 'UPT', 'LAPORAN', 'LAP', 'REKAP', 'DATA', 'LB', 'FINAL', 'REVISI', 'REV', 'COPY',
+    'JAN', 'JANUARI', 'FEB', 'FEBRUARI', 'MAR', 'MARET', 'APR', 'APRIL', 'MEI', 'JUN', 'JUNI', 'JUL', 'JULI',
+    'AGU', 'AGS', 'AGT', 'AGUSTUS', 'SEP', 'SEPT', 'SEPTEMBER', 'OKT', 'OKTOBER', 'NOV', 'NOVEMBER', 'DES', 'DESEMBER',
+}
+
+
+def muat_mapping(path=None):
+    """CSV (kolom puskesmas, kecamatan) -> dict NAMA PUSKESMAS -> KECAMATAN (huruf besar)."""
+    with open(path or MAPPING_FILE, newline='', encoding='utf-8-sig') as f:
+        return {
+            row['puskesmas'].strip().upper(): (row.get('kecamatan') or '').strip().upper()
+            for row in csv.DictReader(f) if (row.get('puskesmas') or '').strip()
+        }
+
+
+def _muat_mapping_default():
+    """
+    Mapping dari MAPPING_FILE. Jika file tidak ada/tidak bisa dibaca, aplikasi tetap jalan dengan
+    mapping kosong (semua puskesmas tidak terdaftar) dan pesan galatnya disimpan di GALAT_MAPPING.
+    """
+    global GALAT_MAPPING
+    try:
+        return muat_mapping()
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        GALAT_MAPPING = f"Mapping kecamatan tidak bisa dibaca ({MAPPING_FILE}): {e}"
+        warnings.warn(GALAT_MAPPING + ". Semua puskesmas dianggap tidak terdaftar.")
+        return {}
+
+
+def token_nama(teks, buang_pengisi=True):
+    """
+    Kata-kata bermakna dari nama file/puskesmas: huruf besar, tanpa tanda baca & angka.
+    buang_pengisi: buang juga KATA_PENGISI (hanya untuk nama file, bukan nama di mapping).
+    """
+    # Huruf & angka dipisah: 'MIJEN2' -> 'MIJEN', '2'
+    kata = re.findall(r'[A-Z]+|[0-9]+', str(teks).upper())
+    return [k for k in kata if not k.isdigit() and not (buang_pengisi and k in KATA_PENGISI)]
+
+
+def _trigram(teks):
+    rapat = '#' + teks.replace(' ', '') + '#'
+    return {rapat[i:i + 3] for i in range(len(rapat) - 2)}
+
+
+def jarak_edit(a, b):
+    """Jarak Levenshtein (sisip/hapus/ganti satu huruf = 1)."""
+    if len(a) < len(b):
+        a, b = b, a
+    baris = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        sebelum, baris[0] = baris[0], i
+        for j, cb in enumerate(b, 1):
+            sebelum, baris[j] = baris[j], min(baris[j] + 1, baris[j - 1] + 1, sebelum + (ca != cb))
+    return baris[-1]
+
+
+class ResolverPuskesmas:
+    """
+    Indeks nama puskesmas yang dibangun sekali per proses.
+    cari() mengembalikan dict puskesmas, kecamatan, confidence, metode (+ kandidat terdekat jika
+    tidak cocok/ambigu); confidence 1.0 = nama file persis sama dengan mapping, di bawah AMBANG_FUZZY
+    dianggap tidak terdaftar.
+    """
+
+    def __init__(self, mapping):
+        self.mapping = dict(mapping)
+        self.nama = sorted(self.mapping)
+        # Kunci tanpa spasi & tanda baca: 'BULULOR' dan 'BULU LOR' dianggap sama. Nama di mapping
+        # yang kuncinya bertabrakan (mis. beda tanda baca saja) disimpan semua -> hasilnya ambigu
+        self._rapat = {}
+        for nama in self.nama:
+            self._rapat.setdefault(self._kunci(nama), []).append(nama)
+        self._huruf = [self._kunci(nama) for nama in self.nama]
+        # Indeks terbalik trigram -> posisi nama
+        self._indeks = {}
+        for i, huruf in enumerate(self._huruf):
+            for g in _trigram(huruf):
+                self._indeks.setdefault(g, []).append(i)
+        # Ikut masuk kunci cache parsing: mapping berubah = hasil parsing lama tidak dipakai
+        self.versi = hash_bytes(VERSI_RESOLVER, *(f"{p}={k}" for p, k in sorted(self.mapping.items())))[:16]
+
+    @staticmethod
+    def _kunci(nama):
+        return ''.join(token_nama(nama, buang_pengisi=False)) or nama.replace(' ', '')
+
+    def _hasil(self, nama, confidence, metode):
+        return {'puskesmas': nama, 'kecamatan': self.mapping[nama], 'confidence': confidence, 'metode': metode}
+
+    def _ambigu(self, stem, cocok):
+        return {
+            'puskesmas': stem, 'kecamatan': TIDAK_TERDAFTAR, 'confidence': 0.0,
+            'metode': 'ambigu', 'kandidat': ', '.join(sorted(cocok)),
+        }
+
+    def _skor_fuzzy(self, teks, skor):
+        """
+        Kandidat = MAKS_KANDIDAT nama dengan trigram bersama terbanyak (indeks terbalik), lalu skor
+        1 - jarak_edit / panjang terpanjang. skor: dict posisi -> skor maks.
+        """
+        rapat = teks.replace(' ', '')
+        hitung = Counter(i for g in _trigram(rapat) for i in self._indeks.get(g, ()))
+        for i, _ in sorted(hitung.items(), key=lambda x: (-x[1], x[0]))[:MAKS_KANDIDAT]:
+            huruf = self._huruf[i]
+            nilai = 1 - jarak_edit(rapat, huruf) / max(len(rapat), len(huruf))
+            skor[i] = max(skor.get(i, 0.0), nilai)
+
+    def cari(self, nama_file):
+        stem = os.path.splitext(os.path.basename(str(nama_file)))[0].upper().strip()
+        if stem in self.mapping:
+            return self._hasil(stem, 1.0, 'persis')
+
+        kata = token_nama(stem)
+        cocok = self._rapat.get(''.join(kata), [])
+        if len(cocok) == 1:
+            return self._hasil(cocok[0], 0.95, 'normalisasi')
+        if cocok:
+            return self._ambigu(stem, cocok)
+
+        # Potongan kata berurutan, terpanjang dulu (mis. 'KAGOK' di 'KAGOK CANDISARI SEMESTER');
+        # dua nama berbeda dengan panjang sama (mis. 'GENUK BANGETAYU') = ambigu
+        for n in range(min(MAKS_KATA, len(kata) - 1), 0, -1):
+            cocok = {
+                nama for k in (''.join(kata[i:i + n]) for i in range(len(kata) - n + 1)) for nama in self._rapat.get(k, ())
+            }
+            if len(cocok) == 1:
+                return self._hasil(cocok.pop(), 0.9, 'potongan')
+            if cocok:
+                return self._ambigu(stem, cocok)
+
+        # Fuzzy (salah ketik): seluruh nama & setiap potongan kata, ambil skor terbaik
+        kandidat = [' '.join(kata)] + [
+            ' '.join(kata[i:i + n]) for n in range(1, min(MAKS_KATA, len(kata) - 1) + 1) for i in range(len(kata) - n + 1)
+        ]
+        skor = {}
+        for teks in kandidat:
+            if teks:
+                self._skor_fuzzy(teks, skor)
+        # Skor seri: nama pertama (abjad) yang menang
+        urut = sorted(skor, key=lambda i: (-skor[i], i))
+        terbaik = skor[urut[0]] if urut else 0.0
+        kedua = skor[urut[1]] if len(urut) > 1 else 0.0
+        if terbaik >= AMBANG_FUZZY and terbaik - kedua >= SELISIH_FUZZY:
+            return self._hasil(self.nama[urut[0]], round(terbaik, 2), 'fuzzy')
+        return {
+            'puskesmas': stem, 'kecamatan': TIDAK_TERDAFTAR, 'confidence': round(terbaik, 2),
+            'metode': 'tidak cocok', 'kandidat': self.nama[urut[0]] if urut else None,
+        }
+
+
+RESOLVER = ResolverPuskesmas(_muat_mapping_default())
+
+
+def puskesmas_ganda(logs):
+    """
+    Puskesmas yang dipetakan dari lebih dari satu file (mis. 'PONCOL.xlsx' & 'Pusk_Poncol_Jan.xlsx');
+    datanya tergabung jadi satu puskesmas. logs: log_dict hasil baca_dan_bersihkan_file.
+    Returns: dict puskesmas -> daftar nama file, urut abjad
+    """
+    per_pusk = {}
+    for log in logs:
+        if log.get('puskesmas') and log.get('status') != 'ERROR':
+            per_pusk.setdefault(log['puskesmas'], []).append(log['file'])
+    return {p: sorted(f) for p, f in sorted(per_pusk.items()) if len(f) > 1}